@@ -6,10 +6,13 @@ import type {
   HealthStatus,
   AskRequest,
   AskResponse,
-  ApiResponse
+  ApiResponse,
+  BuildJob,
+  BuildJobSubmission
 } from '../types';
 
 const API_BASE_URL = '/api';
+const BUILD_POLL_INTERVAL = 2000;
 
 const apiClient = axios.create({
   baseURL: API_BASE_URL,
@@ -18,6 +21,13 @@ const apiClient = axios.create({
   },
 });
 
+const isFinished = (job: BuildJob) => job.status === 'succeeded' || job.status === 'failed';
+
+const fetchBuildJob = async (jobId: string): Promise<BuildJob> => {
+  const { data } = await apiClient.get<ApiResponse<BuildJob>>(`/knowledge-base/build/${jobId}`);
+  return data.data!;
+};
+
 export const api = {
   health: async (): Promise<HealthStatus> => {
     const { data } = await apiClient.get<HealthStatus>('/health');
@@ -29,13 +39,50 @@ export const api = {
     return data.data!;
   },
 
-  buildKnowledgeBase: async (forceRebuild: boolean = false): Promise<ApiResponse> => {
-    const { data } = await apiClient.post<ApiResponse>('/knowledge-base/build', {
+  // 提交构建任务，接口立即返回任务ID（202），构建在后台执行
+  buildKnowledgeBase: async (forceRebuild: boolean = false): Promise<ApiResponse<BuildJobSubmission>> => {
+    const { data } = await apiClient.post<ApiResponse<BuildJobSubmission>>('/knowledge-base/build', {
       force_rebuild: forceRebuild,
     });
     return data;
   },
 
+  getBuildJob: fetchBuildJob,
+
+  // 跟踪构建任务直到结束：优先订阅SSE进度流，连接失败时改为轮询任务状态
+  waitForBuildJob: (jobId: string, onProgress?: (job: BuildJob) => void): Promise<BuildJob> => {
+    const poll = async (): Promise<BuildJob> => {
+      while (true) {
+        const job = await fetchBuildJob(jobId);
+        onProgress?.(job);
+        if (isFinished(job)) return job;
+        await new Promise((resolve) => setTimeout(resolve, BUILD_POLL_INTERVAL));
+      }
+    };
+
+    if (typeof EventSource === 'undefined') {
+      return poll();
+    }
+
+    return new Promise<BuildJob>((resolve, reject) => {
+      const source = new EventSource(`${API_BASE_URL}/knowledge-base/build/${jobId}/events`);
+
+      source.onmessage = (event) => {
+        const job = JSON.parse(event.data) as BuildJob;
+        onProgress?.(job);
+        if (isFinished(job)) {
+          source.close();
+          resolve(job);
+        }
+      };
+
+      source.onerror = () => {
+        source.close();
+        poll().then(resolve, reject);
+      };
+    });
+  },
+
   unloadKnowledgeBase: async (): Promise<ApiResponse> => {
     const { data } = await apiClient.post<ApiResponse>('/knowledge-base/unload');
     return data;
@@ -11,10 +11,37 @@ import {
 } from 'lucide-react';
 import toast from 'react-hot-toast';
 import { api } from '../api/client';
-import type { KnowledgeBaseStatus, SystemStatus } from '../types';
+import type { BuildJob, KnowledgeBaseStatus, SystemStatus } from '../types';
 import KnowledgeBasePanel from './KnowledgeBasePanel';
 import SystemStatusPanel from './SystemStatusPanel';
 
+const BUILD_STAGE_NAMES: Record<string, string> = {
+  graph_load: '加载图数据',
+  documents: '构建文档',
+  chunking: '文档分块',
+  embedding: '向量化',
+  insert: '写入向量库',
+  index: '构建索引',
+};
+
+function formatBuildProgress(job: BuildJob): string {
+  if (job.status === 'queued') {
+    return '构建任务排队中...';
+  }
+  const stages = job.progress.stages.filter((stage) => stage.status === 'running');
+  if (stages.length === 0) {
+    return '正在构建知识库...';
+  }
+  const detail = stages
+    .map((stage) => {
+      const name = BUILD_STAGE_NAMES[stage.name] || stage.name;
+      return stage.total ? `${name} ${stage.completed}/${stage.total}` : `${name} ${stage.completed}`;
+    })
+    .join('，');
+  const eta = job.progress.eta_seconds;
+  return eta !== null ? `${detail}（预计剩余 ${Math.ceil(eta)} 秒）` : detail;
+}
+
 interface SidebarProps {
   isOpen: boolean;
   kbStatus: KnowledgeBaseStatus | null;
@@ -41,10 +68,24 @@ export default function Sidebar({
 
     try {
       const response = await api.buildKnowledgeBase(forceRebuild);
-      toast.success(response.message || '操作成功', { id: loadingToast });
+      const jobId = response.data!.job_id;
+      if (response.data!.joined) {
+        toast.loading(response.message || '已加入正在进行的构建任务', { id: loadingToast });
+      }
+
+      // 接口只提交任务，等待后台构建结束后再提示结果
+      const job = await api.waitForBuildJob(jobId, (current) => {
+        toast.loading(formatBuildProgress(current), { id: loadingToast });
+      });
+
+      if (job.status === 'succeeded') {
+        toast.success(job.result?.message || '操作成功', { id: loadingToast });
+      } else {
+        toast.error(job.error || '构建失败', { id: loadingToast });
+      }
       onRefresh();
     } catch (error: any) {
-      toast.error(error.response?.data?.detail || '操作失败', { id: loadingToast });
+      toast.error(error.response?.data?.detail || error.message || '操作失败', { id: loadingToast });
     } finally {
       setIsBuilding(false);
     }
@@ -44,6 +44,46 @@ export interface ApiResponse<T = any> {
   error?: string;
 }
 
+export type BuildJobStatus = 'queued' | 'running' | 'succeeded' | 'failed';
+
+export interface BuildJobSubmission {
+  job_id: string;
+  status: BuildJobStatus;
+  joined: boolean;
+}
+
+export interface BuildStageProgress {
+  name: string;
+  status: 'pending' | 'running' | 'done' | 'skipped';
+  total: number | null;
+  completed: number;
+  elapsed_seconds: number;
+  items_per_second: number;
+  eta_seconds: number | null;
+}
+
+export interface BuildJob {
+  job_id: string;
+  status: BuildJobStatus;
+  force_rebuild: boolean;
+  incremental: boolean;
+  created_at: number;
+  started_at: number | null;
+  finished_at: number | null;
+  error: string | null;
+  progress: {
+    version: number;
+    current_stages: string[];
+    eta_seconds: number | null;
+    stages: BuildStageProgress[];
+  };
+  result?: {
+    status: string;
+    message: string;
+    stats?: Record<string, any>;
+  } | null;
+}
+
 export interface AskRequest {
   question: string;
   stream: boolean;
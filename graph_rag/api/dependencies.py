@@ -3,6 +3,7 @@
 FastAPI依赖项 - 异步版本
 """
 
+import asyncio
 import logging
 from typing import Optional, Dict, Any
 from fastapi import HTTPException, status
@@ -18,6 +19,7 @@ logger = logging.getLogger(__name__)
 
 # 全局系统实例
 _rag_system: Optional[AdvancedGraphRAGSystem] = None
+_init_lock = asyncio.Lock()  # 初始化不再阻塞事件循环，需防止并发请求重复创建实例
 
 
 async def get_rag_system(config: Optional[GraphRAGConfig] = None) -> AdvancedGraphRAGSystem:
@@ -27,30 +29,30 @@ async def get_rag_system(config: Optional[GraphRAGConfig] = None) -> AdvancedGra
     """
     global _rag_system
 
-    if _rag_system is None:
-        logger.info("创建新的图RAG系统实例")
-        _rag_system = AdvancedGraphRAGSystem(config)
+    if _rag_system is not None:
+        return _rag_system
 
-        # 初始化系统
-        logger.info("初始化系统模块...")
-        try:
-            # 将同步的初始化操作放到线程池中执行
-            import concurrent.futures
+    async with _init_lock:
+        if _rag_system is None:
+            logger.info("创建新的图RAG系统实例")
+            system = AdvancedGraphRAGSystem(config)
 
-            def sync_initialize():
-                _rag_system.initialize_system()
+            # 初始化系统
+            logger.info("初始化系统模块...")
+            try:
+                # 将同步的初始化操作放到系统共享线程池中执行
+                await system.run_in_executor(system.initialize_system)
 
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                future = executor.submit(sync_initialize)
-                future.result()
+                logger.info("✅ 图RAG系统模块初始化完成")
+                logger.info("⚠️  注意：知识库需要手动构建，请调用 /api/knowledge-base/build 接口")
 
-            logger.info("✅ 图RAG系统模块初始化完成")
-            logger.info("⚠️  注意：知识库需要手动构建，请调用 /api/knowledge-base/build 接口")
+            except Exception as e:
+                logger.error(f"系统初始化失败: {e}")
+                # 释放已创建的资源（Neo4j驱动、检索线程池、已初始化的模块），与关闭系统时相同
+                await asyncio.to_thread(system._cleanup)
+                raise
 
-        except Exception as e:
-            logger.error(f"系统初始化失败: {e}")
-            _rag_system = None
-            raise
+            _rag_system = system
 
     return _rag_system
 
@@ -83,15 +85,8 @@ async def cleanup_rag_system():
     """清理系统资源 - 异步版本"""
     global _rag_system
     if _rag_system:
-        # 将同步的清理操作放到线程池中执行
-        import concurrent.futures
-
-        def sync_cleanup():
-            _rag_system._cleanup()
-
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            future = executor.submit(sync_cleanup)
-            future.result()
+        # 清理会关闭系统共享线程池，因此放到事件循环的默认线程池中执行
+        await asyncio.to_thread(_rag_system._cleanup)
 
         _rag_system = None
         logger.info("系统资源已清理")
\ No newline at end of file
@@ -7,7 +7,7 @@ import time
 import json
 import logging
 from typing import Optional, Dict, Any
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Request
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import sys
@@ -18,6 +18,7 @@ import asyncio
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from api.dependencies import get_rag_system_dependency, cleanup_rag_system
+from rag_modules.request_context import RequestContext, request_scope
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api", tags=["问答"])
@@ -32,6 +33,7 @@ class QuestionRequest(BaseModel):
 
 class KnowledgeBaseRequest(BaseModel):
     force_rebuild: bool = False
+    incremental: bool = False
 
 
 # 健康检查 - 改为异步
@@ -51,7 +53,7 @@ async def health_check(system=Depends(get_rag_system_dependency)):
 async def get_knowledge_base_status(system=Depends(get_rag_system_dependency)):
     """获取知识库状态"""
     try:
-        status_info = system.get_knowledge_base_status()
+        status_info = await system.run_in_executor(system.get_knowledge_base_status)
         return {
             "success": True,
             "data": status_info
@@ -64,47 +66,106 @@ async def get_knowledge_base_status(system=Depends(get_rag_system_dependency)):
         )
 
 
-# 构建/加载知识库 - 改为异步
-@router.post("/knowledge-base/build")
+# 构建/加载知识库 - 后台任务
+@router.post("/knowledge-base/build", status_code=status.HTTP_202_ACCEPTED)
 async def build_knowledge_base(
         request: KnowledgeBaseRequest = None,
         system=Depends(get_rag_system_dependency)
 ):
     """
-    手动构建或加载知识库 - 异步版本
+    提交知识库构建任务，立即返回任务ID
+    参数相同的请求加入已排队或正在运行的任务；构建在后台依次执行，不会并发重建集合
     """
     if request is None:
         request = KnowledgeBaseRequest(force_rebuild=False)
 
-    logger.info(f"构建知识库请求: force_rebuild={request.force_rebuild}")
+    logger.info(f"构建知识库请求: force_rebuild={request.force_rebuild}, incremental={request.incremental}")
 
     try:
-        # 注意：这里需要将同步的构建操作放到线程池中执行，避免阻塞事件循环
-        import concurrent.futures
-
-        def sync_build():
-            return system.load_or_build_knowledge_base(force_rebuild=request.force_rebuild)
-
-        # 使用线程池执行同步操作
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            future = executor.submit(sync_build)
-            result = future.result()
+        job, joined = system.build_jobs.submit(
+            force_rebuild=request.force_rebuild,
+            incremental=request.incremental
+        )
 
         return {
             "success": True,
-            "message": result["message"],
+            "message": "已加入正在进行的构建任务" if joined else "构建任务已提交",
             "data": {
-                "status": result["status"],
-                "stats": result.get("stats", {})
+                "job_id": job.job_id,
+                "status": job.status,
+                "joined": joined
             }
         }
 
     except Exception as e:
-        logger.error(f"构建知识库失败: {e}")
+        logger.error(f"提交构建任务失败: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"构建知识库失败: {str(e)}"
+            detail=f"提交构建任务失败: {str(e)}"
+        )
+
+
+# 构建任务列表
+@router.get("/knowledge-base/build")
+async def list_build_jobs(system=Depends(get_rag_system_dependency)):
+    """最近的构建任务（不含构建结果）"""
+    return {
+        "success": True,
+        "data": [job.to_dict(include_result=False) for job in system.build_jobs.list_jobs()]
+    }
+
+
+def _get_build_job(system, job_id: str):
+    job = system.build_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"构建任务不存在: {job_id}"
         )
+    return job
+
+
+# 构建任务状态
+@router.get("/knowledge-base/build/{job_id}")
+async def get_build_job(job_id: str, system=Depends(get_rag_system_dependency)):
+    """构建任务状态、分阶段进度和预计剩余时间；任务结束后包含构建结果"""
+    return {
+        "success": True,
+        "data": _get_build_job(system, job_id).to_dict()
+    }
+
+
+# 构建进度流
+@router.get("/knowledge-base/build/{job_id}/events")
+async def stream_build_job(job_id: str, http_request: Request, system=Depends(get_rag_system_dependency)):
+    """
+    以SSE推送构建进度：进度变化时推送一次快照，任务结束时推送最终状态后关闭
+    """
+    job = _get_build_job(system, job_id)
+
+    async def generate():
+        last_version = -1
+        while True:
+            if await http_request.is_disconnected():
+                return
+            finished = not job.active
+            if job.progress.version != last_version or finished:
+                data = job.to_dict(include_result=finished)
+                last_version = data["progress"]["version"]
+                yield f"data: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+            if finished:
+                return
+            await asyncio.sleep(0.5)
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no"
+        }
+    )
 
 
 # 卸载知识库 - 改为异步
@@ -157,20 +218,13 @@ async def ask_question(
     start_time = time.time()
 
     try:
-        # 使用线程池执行同步的问答操作
-        import concurrent.futures
-
-        def sync_ask():
-            return system.ask_question_with_routing(
+        # 检索在共享线程池中执行，生成使用异步LLM客户端；请求作用域统计本次实际的LLM调用次数
+        with request_scope() as ctx:
+            answer, analysis = await system.aask_question(
                 question=request.question,
-                stream=False,  # 非流式
                 explain_routing=request.explain
             )
 
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            future = executor.submit(sync_ask)
-            answer, analysis = future.result()
-
         processing_time = time.time() - start_time
 
         # 构建响应
@@ -178,7 +232,8 @@ async def ask_question(
             "success": True,
             "data": {
                 "answer": answer,
-                "processing_time": processing_time
+                "processing_time": processing_time,
+                "llm_calls": ctx.llm_calls
             }
         }
 
@@ -189,7 +244,8 @@ async def ask_question(
                                                                            'value') else str(
                     analysis.recommended_strategy),
                 "complexity": getattr(analysis, 'query_complexity', 0),
-                "confidence": getattr(analysis, 'confidence', 0)
+                "confidence": getattr(analysis, 'confidence', 0),
+                "source": getattr(analysis, 'source', 'llm')
             }
 
         logger.info(f"问题处理完成: '{request.question[:30]}...' 耗时: {processing_time:.2f}s")
@@ -207,6 +263,7 @@ async def ask_question(
 @router.post("/ask/stream")
 async def ask_question_stream(
         request: QuestionRequest,
+        http_request: Request,
         system=Depends(get_rag_system_dependency)
 ):
     """
@@ -232,49 +289,69 @@ async def ask_question_stream(
             detail="问题太长（最多1000字符）"
         )
 
-    try:
-        # 获取检索到的文档
-        import concurrent.futures
-
-        def sync_retrieve():
-            relevant_docs, analysis = system.query_router.route_query(
-                request.question,
-                system.config.top_k
-            )
-            return relevant_docs, analysis
-
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            future = executor.submit(sync_retrieve)
-            relevant_docs, analysis = future.result()
+    sse_headers = {
+        "Cache-Control": "no-cache",
+        "Connection": "keep-alive",
+        "X-Accel-Buffering": "no"  # 禁用Nginx缓冲
+    }
 
-        # 异步生成流式响应
-        async def generate():
-            try:
-                # 使用线程池执行同步的流式生成
-                def sync_stream():
-                    for chunk in system.generation_module.generate_adaptive_answer_stream(
-                            request.question, relevant_docs
-                    ):
-                        yield chunk
+    # 语义答案缓存命中：按原分块回放SSE；版本快照在查找之前获取，用于丢弃生成期间已过期的答案
+    snapshot = system.answer_cache_snapshot()
+    cached = await system.alookup_cached_answer(request.question)
+    if cached:
+        async def replay():
+            for chunk in cached.chunks:
+                yield f"data: {json.dumps({'chunk': chunk})}\n\n"
+            yield f"data: {json.dumps({'done': True, 'cached': True})}\n\n"
 
-                for chunk in sync_stream():
-                    yield f"data: {json.dumps({'chunk': chunk})}\n\n"
+        return StreamingResponse(replay(), media_type="text/event-stream", headers=sse_headers)
 
-                yield f"data: {json.dumps({'done': True})}\n\n"
+    try:
+        # 获取检索到的文档（在共享线程池中执行）；生成在另一个任务中进行，复用同一个请求上下文计数
+        ctx = RequestContext()
+        with request_scope(ctx):
+            relevant_docs, analysis = await system.aretrieve(request.question)
 
-            except Exception as e:
-                logger.error(f"流式生成失败: {e}")
-                error_msg = json.dumps({"error": f"流式生成失败: {str(e)}"})
-                yield f"data: {error_msg}\n\n"
+        # 异步生成流式响应：按需从上游拉取token，客户端断开时中止LLM请求
+        async def generate():
+            # 生成器由响应任务驱动，需要在其中重新进入请求作用域
+            with request_scope(ctx):
+                stream = system.generation_module.agenerate_adaptive_answer_stream(
+                    request.question, relevant_docs
+                )
+                chunks = []
+                try:
+                    async for chunk in stream:
+                        if await http_request.is_disconnected():
+                            logger.info(f"客户端已断开，取消生成: '{request.question[:30]}'")
+                            return
+                        chunks.append(chunk)
+                        yield f"data: {json.dumps({'chunk': chunk})}\n\n"
+
+                    yield f"data: {json.dumps({'done': True, 'llm_calls': ctx.llm_calls})}\n\n"
+
+                    await system.run_in_executor(
+                        system.cache_answer, request.question, "".join(chunks), relevant_docs, analysis,
+                        chunks=chunks, snapshot=snapshot
+                    )
+
+                except asyncio.CancelledError:
+                    logger.info(f"流式响应被取消: '{request.question[:30]}'")
+                    raise
+
+                except Exception as e:
+                    logger.error(f"流式生成失败: {e}")
+                    error_msg = json.dumps({"error": f"流式生成失败: {str(e)}"})
+                    yield f"data: {error_msg}\n\n"
+
+                finally:
+                    # 关闭生成器即关闭上游LLM响应
+                    await stream.aclose()
 
         return StreamingResponse(
             generate(),
             media_type="text/event-stream",
-            headers={
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive",
-                "X-Accel-Buffering": "no"  # 禁用Nginx缓冲
-            }
+            headers=sse_headers
         )
 
     except Exception as e:
@@ -297,7 +374,8 @@ async def get_system_status(system=Depends(get_rag_system_dependency)):
             "config": {
                 "llm_model": system.config.llm_model,
                 "top_k": system.config.top_k
-            }
+            },
+            "performance": system.get_performance_stats()
         }
     }
 
@@ -323,10 +401,17 @@ async def reload_system():
 @router.delete("/knowledge-base")
 async def delete_knowledge_base(system=Depends(get_rag_system_dependency)):
     """删除Milvus中的知识库集合"""
+    if system.build_jobs.is_busy():
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="知识库正在构建，请等待构建任务结束后再删除"
+        )
     try:
         if system.index_module and hasattr(system.index_module, 'delete_collection'):
             success = system.index_module.delete_collection()
             if success:
+                if system.answer_cache:
+                    system.answer_cache.invalidate_all()
                 system.knowledge_base_loaded = False
                 system.system_ready = False
                 return {
@@ -0,0 +1,103 @@
+"""
+API并发负载测试
+以不同并发客户端数向运行中的服务发送 /api/ask 请求，统计吞吐量和延迟分位数。
+分别对改造前后的服务运行，对比并发请求的I/O是否能够相互重叠
+
+用法（先启动服务并构建知识库）：
+    python benchmarks/bench_api_concurrency.py --url http://localhost:8000 --concurrency 1 8 32 --requests 64
+
+注意：语义答案缓存会让重复问题直接命中，测试生成链路时请在配置中关闭 enable_answer_cache
+"""
+
+import argparse
+import asyncio
+import time
+from typing import List
+
+import httpx
+
+QUESTIONS = [
+    "红烧肉怎么做？",
+    "宫保鸡丁需要哪些食材？",
+    "有哪些适合夏天的凉菜？",
+    "麻婆豆腐是哪个菜系的？",
+    "用鸡蛋和西红柿能做什么菜？",
+    "清蒸鲈鱼要蒸多久？",
+    "推荐几道简单的素菜",
+    "鱼香肉丝和宫保鸡丁有什么区别？",
+    "土豆可以做哪些家常菜？",
+    "做糖醋排骨的步骤是什么？",
+    "有哪些用到花椒的川菜？",
+    "适合新手的快手早餐有哪些？",
+]
+
+
+def percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_level(client: httpx.AsyncClient, url: str, concurrency: int, total: int):
+    """以固定并发数发送total个请求，返回(总耗时, 延迟列表, 失败数)"""
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(QUESTIONS[i % len(QUESTIONS)])
+
+    latencies: List[float] = []
+    failures = 0
+
+    async def worker():
+        nonlocal failures
+        while True:
+            try:
+                question = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            try:
+                response = await client.post(f"{url}/api/ask", json={"question": question})
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                failures += 1
+                print(f"  请求失败: {e}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - start, latencies, failures
+
+
+async def main_async(args):
+    timeout = httpx.Timeout(args.timeout)
+    limits = httpx.Limits(max_connections=max(args.concurrency))
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        status = (await client.get(f"{args.url}/api/system/status")).json()
+        if not status["data"]["knowledge_base_loaded"]:
+            raise SystemExit("知识库未加载，请先调用 /api/knowledge-base/build")
+
+        print(f"{'并发数':>6} {'请求数':>6} {'失败':>4} {'总耗时(s)':>10} {'吞吐(req/s)':>12} {'p50(s)':>8} {'p99(s)':>8}")
+        for concurrency in args.concurrency:
+            elapsed, latencies, failures = await run_level(client, args.url, concurrency, args.requests)
+            throughput = len(latencies) / elapsed if elapsed > 0 else 0.0
+            print(f"{concurrency:>6} {args.requests:>6} {failures:>4} {elapsed:>10.2f} {throughput:>12.2f} "
+                  f"{percentile(latencies, 50):>8.2f} {percentile(latencies, 99):>8.2f}")
+
+        performance = (await client.get(f"{args.url}/api/system/status")).json()["data"].get("performance", {})
+        if "answer_cache" in performance:
+            print(f"答案缓存: {performance['answer_cache']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API并发负载测试")
+    parser.add_argument("--url", default="http://localhost:8000", help="服务地址")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32], help="并发客户端数")
+    parser.add_argument("--requests", type=int, default=64, help="每个并发级别的请求总数")
+    parser.add_argument("--timeout", type=float, default=300.0, help="单个请求超时秒数")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
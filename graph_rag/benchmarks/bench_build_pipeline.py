@@ -0,0 +1,103 @@
+"""
+流式构建流水线基准测试
+对比原先"全部向量化 → 全部转换为实体 → 每100条插入"的整批构建与流式流水线构建的
+总耗时、吞吐和峰值RSS，并输出流水线各阶段的吞吐
+
+文档块为合成数据（按需生成，不预先占用内存），向量化使用配置中的嵌入模型，
+插入阶段用固定的每批延迟模拟Milvus网络往返；每种方式在独立子进程中运行，峰值RSS互不干扰
+
+用法：
+    python benchmarks/bench_build_pipeline.py --counts 2000 10000 --insert-latency-ms 20
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import DEFAULT_CONFIG
+from rag_modules.build_pipeline import StreamingBuildPipeline, current_rss_mb
+
+
+def synthetic_chunks(count: int):
+    """按需生成合成文档块"""
+    from langchain_core.documents import Document
+
+    for i in range(count):
+        text = f"# 菜谱{i}\n## 所需食材\n1. 鸡肉(200克)\n2. 青椒(2个)\n## 制作步骤\n" + "翻炒均匀，加盐调味。" * (i % 20 + 5)
+        yield Document(page_content=text, metadata={
+            "node_id": f"2{i:08d}", "recipe_name": f"菜谱{i}", "node_type": "Recipe",
+            "chunk_id": f"2{i:08d}_chunk_0", "parent_id": f"2{i:08d}", "doc_type": "chunk"
+        })
+
+
+def to_entity(chunk, vector, fallback_id):
+    return {"id": chunk.metadata.get("chunk_id", fallback_id), "text": chunk.page_content,
+            "metadata": dict(chunk.metadata), "vector": vector}
+
+
+def run_mode(mode: str, count: int, batch_size: int, queue_size: int, latency: float, results):
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    embeddings = HuggingFaceEmbeddings(model_name=DEFAULT_CONFIG.embedding_model,
+                                       model_kwargs={'device': 'cpu'},
+                                       encode_kwargs={'normalize_embeddings': True})
+
+    def insert(batch):
+        time.sleep(latency)
+
+    start_rss = current_rss_mb()
+    start = time.perf_counter()
+    if mode == "monolithic":
+        chunks = list(synthetic_chunks(count))
+        vectors = embeddings.embed_documents([chunk.page_content for chunk in chunks])
+        entities = [to_entity(chunk, vector, f"chunk_{i}") for i, (chunk, vector) in enumerate(zip(chunks, vectors))]
+        peak_rss = current_rss_mb()
+        for i in range(0, len(entities), 100):
+            insert(entities[i:i + 100])
+        stats = {"stages": {}}
+    else:
+        pipeline = StreamingBuildPipeline(embed_fn=embeddings.embed_documents, to_entity=to_entity,
+                                          insert_fn=insert, batch_size=batch_size, queue_size=queue_size)
+        stats = pipeline.run(synthetic_chunks(count))
+        peak_rss = stats["peak_rss_mb"]
+    elapsed = time.perf_counter() - start
+
+    results.put({"mode": mode, "elapsed": elapsed, "chunks_per_second": count / elapsed,
+                 "peak_rss_mb": peak_rss, "rss_growth_mb": peak_rss - start_rss, "stages": stats["stages"]})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="流式构建流水线基准测试")
+    parser.add_argument("--counts", type=int, nargs="+", default=[2000, 10000], help="文档块数量")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_CONFIG.build_batch_size,
+                        help="流水线每批的文档块数")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_CONFIG.build_queue_size,
+                        help="阶段间队列容量（批次）")
+    parser.add_argument("--insert-latency-ms", type=float, default=20.0,
+                        help="模拟的每批插入延迟（毫秒）")
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    # 阶段行的耗时为该阶段实际处理时间（不含等待上下游）
+    print(f"{'块数':>8} {'方式':>12} {'耗时(s)':>9} {'块/秒':>9} {'峰值RSS(MB)':>12} {'RSS增长(MB)':>12}")
+    for count in args.counts:
+        for mode in ("monolithic", "pipeline"):
+            results = ctx.Queue()
+            process = ctx.Process(target=run_mode, args=(mode, count, args.batch_size, args.queue_size,
+                                                         args.insert_latency_ms / 1000, results))
+            process.start()
+            result = results.get()
+            process.join()
+            print(f"{count:>8} {mode:>12} {result['elapsed']:>9.2f} {result['chunks_per_second']:>9.1f} "
+                  f"{result['peak_rss_mb']:>12.1f} {result['rss_growth_mb']:>12.1f}")
+            for name, stage in result["stages"].items():
+                print(f"{'':>8} {'  - ' + name:>12} {stage['busy_seconds']:>9.2f} "
+                      f"{stage['chunks_per_second']:>9.1f} {stage['peak_rss_mb']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
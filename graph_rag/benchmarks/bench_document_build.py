@@ -0,0 +1,67 @@
+"""
+菜谱文档构建基准测试
+对比逐个菜谱查询（batch_size=1，等价于原先的N+1查询）与批量UNWIND查询的构建耗时，
+并校验两种方式生成的文档完全一致
+
+用法：
+    python benchmarks/bench_document_build.py --counts 50 100 200 500 --batch-size 500
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import DEFAULT_CONFIG
+from rag_modules.graph_data_preparation import GraphDataPreparationModule
+
+
+def time_build(module: GraphDataPreparationModule, batch_size: int):
+    """构建一次文档并返回(耗时, 文档列表)"""
+    start = time.perf_counter()
+    documents = module.build_recipe_documents(batch_size=batch_size)
+    return time.perf_counter() - start, documents
+
+
+def main():
+    parser = argparse.ArgumentParser(description="菜谱文档构建基准测试")
+    parser.add_argument("--counts", type=int, nargs="+", default=[50, 100, 200, 500, 1000],
+                        help="参与构建的菜谱数量")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_CONFIG.document_batch_size,
+                        help="批量构建时每批的菜谱数量")
+    args = parser.parse_args()
+
+    module = GraphDataPreparationModule(
+        uri=DEFAULT_CONFIG.neo4j_uri,
+        user=DEFAULT_CONFIG.neo4j_user,
+        password=DEFAULT_CONFIG.neo4j_password,
+        database=DEFAULT_CONFIG.neo4j_database
+    )
+
+    try:
+        module.load_graph_data()
+        all_recipes = list(module.recipes)
+
+        print(f"{'菜谱数':>8} {'逐个查询(s)':>12} {'批量查询(s)':>12} {'加速比':>8} {'文档一致':>8}")
+        for count in args.counts:
+            if count > len(all_recipes):
+                break
+            module.recipes = all_recipes[:count]
+
+            per_recipe_time, per_recipe_docs = time_build(module, batch_size=1)
+            batched_time, batched_docs = time_build(module, batch_size=args.batch_size)
+
+            identical = len(per_recipe_docs) == len(batched_docs) and all(
+                a.page_content == b.page_content and a.metadata == b.metadata
+                for a, b in zip(per_recipe_docs, batched_docs)
+            )
+            speedup = per_recipe_time / batched_time if batched_time > 0 else float("inf")
+            print(f"{count:>8} {per_recipe_time:>12.3f} {batched_time:>12.3f} {speedup:>7.1f}x {str(identical):>8}")
+    finally:
+        module.close()
+
+
+if __name__ == "__main__":
+    main()
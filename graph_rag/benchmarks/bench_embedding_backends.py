@@ -0,0 +1,77 @@
+"""
+嵌入后端基准测试
+在CPU上对比 torch 与 onnx-int8 两个后端：
+- 一致性：同一批文本两个后端向量的余弦相似度（最小值/均值）
+- 查询延迟：逐条 embed_query 的 p50/p95
+- 批量吞吐：embed_documents 的文本/秒
+
+用法：
+    python benchmarks/bench_embedding_backends.py --num-texts 2000 --num-queries 200 --threads 4
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import DEFAULT_CONFIG
+from rag_modules.embedding_backends import BACKENDS, cosine_agreement, create_embeddings
+from bench_embedding_cache import make_texts
+
+QUERIES = ["红烧肉怎么做", "鸡肉适合搭配什么蔬菜", "有哪些简单的素菜", "宫保鸡丁需要哪些食材", "川菜有什么特色"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="嵌入后端延迟与吞吐基准测试")
+    parser.add_argument("--num-texts", type=int, default=2000, help="批量向量化的文本数量")
+    parser.add_argument("--num-queries", type=int, default=200, help="测量查询延迟的次数")
+    parser.add_argument("--threads", type=int, default=None, help="推理线程数，默认使用框架默认值")
+    parser.add_argument("--onnx-model-dir", default=DEFAULT_CONFIG.onnx_model_dir, help="ONNX模型导出目录")
+    args = parser.parse_args()
+
+    if args.threads:
+        import torch
+        torch.set_num_threads(args.threads)
+
+    texts = make_texts(args.num_texts)
+    results = {}
+    for backend in BACKENDS:
+        embeddings = create_embeddings(backend, DEFAULT_CONFIG.embedding_model, device="cpu",
+                                       onnx_model_dir=args.onnx_model_dir, threads=args.threads)
+        # 预热
+        embeddings.embed_documents(texts[:32])
+
+        latencies = []
+        for i in range(args.num_queries):
+            start = time.perf_counter()
+            embeddings.embed_query(QUERIES[i % len(QUERIES)])
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        vectors = embeddings.embed_documents(texts)
+        elapsed = time.perf_counter() - start
+
+        results[backend] = {
+            "vectors": vectors,
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p95_ms": float(np.percentile(latencies, 95)),
+            "texts_per_second": len(texts) / elapsed
+        }
+
+    print(f"CPU核数: {os.cpu_count()}，文本数量: {len(texts)}，查询次数: {args.num_queries}")
+    print(f"{'后端':>10} {'查询p50(ms)':>12} {'查询p95(ms)':>12} {'文本/秒':>10} {'加速比':>8}")
+    baseline = results["torch"]["texts_per_second"]
+    for backend, result in results.items():
+        print(f"{backend:>10} {result['p50_ms']:>12.2f} {result['p95_ms']:>12.2f} "
+              f"{result['texts_per_second']:>10.1f} {result['texts_per_second'] / baseline:>7.2f}x")
+
+    parity = cosine_agreement(results["torch"]["vectors"], results["onnx-int8"]["vectors"])
+    print(f"\n与torch向量的余弦相似度: 最小 {parity['min_cosine']:.4f}，平均 {parity['mean_cosine']:.4f}")
+
+
+if __name__ == "__main__":
+    main()
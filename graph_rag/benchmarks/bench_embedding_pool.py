@@ -0,0 +1,92 @@
+"""
+多进程嵌入基准测试
+按知识库构建的实际方式测量：文档块经 StreamingBuildPipeline 每 build_batch_size 条交给向量化阶段，
+对比单进程模型与不同进程数的进程池的构建吞吐（块/秒），插入阶段只在内存中收集向量，不连接Milvus，
+并校验进程池输出的顺序和数值与单进程一致
+
+用法：
+    python benchmarks/bench_embedding_pool.py --num-texts 4000 --workers 2 4 8 16 --build-batch-size 256
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.documents import Document
+from langchain_huggingface import HuggingFaceEmbeddings
+
+from config import DEFAULT_CONFIG
+from rag_modules.build_pipeline import StreamingBuildPipeline
+from rag_modules.embedding_pool import ProcessPoolEmbeddings
+from bench_embedding_cache import make_texts
+
+
+def run_pipeline(embed_fn, chunks, batch_size: int, queue_size: int):
+    """经流式构建流水线向量化，返回按插入顺序排列的向量和流水线统计"""
+    inserted = []
+    pipeline = StreamingBuildPipeline(
+        embed_fn=embed_fn,
+        to_entity=lambda chunk, vector, fallback_id: {"id": fallback_id, "vector": vector},
+        insert_fn=inserted.extend,
+        batch_size=batch_size,
+        queue_size=queue_size
+    )
+    stats = pipeline.run(chunks)
+    return np.asarray([entity["vector"] for entity in inserted]), stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多进程嵌入构建吞吐基准测试")
+    parser.add_argument("--num-texts", type=int, default=4000, help="文档块数量")
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4, 8], help="工作进程数")
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="每个进程的torch线程数，默认CPU核数平分")
+    parser.add_argument("--build-batch-size", type=int, default=DEFAULT_CONFIG.build_batch_size,
+                        help="流式构建每批交给向量化阶段的文档块数")
+    parser.add_argument("--build-queue-size", type=int, default=DEFAULT_CONFIG.build_queue_size,
+                        help="流水线阶段间队列最多缓存的批次数")
+    parser.add_argument("--min-shard-size", type=int, default=16, help="每个分片的最少文档块数")
+    args = parser.parse_args()
+
+    chunks = [Document(page_content=text) for text in make_texts(args.num_texts)]
+    local = HuggingFaceEmbeddings(
+        model_name=DEFAULT_CONFIG.embedding_model,
+        model_kwargs={'device': 'cpu'},
+        encode_kwargs={'normalize_embeddings': True}
+    )
+    local.embed_documents([chunk.page_content for chunk in chunks[:32]])  # 预热
+
+    reference, single = run_pipeline(local.embed_documents, chunks, args.build_batch_size, args.build_queue_size)
+
+    print(f"CPU核数: {os.cpu_count()}，文档块: {len(chunks)}，每批: {args.build_batch_size}")
+    print(f"{'进程数':>6} {'线程/进程':>9} {'耗时(s)':>9} {'块/秒':>9} {'向量化块/秒':>11} {'加速比':>8} {'最大差异':>10}")
+    print(f"{1:>6} {'默认':>9} {single['elapsed_seconds']:>9.2f} {single['chunks_per_second']:>9.1f} "
+          f"{single['stages']['embed']['chunks_per_second']:>11.1f} {1.0:>7.1f}x {0.0:>10.2e}")
+
+    for workers in args.workers:
+        pool = ProcessPoolEmbeddings(
+            model_name=DEFAULT_CONFIG.embedding_model,
+            workers=workers,
+            local_embeddings=local,
+            threads_per_worker=args.threads_per_worker,
+            min_shard_size=args.min_shard_size
+        )
+        try:
+            # 预热：启动进程并加载模型，不计入吞吐
+            pool.embed_documents([chunk.page_content for chunk in chunks[:args.build_batch_size]])
+            vectors, stats = run_pipeline(pool.embed_documents, chunks, args.build_batch_size, args.build_queue_size)
+        finally:
+            pool.close()
+
+        max_diff = float(np.max(np.abs(vectors - reference)))
+        print(f"{workers:>6} {pool.threads_per_worker:>9} {stats['elapsed_seconds']:>9.2f} "
+              f"{stats['chunks_per_second']:>9.1f} {stats['stages']['embed']['chunks_per_second']:>11.1f} "
+              f"{single['elapsed_seconds'] / stats['elapsed_seconds']:>7.1f}x {max_diff:>10.2e}")
+
+
+if __name__ == "__main__":
+    main()
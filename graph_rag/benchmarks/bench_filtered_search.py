@@ -0,0 +1,156 @@
+"""
+过滤向量检索基准测试
+在合成语料（默认10万个文档块，随机归一化向量 + 菜谱风格的标量字段）上对比三种集合配置：
+- baseline：只有向量索引
+- scalar：向量索引 + 过滤字段的标量索引
+- partition：标量索引 + 以 cuisine_type 为分区键
+
+对不同选择度的过滤条件测量检索延迟（p50/p95）和召回率（与numpy在过滤子集上的精确检索结果对比）。
+需要可访问的Milvus服务，测试集合在结束后删除
+
+用法：
+    python benchmarks/bench_filtered_search.py --num-chunks 100000 --num-queries 200
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymilvus import MilvusClient
+
+from config import DEFAULT_CONFIG
+from rag_modules.milvus_index_construction import add_collection_indexes, build_collection_schema
+
+CATEGORIES = ["荤菜", "素菜", "汤羹", "主食", "水产", "早餐", "甜品", "饮品", "调料", "凉菜", "小吃", "烘焙"]
+CUISINES = ["川菜", "粤菜", "鲁菜", "苏菜", "浙菜", "闽菜", "湘菜", "徽菜", "东北菜", "西北菜",
+            "家常菜", "京菜", "客家菜", "云南菜", "贵州菜", "新疆菜", "台湾菜", "西餐", "日料", "韩餐"]
+NODE_TYPES = ["Recipe", "Ingredient", "CookingStep"]
+
+CONFIGS = {
+    "baseline": {"scalar_indexes": False, "partition_key": None},
+    "scalar": {"scalar_indexes": True, "partition_key": None},
+    "partition": {"scalar_indexes": True, "partition_key": "cuisine_type"},
+}
+
+FILTERS = {
+    "菜系": lambda rng: {"cuisine_type": rng.choice(CUISINES)},
+    "分类+难度": lambda rng: {"category": rng.choice(CATEGORIES), "difficulty": int(rng.integers(1, 6))},
+    "菜系+分类": lambda rng: {"cuisine_type": rng.choice(CUISINES), "category": rng.choice(CATEGORIES)},
+    "节点类型": lambda rng: {"node_type": "Recipe"},
+}
+
+
+def make_corpus(num_chunks: int, dimension: int, seed: int = 42):
+    """合成语料：类别字段按偏斜分布采样，使不同过滤条件的选择度不同"""
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((num_chunks, dimension)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def skewed(values):
+        weights = 1.0 / np.arange(1, len(values) + 1)
+        return rng.choice(len(values), size=num_chunks, p=weights / weights.sum())
+
+    return {
+        "vectors": vectors,
+        "category": np.array(CATEGORIES)[skewed(CATEGORIES)],
+        "cuisine_type": np.array(CUISINES)[skewed(CUISINES)],
+        "node_type": np.array(NODE_TYPES)[rng.choice(len(NODE_TYPES), size=num_chunks, p=[0.6, 0.25, 0.15])],
+        "difficulty": rng.integers(1, 6, size=num_chunks)
+    }
+
+
+def to_filter_expr(filters):
+    return " and ".join(f'{key} == "{value}"' if isinstance(value, str) else f"{key} == {value}"
+                        for key, value in filters.items())
+
+
+def exact_top_k(corpus, query, filters, k):
+    mask = np.ones(len(corpus["vectors"]), dtype=bool)
+    for key, value in filters.items():
+        mask &= corpus[key] == value
+    candidates = np.flatnonzero(mask)
+    scores = corpus["vectors"][candidates] @ query
+    return {f"c{i}" for i in candidates[np.argsort(-scores)[:k]]}, len(candidates)
+
+
+def build_collection(client, name, corpus, dimension, scalar_indexes, partition_key, batch_size=2000):
+    if client.has_collection(name):
+        client.drop_collection(name)
+    partition_kwargs = {"num_partitions": DEFAULT_CONFIG.milvus_num_partitions} if partition_key else {}
+    client.create_collection(collection_name=name, schema=build_collection_schema(dimension, partition_key),
+                             metric_type="COSINE", consistency_level="Strong", **partition_kwargs)
+    total = len(corpus["vectors"])
+    for start in range(0, total, batch_size):
+        client.insert(collection_name=name, data=[
+            {"id": f"c{i}", "vector": corpus["vectors"][i].tolist(), "text": "", "node_id": str(i),
+             "recipe_name": "", "node_type": str(corpus["node_type"][i]), "category": str(corpus["category"][i]),
+             "cuisine_type": str(corpus["cuisine_type"][i]), "difficulty": int(corpus["difficulty"][i]),
+             "doc_type": "chunk", "chunk_id": f"c{i}", "parent_id": str(i), "content_hash": ""}
+            for i in range(start, min(start + batch_size, total))
+        ])
+    client.flush(collection_name=name)
+
+    index_params = client.prepare_index_params()
+    add_collection_indexes(index_params, scalar_indexes, partition_key)
+    client.create_index(collection_name=name, index_params=index_params)
+    while True:
+        info = client.describe_index(collection_name=name, index_name="vector")
+        if info.get("state") == "Finished" or info.get("indexed_rows", 0) >= total:
+            break
+        time.sleep(1)
+    client.load_collection(name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="过滤向量检索基准测试")
+    parser.add_argument("--num-chunks", type=int, default=100000, help="合成文档块数量")
+    parser.add_argument("--num-queries", type=int, default=200, help="每种过滤条件的查询次数")
+    parser.add_argument("--dimension", type=int, default=DEFAULT_CONFIG.milvus_dimension, help="向量维度")
+    parser.add_argument("--top-k", type=int, default=DEFAULT_CONFIG.top_k, help="返回结果数")
+    parser.add_argument("--configs", nargs="+", choices=list(CONFIGS), default=list(CONFIGS), help="对比的集合配置")
+    args = parser.parse_args()
+
+    client = MilvusClient(uri=f"http://{DEFAULT_CONFIG.milvus_host}:{DEFAULT_CONFIG.milvus_port}")
+    corpus = make_corpus(args.num_chunks, args.dimension)
+
+    # 所有配置使用相同的查询和过滤条件
+    rng = np.random.default_rng(7)
+    queries = rng.standard_normal((args.num_queries, args.dimension)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    workload = {name: [make(rng) for _ in range(args.num_queries)] for name, make in FILTERS.items()}
+    truth = {name: [exact_top_k(corpus, queries[i], filters[i], args.top_k) for i in range(args.num_queries)]
+             for name, filters in workload.items()}
+
+    print(f"文档块: {args.num_chunks}，维度: {args.dimension}，top_k: {args.top_k}，每种过滤 {args.num_queries} 次查询")
+    print(f"{'配置':>10} {'过滤条件':>10} {'平均匹配数':>10} {'p50(ms)':>9} {'p95(ms)':>9} {'召回率':>8}")
+    for config_name in args.configs:
+        name = f"bench_filtered_{config_name}"
+        start = time.perf_counter()
+        build_collection(client, name, corpus, args.dimension, **CONFIGS[config_name])
+        print(f"{config_name:>10} 集合构建耗时 {time.perf_counter() - start:.1f}s")
+        try:
+            for filter_name, filters in workload.items():
+                latencies, recalls = [], []
+                for i, filter_values in enumerate(filters):
+                    expected, _ = truth[filter_name][i]
+                    start = time.perf_counter()
+                    results = client.search(collection_name=name, data=[queries[i].tolist()], anns_field="vector",
+                                            limit=args.top_k, filter=to_filter_expr(filter_values),
+                                            search_params={"metric_type": "COSINE", "params": {"ef": 64}})
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    found = {hit["id"] for hit in results[0]}
+                    recalls.append(len(found & expected) / len(expected) if expected else 1.0)
+                matches = np.mean([count for _, count in truth[filter_name]])
+                print(f"{config_name:>10} {filter_name:>10} {matches:>10.0f} {np.percentile(latencies, 50):>9.2f} "
+                      f"{np.percentile(latencies, 95):>9.2f} {np.mean(recalls):>8.3f}")
+        finally:
+            client.drop_collection(name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+按长度分桶的嵌入批处理基准测试
+模拟知识库构建：文档块按语料顺序每 build_batch_size 条交给向量化阶段，
+对比原先的固定条数分批与按长度分桶、token预算分批的实际token数、填充token数和向量化耗时，
+并校验两种方式得到的向量一致
+
+未分桶时的填充按后端实际的分批方式计算：torch后端（sentence-transformers）在每次调用内按长度排序后
+每32条一批，onnx-int8后端按输入顺序每32条一批
+
+用法：
+    python benchmarks/bench_length_bucketing.py --num-texts 4000 --backend torch --token-budget 8192
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import DEFAULT_CONFIG
+from rag_modules.embedding_backends import BACKENDS, create_embeddings
+from rag_modules.length_bucketing import LengthBucketedEmbeddings, padding_stats, token_length_fn
+
+INNER_BATCH_SIZE = 32
+
+
+def make_chunks(num_texts: int, max_chars: int, seed: int = 42):
+    """生成长度分布不均的菜谱文档块：多数为短块，少数接近 chunk_size"""
+    rng = random.Random(seed)
+    sentences = ["鸡蛋打散备用。", "五花肉切块焯水。", "热锅凉油，下葱姜蒜爆香。", "加入生抽、老抽和冰糖翻炒上色。",
+                 "小火慢炖四十分钟至汤汁浓稠。", "出锅前撒葱花。", "西红柿切块，"]
+    chunks = []
+    for i in range(num_texts):
+        target = min(max_chars, int(rng.paretovariate(1.2) * 40))
+        text = f"# 菜谱{i}\n"
+        while len(text) < target:
+            text += rng.choice(sentences)
+        chunks.append(text[:max_chars])
+    return chunks
+
+
+def baseline_batches(lengths, backend: str, build_batch_size: int):
+    """未分桶时底层模型实际的批次划分"""
+    batches = []
+    for start in range(0, len(lengths), build_batch_size):
+        indices = list(range(start, min(start + build_batch_size, len(lengths))))
+        if backend == "torch":
+            indices.sort(key=lambda i: -lengths[i])
+        batches.extend(indices[i:i + INNER_BATCH_SIZE] for i in range(0, len(indices), INNER_BATCH_SIZE))
+    return batches
+
+
+def run_build(embed_fn, texts, build_batch_size: int):
+    start = time.perf_counter()
+    vectors = []
+    for i in range(0, len(texts), build_batch_size):
+        vectors.extend(embed_fn(texts[i:i + build_batch_size]))
+    return np.asarray(vectors), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按长度分桶的嵌入批处理基准测试")
+    parser.add_argument("--num-texts", type=int, default=4000, help="文档块数量")
+    parser.add_argument("--backend", choices=BACKENDS, default=DEFAULT_CONFIG.embedding_backend, help="嵌入后端")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CONFIG.chunk_size, help="文档块最大字符数")
+    parser.add_argument("--build-batch-size", type=int, default=DEFAULT_CONFIG.build_batch_size,
+                        help="流式构建每批交给向量化阶段的文档块数")
+    parser.add_argument("--token-budget", type=int, default=DEFAULT_CONFIG.embedding_token_budget or 8192,
+                        help="分桶时每批的token上限")
+    parser.add_argument("--max-batch-size", type=int, default=DEFAULT_CONFIG.embedding_max_batch_size,
+                        help="分桶时每批最多文本数")
+    args = parser.parse_args()
+
+    texts = make_chunks(args.num_texts, args.chunk_size)
+    length_fn = token_length_fn(DEFAULT_CONFIG.embedding_model)
+    lengths = [length_fn(text) for text in texts]
+
+    plain = create_embeddings(args.backend, DEFAULT_CONFIG.embedding_model, device="cpu",
+                              onnx_model_dir=DEFAULT_CONFIG.onnx_model_dir, batch_size=INNER_BATCH_SIZE)
+    bucketed = LengthBucketedEmbeddings(
+        create_embeddings(args.backend, DEFAULT_CONFIG.embedding_model, device="cpu",
+                          onnx_model_dir=DEFAULT_CONFIG.onnx_model_dir, batch_size=args.max_batch_size),
+        length_fn,
+        token_budget=args.token_budget,
+        max_batch_size=args.max_batch_size
+    )
+    # 预热
+    plain.embed_documents(texts[:32])
+    bucketed.embed_documents(texts[:32])
+    bucketed.documents = bucketed.batches = bucketed.tokens = bucketed.padded_tokens = 0
+
+    reference, plain_time = run_build(plain.embed_documents, texts, args.build_batch_size)
+    vectors, bucketed_time = run_build(bucketed.embed_documents, texts, args.build_batch_size)
+
+    tokens, plain_padded = padding_stats(lengths, baseline_batches(lengths, args.backend, args.build_batch_size))
+    stats = bucketed.get_stats()
+    bucketed_padded = stats["tokens"] + stats["padding_tokens"]
+
+    print(f"后端: {args.backend}，文档块: {len(texts)}，实际token: {tokens}，"
+          f"平均长度: {np.mean(lengths):.1f}，最大长度: {max(lengths)}")
+    print(f"{'方式':>10} {'填充后token':>12} {'填充token':>10} {'填充占比':>9} {'耗时(s)':>9} {'块/秒':>9}")
+    for name, padded, elapsed in (("固定条数", plain_padded, plain_time), ("长度分桶", bucketed_padded, bucketed_time)):
+        print(f"{name:>10} {padded:>12} {padded - tokens:>10} {(padded - tokens) / padded:>8.1%} "
+              f"{elapsed:>9.2f} {len(texts) / elapsed:>9.1f}")
+    print(f"\n构建加速比: {plain_time / bucketed_time:.2f}x，"
+          f"向量最大差异: {float(np.max(np.abs(vectors - reference))):.2e}")
+
+
+if __name__ == "__main__":
+    main()
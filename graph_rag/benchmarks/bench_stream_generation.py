@@ -0,0 +1,204 @@
+"""
+流式生成基准测试
+启动一个本地的OpenAI兼容假LLM服务（按固定间隔逐个输出token），在同一个事件循环中
+并发消费多路流式响应，对比：
+- sync:  在异步生成器中直接迭代同步的 generate_adaptive_answer_stream（原实现）
+- async: 迭代 agenerate_adaptive_answer_stream
+
+统计首字节时间（TTFB）、总耗时、事件循环最大停顿，以及满足TTFB目标的最大并发流数。
+最后验证关闭生成器会中止上游请求
+
+用法：
+    python benchmarks/bench_stream_generation.py --concurrency 1 4 16 64 --tokens 50 --token-delay 0.02
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.documents import Document
+
+from rag_modules.generation_integration import GenerationIntegrationModule
+
+
+class FakeLLMServer:
+    """OpenAI兼容的假LLM服务，只实现 /chat/completions"""
+
+    def __init__(self, tokens: int, token_delay: float):
+        self.tokens = tokens
+        self.token_delay = token_delay
+        self.aborted = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self.httpd.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}/v1/"
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _write_chunk(self, data: bytes):
+                self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+
+                if not body.get("stream"):
+                    time.sleep(server.token_delay * server.tokens)
+                    payload = json.dumps({
+                        "id": "fake", "object": "chat.completion", "created": 0, "model": "fake",
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": "字" * server.tokens}}]
+                    }).encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    for _ in range(server.tokens):
+                        time.sleep(server.token_delay)
+                        chunk = {
+                            "id": "fake", "object": "chat.completion.chunk", "created": 0, "model": "fake",
+                            "choices": [{"index": 0, "delta": {"content": "字"}, "finish_reason": None}]
+                        }
+                        self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self._write_chunk(b"data: [DONE]\n\n")
+                    self.wfile.write(b"0\r\n\r\n")
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    with server._lock:
+                        server.aborted += 1
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.httpd.shutdown()
+
+
+def percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+async def sync_stream(module, question, documents):
+    """原实现：在异步生成器中直接迭代同步迭代器，每次等待token都会阻塞事件循环"""
+    for chunk in module.generate_adaptive_answer_stream(question, documents):
+        yield chunk
+
+
+async def async_stream(module, question, documents):
+    async for chunk in module.agenerate_adaptive_answer_stream(question, documents):
+        yield chunk
+
+
+async def consume(stream_factory, module, documents):
+    """消费一路流式响应，返回(TTFB, 总耗时)"""
+    start = time.perf_counter()
+    ttfb = None
+    async for _ in stream_factory(module, "红烧肉怎么做？", documents):
+        if ttfb is None:
+            ttfb = time.perf_counter() - start
+    return ttfb or 0.0, time.perf_counter() - start
+
+
+async def measure_loop_lag(stop: asyncio.Event, interval: float = 0.01) -> float:
+    """测量事件循环的最大停顿时间"""
+    max_lag = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        max_lag = max(max_lag, time.perf_counter() - start - interval)
+    return max_lag
+
+
+async def run_level(stream_factory, module, documents, concurrency: int):
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(stop))
+    start = time.perf_counter()
+    results = await asyncio.gather(*(consume(stream_factory, module, documents) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    return [r[0] for r in results], elapsed, await lag_task
+
+
+async def check_cancellation(module, server: FakeLLMServer, documents) -> bool:
+    """读取几个token后关闭生成器，确认上游请求被中止"""
+    aborted_before = server.aborted
+    stream = module.agenerate_adaptive_answer_stream("红烧肉怎么做？", documents)
+    received = 0
+    async for _ in stream:
+        received += 1
+        if received >= 3:
+            break
+    await stream.aclose()
+
+    # 服务端在下一次写入时才能感知连接关闭
+    await asyncio.sleep(server.token_delay * 5 + 0.2)
+    return server.aborted > aborted_before
+
+
+async def main_async(args):
+    server = FakeLLMServer(tokens=args.tokens, token_delay=args.token_delay)
+    server.start()
+    os.environ.setdefault("INTERN_API_KEY", "fake")
+    module = GenerationIntegrationModule(model_name="fake", base_url=server.base_url)
+    documents = [Document(page_content="红烧肉的做法：五花肉切块焯水，炒糖色后炖煮一小时。")]
+
+    try:
+        for mode, factory in (("sync", sync_stream), ("async", async_stream)):
+            print(f"\n模式: {mode}")
+            print(f"{'并发数':>6} {'TTFB p50(s)':>12} {'TTFB p99(s)':>12} {'总耗时(s)':>10} {'循环最大停顿(s)':>16}")
+            capacity = 0
+            for concurrency in args.concurrency:
+                ttfbs, elapsed, lag = await run_level(factory, module, documents, concurrency)
+                p99 = percentile(ttfbs, 99)
+                if p99 <= args.ttfb_slo:
+                    capacity = concurrency
+                print(f"{concurrency:>6} {percentile(ttfbs, 50):>12.3f} {p99:>12.3f} {elapsed:>10.2f} {lag:>16.3f}")
+            print(f"TTFB p99 <= {args.ttfb_slo}s 的最大并发流数: {capacity}")
+
+        print(f"\n关闭生成器后上游请求被中止: {await check_cancellation(module, server, documents)}")
+    finally:
+        server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="流式生成TTFB与并发能力基准测试")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64], help="并发流数")
+    parser.add_argument("--tokens", type=int, default=50, help="每个回答的token数")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="假LLM每个token的间隔秒数")
+    parser.add_argument("--ttfb-slo", type=float, default=0.5, help="并发能力判定的TTFB目标（秒）")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,7 @@
 """
 
 from dataclasses import dataclass
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 @dataclass
 class GraphRAGConfig:
@@ -14,20 +14,42 @@ class GraphRAGConfig:
     neo4j_user: str = "neo4j"
     neo4j_password: str = "all-in-rag"
     neo4j_database: str = "neo4j"
+    neo4j_max_connection_pool_size: int = 50  # 全系统共享的Neo4j连接池上限
+    neo4j_connection_acquisition_timeout: float = 30.0  # 从连接池获取连接的超时秒数
+    neo4j_fetch_size: int = 1000  # 每批从Neo4j拉取的记录数
+    neo4j_max_transaction_retry_time: float = 15.0  # 只读事务遇到瞬时错误时的最长重试秒数
 
     # Milvus配置
     milvus_host: str = "localhost"
     milvus_port: int = 19530
-    milvus_collection_name: str = "cooking_knowledge"
+    milvus_collection_name: str = "cooking_knowledge"  # 检索使用的别名，实际数据在版本化集合 {name}_v{n} 中
     milvus_dimension: int = 512  # BGE-small-zh-v1.5的向量维度
 
     # 模型配置
     embedding_model: str = "BAAI/bge-small-zh-v1.5"
     llm_model: str = "intern-s1"
+    llm_base_url: str = "https://chat.intern-ai.org.cn/api/v1/"  # OpenAI兼容接口地址
+    embedding_cache_dir: Optional[str] = "./embedding_cache"  # 嵌入向量持久化缓存目录，None表示不启用
+    embedding_cache_capacity: int = 100000  # 嵌入缓存最多保存的向量条数
+    embedding_cache_flush_every: int = 4096  # 嵌入缓存每写入多少条持久化一次索引
+    embedding_workers: int = 0  # 构建知识库时文档向量化的工作进程数，0或1表示单进程
+    embedding_threads_per_worker: Optional[int] = None  # 每个向量化进程的torch线程数，None表示CPU核数平分
+    embedding_backend: str = "torch"  # 嵌入推理后端：torch / onnx-int8（CPU上的ONNX Runtime动态int8量化模型）
+    onnx_model_dir: str = "./onnx_models"  # onnx-int8后端的模型导出目录，首次使用时自动导出
+    embedding_token_budget: int = 8192  # 文档向量化按长度分桶时每批的token上限（条数×批内最大长度），0表示按语料顺序固定条数分批
+    embedding_max_batch_size: int = 256  # 按长度分桶时每批最多文本数
+    query_embedding_cache_size: int = 1024  # 查询向量LRU缓存容量，0表示不启用
+    query_embedding_cache_ttl: Optional[float] = None  # 查询向量缓存过期秒数，None表示永不过期
 
     # 检索配置（LightRAG Round-robin策略）
     top_k: int = 5
 
+    # 语义答案缓存配置
+    enable_answer_cache: bool = True
+    answer_cache_threshold: float = 0.92  # 命中所需的最小余弦相似度；另要求两个问题的实体链接关键词一致
+    answer_cache_size: int = 512  # 最多缓存的答案数量
+    answer_cache_ttl: Optional[float] = 3600  # 答案缓存过期秒数，None表示永不过期
+
     # 生成配置
     temperature: float = 0.1
     max_tokens: int = 2048
@@ -36,6 +58,39 @@ class GraphRAGConfig:
     chunk_size: int = 500
     chunk_overlap: int = 50
     max_graph_depth: int = 2  # 图遍历最大深度
+    enable_graph_snapshot: bool = False  # 在进程内加载CSR图快照，多跳遍历和子图提取不再访问Neo4j
+    graph_snapshot_max_paths: int = 20000  # 本地多跳遍历单次最多枚举的路径数
+    enable_graph_statistics: bool = True  # 构建/同步知识库时物化节点度数（n.degree），路径评分直接读取
+    enable_pagerank: bool = False  # 同时物化PageRank（n.pagerank）
+    enable_graph_schema_bootstrap: bool = True  # 启动时幂等创建检索依赖的Neo4j索引并检查查询计划
+    graph_index_wait_timeout: int = 300  # 等待新建索引上线的秒数
+    enable_entity_linker: bool = True  # 用本地Aho-Corasick实体链接提取检索关键词，未命中时才调用LLM
+    entity_synonyms_path: Optional[str] = None  # 额外同义词表（JSON: [[写法1, 写法2], ...]）
+    enable_query_planner: bool = True  # 一次LLM调用同时规划路由策略、图查询和检索关键词
+    enable_speculative_retrieval: bool = True  # 路由决策期间提前执行向量检索，路由到传统/组合检索时直接复用
+    enable_local_router: bool = True  # 用BGE向量kNN做查询路由，置信度不足时才调用LLM分析
+    local_router_threshold: float = 0.7  # 采用本地路由决策所需的最小置信度
+    local_router_k: int = 5  # 本地路由kNN近邻数
+    local_router_log_path: Optional[str] = "./router_cache/llm_decisions.jsonl"  # LLM路由决策日志，用于重训
+    local_router_retrain_interval: int = 50  # 每新增多少条LLM决策重训一次
+    local_router_shadow_rate: float = 0.05  # 本地决策中抽样交给LLM对照的比例，用于统计一致率
+    document_batch_size: int = 500  # 批量构建菜谱文档时每批的菜谱数量
+    build_batch_size: int = 256  # 流式构建向量索引时每批向量化/插入的文档块数
+    build_queue_size: int = 4  # 流式构建阶段间队列最多缓存的批次数（决定构建期间的内存上限）
+    build_job_history: int = 20  # 保留的已结束构建任务数（供状态查询）
+    index_build_timeout: float = 600.0  # 等待Milvus向量索引构建完成的最长秒数
+    index_poll_interval: float = 0.5  # 查询Milvus索引构建进度的间隔秒数
+    milvus_version_gc_grace_seconds: float = 300.0  # 重建后别名切换到新版本，旧版本集合保留多少秒后删除
+    milvus_scalar_indexes: bool = True  # 为过滤字段（node_type/category/difficulty/cuisine_type）创建标量索引
+    milvus_partition_key: Optional[str] = None  # 分区键字段：cuisine_type / category，None表示不分区（修改后需全量重建）
+    milvus_num_partitions: int = 16  # 使用分区键时的分区数
+
+    # 并发配置
+    executor_max_workers: int = 16  # 共享线程池大小，承载API请求中的同步检索和向量化
+    retrieval_branch_workers: int = 8  # 混合检索分支并发执行的线程数
+    retrieval_branch_timeout: float = 15.0  # 单次混合检索中各分支的超时秒数，超时分支按空结果处理
+    neighbor_cache_size: int = 4096  # 邻居名称LRU缓存容量
+    neighbor_cache_ttl: Optional[float] = None  # 邻居缓存过期秒数，None表示永不过期（知识库重建时清空）
 
     def __post_init__(self):
         """初始化后的处理"""
@@ -54,19 +109,70 @@ class GraphRAGConfig:
             'neo4j_user': self.neo4j_user,
             'neo4j_password': self.neo4j_password,
             'neo4j_database': self.neo4j_database,
+            'neo4j_max_connection_pool_size': self.neo4j_max_connection_pool_size,
+            'neo4j_connection_acquisition_timeout': self.neo4j_connection_acquisition_timeout,
+            'neo4j_fetch_size': self.neo4j_fetch_size,
+            'neo4j_max_transaction_retry_time': self.neo4j_max_transaction_retry_time,
             'milvus_host': self.milvus_host,
             'milvus_port': self.milvus_port,
             'milvus_collection_name': self.milvus_collection_name,
             'milvus_dimension': self.milvus_dimension,
             'embedding_model': self.embedding_model,
             'llm_model': self.llm_model,
+            'llm_base_url': self.llm_base_url,
+            'embedding_cache_dir': self.embedding_cache_dir,
+            'embedding_cache_capacity': self.embedding_cache_capacity,
+            'embedding_cache_flush_every': self.embedding_cache_flush_every,
+            'embedding_workers': self.embedding_workers,
+            'embedding_threads_per_worker': self.embedding_threads_per_worker,
+            'embedding_backend': self.embedding_backend,
+            'onnx_model_dir': self.onnx_model_dir,
+            'embedding_token_budget': self.embedding_token_budget,
+            'embedding_max_batch_size': self.embedding_max_batch_size,
+            'query_embedding_cache_size': self.query_embedding_cache_size,
+            'query_embedding_cache_ttl': self.query_embedding_cache_ttl,
             'top_k': self.top_k,
+            'enable_answer_cache': self.enable_answer_cache,
+            'answer_cache_threshold': self.answer_cache_threshold,
+            'answer_cache_size': self.answer_cache_size,
+            'answer_cache_ttl': self.answer_cache_ttl,
 
             'temperature': self.temperature,
             'max_tokens': self.max_tokens,
             'chunk_size': self.chunk_size,
             'chunk_overlap': self.chunk_overlap,
-            'max_graph_depth': self.max_graph_depth
+            'max_graph_depth': self.max_graph_depth,
+            'enable_graph_snapshot': self.enable_graph_snapshot,
+            'graph_snapshot_max_paths': self.graph_snapshot_max_paths,
+            'enable_graph_statistics': self.enable_graph_statistics,
+            'enable_pagerank': self.enable_pagerank,
+            'enable_graph_schema_bootstrap': self.enable_graph_schema_bootstrap,
+            'graph_index_wait_timeout': self.graph_index_wait_timeout,
+            'enable_entity_linker': self.enable_entity_linker,
+            'entity_synonyms_path': self.entity_synonyms_path,
+            'enable_query_planner': self.enable_query_planner,
+            'enable_speculative_retrieval': self.enable_speculative_retrieval,
+            'enable_local_router': self.enable_local_router,
+            'local_router_threshold': self.local_router_threshold,
+            'local_router_k': self.local_router_k,
+            'local_router_log_path': self.local_router_log_path,
+            'local_router_retrain_interval': self.local_router_retrain_interval,
+            'local_router_shadow_rate': self.local_router_shadow_rate,
+            'document_batch_size': self.document_batch_size,
+            'build_batch_size': self.build_batch_size,
+            'build_queue_size': self.build_queue_size,
+            'build_job_history': self.build_job_history,
+            'index_build_timeout': self.index_build_timeout,
+            'index_poll_interval': self.index_poll_interval,
+            'milvus_version_gc_grace_seconds': self.milvus_version_gc_grace_seconds,
+            'milvus_scalar_indexes': self.milvus_scalar_indexes,
+            'milvus_partition_key': self.milvus_partition_key,
+            'milvus_num_partitions': self.milvus_num_partitions,
+            'executor_max_workers': self.executor_max_workers,
+            'retrieval_branch_workers': self.retrieval_branch_workers,
+            'retrieval_branch_timeout': self.retrieval_branch_timeout,
+            'neighbor_cache_size': self.neighbor_cache_size,
+            'neighbor_cache_ttl': self.neighbor_cache_ttl
         }
 
 # 默认配置实例
@@ -75,7 +75,9 @@ async def root():
             "健康检查": "/api/health",
             "知识库管理": {
                 "状态查询": "GET /api/knowledge-base/status",
-                "构建/加载": "POST /api/knowledge-base/build",
+                "构建/加载（后台任务）": "POST /api/knowledge-base/build",
+                "构建任务状态": "GET /api/knowledge-base/build/{job_id}",
+                "构建进度流": "GET /api/knowledge-base/build/{job_id}/events",
                 "卸载": "POST /api/knowledge-base/unload",
                 "删除（慎用）": "DELETE /api/knowledge-base"
             },
@@ -91,8 +93,8 @@ async def root():
         },
         "usage_steps": [
             "1. 启动服务后，首先调用 GET /api/health 检查服务状态",
-            "2. 调用 POST /api/knowledge-base/build 构建知识库",
-            "3. 调用 GET /api/knowledge-base/status 确认构建成功",
+            "2. 调用 POST /api/knowledge-base/build 提交构建任务，记下返回的 job_id",
+            "3. 调用 GET /api/knowledge-base/build/{job_id} 查看进度，确认任务状态为 succeeded",
             "4. 开始使用 POST /api/ask 进行问答"
         ]
     }
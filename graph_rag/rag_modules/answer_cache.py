@@ -0,0 +1,293 @@
+"""
+语义答案缓存模块
+用BGE向量表示问题，余弦相似度超过阈值即复用已生成的答案：
+- 近似重复的问题（如“红烧肉怎么做”与“红烧肉的做法”）直接命中
+- 句式相同、只有菜名或食材不同的问题（如“红烧肉怎么做”与“红烧鱼怎么做”）向量相似度也很高，
+  因此命中时还要求两个问题的实体链接关键词完全一致
+- 保存流式输出的分块，便于按SSE原样回放
+- 记录答案引用的节点ID，知识库增量同步时只失效受影响的条目
+- 请求开始时记录缓存版本快照，生成期间知识库发生变化的答案不写入缓存
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedAnswer:
+    """缓存的答案条目"""
+    question: str
+    answer: str
+    chunks: List[str]
+    analysis: Any
+    node_ids: Optional[Set[str]]  # 答案引用的节点ID，None表示来源未知
+    kb_version: int
+    keywords: FrozenSet[str] = frozenset()  # 问题的实体链接关键词
+    created_at: float = field(default_factory=time.time)
+    hits: int = 0
+
+
+class SemanticAnswerCache:
+    """
+    语义答案缓存 - 线程安全
+    问题向量存放在固定容量的矩阵中，查找时一次矩阵乘法得到全部相似度
+    """
+
+    def __init__(self,
+                 embed_fn: Callable[[str], List[float]],
+                 keyword_fn: Optional[Callable[[str], FrozenSet[str]]] = None,
+                 threshold: float = 0.92,
+                 capacity: int = 512,
+                 ttl: Optional[float] = None):
+        """
+        初始化语义答案缓存
+
+        Args:
+            embed_fn: 问题向量化函数（复用已加载的BGE模型）
+            keyword_fn: 问题关键词提取函数（本地实体链接），命中要求关键词一致；None表示只比较相似度
+            threshold: 命中所需的最小余弦相似度
+            capacity: 最多缓存的答案数量
+            ttl: 条目存活秒数，None表示永不过期
+        """
+        if capacity <= 0:
+            raise ValueError("缓存容量必须大于0")
+
+        self.embed_fn = embed_fn
+        self.keyword_fn = keyword_fn
+        self.threshold = threshold
+        self.capacity = capacity
+        self.ttl = ttl
+
+        self.kb_version = 0
+        # 每次失效递增；写入时与请求开始时的快照比较，丢弃基于过期知识生成的答案
+        self.generation = 0
+        self._full_invalidation = 0  # 最近一次全部失效时的 generation
+        self._last_node_invalidation = 0  # 最近一次按节点失效时的 generation
+        self._node_invalidations: Dict[str, int] = {}  # 节点ID → 最近一次失效时的 generation
+        self._matrix: Optional[np.ndarray] = None
+        self._valid = np.zeros(capacity, dtype=bool)
+        self._entries: Dict[int, CachedAnswer] = {}
+        self._lru: "OrderedDict[int, None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.stale_writes = 0
+        self.keyword_mismatches = 0
+
+    def _embed(self, question: str) -> np.ndarray:
+        vector = np.asarray(self.embed_fn(question.strip()), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _keywords(self, question: str) -> FrozenSet[str]:
+        return frozenset(self.keyword_fn(question)) if self.keyword_fn else frozenset()
+
+    def _remove_slot(self, slot: int):
+        self._valid[slot] = False
+        self._entries.pop(slot, None)
+        self._lru.pop(slot, None)
+
+    def _is_expired(self, entry: CachedAnswer) -> bool:
+        if entry.kb_version != self.kb_version:
+            return True
+        return bool(self.ttl) and time.time() - entry.created_at > self.ttl
+
+    def _is_stale_write(self, snapshot: int, node_ids: Optional[Set[str]]) -> bool:
+        """快照之后是否发生过影响该答案的失效（来源未知的答案遇到任何失效都视为过期）"""
+        if snapshot >= self.generation:
+            return False
+        if self._full_invalidation > snapshot:
+            return True
+        if node_ids is None:
+            return self._last_node_invalidation > snapshot
+        return any(self._node_invalidations.get(node_id, 0) > snapshot for node_id in node_ids)
+
+    def snapshot(self) -> int:
+        """
+        当前缓存版本快照，在请求开始（查找缓存或检索之前）时获取，写入答案时传给 store
+
+        Returns:
+            版本号
+        """
+        with self._lock:
+            return self.generation
+
+    def lookup(self, question: str) -> Optional[Tuple[CachedAnswer, float]]:
+        """
+        查找语义相近的已缓存答案
+
+        Args:
+            question: 用户问题
+
+        Returns:
+            (缓存条目, 相似度)，未命中返回None
+        """
+        query_vector = self._embed(question)
+        keywords = self._keywords(question)
+
+        with self._lock:
+            if self._matrix is None or not self._valid.any():
+                self.misses += 1
+                return None
+
+            similarities = self._matrix @ query_vector
+            similarities[~self._valid] = -np.inf
+
+            # 跳过已失效的条目，直到找到有效的最相似条目
+            while True:
+                slot = int(np.argmax(similarities))
+                similarity = float(similarities[slot])
+                if similarity < self.threshold:
+                    self.misses += 1
+                    return None
+
+                entry = self._entries[slot]
+                if self._is_expired(entry):
+                    self._remove_slot(slot)
+                    self.invalidations += 1
+                    similarities[slot] = -np.inf
+                    continue
+
+                if entry.keywords != keywords:
+                    # 句式相近但菜名、食材等不同，不能复用对方的答案
+                    self.keyword_mismatches += 1
+                    similarities[slot] = -np.inf
+                    continue
+
+                entry.hits += 1
+                self._lru.move_to_end(slot)
+                self.hits += 1
+                logger.info(f"答案缓存命中: '{question[:30]}' ≈ '{entry.question[:30]}' (相似度 {similarity:.3f})")
+                return entry, similarity
+
+    def store(self,
+              question: str,
+              answer: str,
+              chunks: Optional[List[str]] = None,
+              analysis: Any = None,
+              node_ids: Optional[Iterable[str]] = None,
+              snapshot: Optional[int] = None) -> bool:
+        """
+        缓存答案
+
+        Args:
+            question: 用户问题
+            answer: 完整答案
+            chunks: 流式输出的分块（非流式时为整个答案）
+            analysis: 查询分析结果
+            node_ids: 答案引用的节点ID，None表示来源未知
+            snapshot: 请求开始时的版本快照（snapshot()），快照之后相关内容已失效时不写入
+
+        Returns:
+            是否写入
+        """
+        vector = self._embed(question)
+        keywords = self._keywords(question)
+        node_ids = set(node_ids) if node_ids is not None else None
+
+        with self._lock:
+            if snapshot is not None and self._is_stale_write(snapshot, node_ids):
+                self.stale_writes += 1
+                logger.info(f"知识库在生成期间已变化，丢弃缓存写入: '{question[:30]}'")
+                return False
+
+            if self._matrix is None:
+                self._matrix = np.zeros((self.capacity, vector.shape[0]), dtype=np.float32)
+
+            free_slots = np.flatnonzero(~self._valid)
+            if len(free_slots) > 0:
+                slot = int(free_slots[0])
+            else:
+                slot, _ = self._lru.popitem(last=False)
+                self._remove_slot(slot)
+                self.evictions += 1
+
+            self._matrix[slot] = vector
+            self._valid[slot] = True
+            self._entries[slot] = CachedAnswer(
+                question=question,
+                answer=answer,
+                chunks=list(chunks) if chunks else [answer],
+                analysis=analysis,
+                node_ids=node_ids,
+                kb_version=self.kb_version,
+                keywords=keywords
+            )
+            self._lru[slot] = None
+            self.stores += 1
+        return True
+
+    def invalidate_all(self):
+        """知识库重建或卸载后使全部条目失效"""
+        with self._lock:
+            self.kb_version += 1
+            self.generation += 1
+            self._full_invalidation = self.generation
+            self._node_invalidations.clear()
+            count = len(self._entries)
+            for slot in list(self._entries):
+                self._remove_slot(slot)
+            self.invalidations += count
+        logger.info(f"答案缓存已全部失效 ({count} 条)")
+
+    def invalidate_nodes(self, node_ids: Iterable[str]) -> int:
+        """
+        使引用了指定节点（或来源未知）的条目失效
+
+        Args:
+            node_ids: 内容发生变化的节点ID
+
+        Returns:
+            失效的条目数量
+        """
+        changed = set(node_ids)
+        if not changed:
+            return 0
+
+        with self._lock:
+            self.generation += 1
+            self._last_node_invalidation = self.generation
+            for node_id in changed:
+                self._node_invalidations[node_id] = self.generation
+
+            stale_slots = [
+                slot for slot, entry in self._entries.items()
+                if entry.node_ids is None or entry.node_ids & changed
+            ]
+            for slot in stale_slots:
+                self._remove_slot(slot)
+            self.invalidations += len(stale_slots)
+
+        logger.info(f"答案缓存失效 {len(stale_slots)} 条（涉及 {len(changed)} 个变更节点）")
+        return len(stale_slots)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "capacity": self.capacity,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "stale_writes": self.stale_writes,
+                "keyword_mismatches": self.keyword_mismatches,
+                "hit_rate": self.hits / total if total else 0.0
+            }
@@ -0,0 +1,281 @@
+"""
+知识库构建任务模块
+构建请求不再在HTTP请求中同步执行，而是提交给后台的单一构建线程：
+- 同一时刻最多只有一个构建在运行，参数相同的请求加入已排队或正在运行的任务，不会重复删除、重建集合
+- 构建过程按阶段（图数据加载、文档构建、分块、向量化、插入、索引）报告条目数、速率和预计剩余时间
+"""
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+BUILD_STAGES = ("graph_load", "documents", "chunking", "embedding", "insert", "index")
+
+# 任务状态
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+@dataclass
+class StageProgress:
+    """单个阶段的进度"""
+    name: str
+    status: str = "pending"  # pending / running / done / skipped
+    total: Optional[int] = None
+    completed: int = 0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        elapsed = ((self.finished_at or time.time()) - self.started_at) if self.started_at else 0.0
+        rate = self.completed / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if self.status == "running" and self.total is not None and rate > 0:
+            eta = round(max(self.total - self.completed, 0) / rate, 1)
+        return {
+            "name": self.name,
+            "status": self.status,
+            "total": self.total,
+            "completed": self.completed,
+            "elapsed_seconds": round(elapsed, 2),
+            "items_per_second": round(rate, 1),
+            "eta_seconds": eta
+        }
+
+
+class BuildProgress:
+    """
+    线程安全的分阶段构建进度
+    各模块按阶段名报告进度；每次更新递增版本号，供进度流判断是否有新数据
+    """
+
+    def __init__(self, stages: Tuple[str, ...] = BUILD_STAGES):
+        self._stages: Dict[str, StageProgress] = {name: StageProgress(name) for name in stages}
+        self._lock = threading.Lock()
+        self.version = 0
+
+    def _stage(self, name: str) -> StageProgress:
+        stage = self._stages[name]
+        if stage.status == "pending":
+            stage.status = "running"
+            stage.started_at = time.time()
+        return stage
+
+    def start(self, name: str, total: Optional[int] = None):
+        """开始一个阶段"""
+        with self._lock:
+            stage = self._stage(name)
+            if total is not None:
+                stage.total = total
+            self.version += 1
+
+    def set_total(self, name: str, total: int):
+        """设置阶段的总条目数（流式阶段在上游结束后才能确定）"""
+        with self._lock:
+            self._stages[name].total = total
+            self.version += 1
+
+    def advance(self, name: str, count: int = 1):
+        """阶段完成了 count 个条目"""
+        with self._lock:
+            self._stage(name).completed += count
+            self.version += 1
+
+    def update(self, name: str, completed: int, total: Optional[int] = None):
+        """直接设置阶段的完成数（如Milvus报告的已建索引行数）"""
+        with self._lock:
+            stage = self._stage(name)
+            stage.completed = completed
+            if total is not None:
+                stage.total = total
+            self.version += 1
+
+    def finish(self, name: str):
+        """结束一个阶段；未设置总数时以完成数作为总数"""
+        with self._lock:
+            stage = self._stage(name)
+            stage.status = "done"
+            stage.finished_at = time.time()
+            if stage.total is None:
+                stage.total = stage.completed
+            self.version += 1
+
+    def skip(self, name: str):
+        """跳过一个阶段（如加载已有集合时无需向量化）"""
+        with self._lock:
+            stage = self._stages[name]
+            if stage.status == "pending":
+                stage.status = "skipped"
+                self.version += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """当前进度；流式阶段同时运行，整体预计剩余时间取各运行阶段的最大值"""
+        with self._lock:
+            stages = [stage.to_dict() for stage in self._stages.values()]
+            version = self.version
+        running = [stage for stage in stages if stage["status"] == "running"]
+        etas = [stage["eta_seconds"] for stage in running if stage["eta_seconds"] is not None]
+        return {
+            "version": version,
+            "current_stages": [stage["name"] for stage in running],
+            "eta_seconds": max(etas) if etas else None,
+            "stages": stages
+        }
+
+
+@dataclass
+class BuildJob:
+    """一次知识库构建任务"""
+    force_rebuild: bool
+    incremental: bool
+    job_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = QUEUED
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    progress: BuildProgress = field(default_factory=BuildProgress)
+    done: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def active(self) -> bool:
+        return self.status in (QUEUED, RUNNING)
+
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
+        data = {
+            "job_id": self.job_id,
+            "status": self.status,
+            "force_rebuild": self.force_rebuild,
+            "incremental": self.incremental,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "progress": self.progress.snapshot()
+        }
+        if include_result:
+            data["result"] = self.result
+        return data
+
+
+class BuildJobManager:
+    """
+    单飞的知识库构建任务管理器
+    所有任务在同一个后台线程中依次执行
+    """
+
+    def __init__(self, runner: Callable[..., Dict[str, Any]], max_history: int = 20):
+        """
+        初始化任务管理器
+
+        Args:
+            runner: 构建函数，以 force_rebuild、incremental、progress 关键字参数调用，返回构建结果
+            max_history: 保留的已结束任务数
+        """
+        self.runner = runner
+        self.max_history = max_history
+
+        self._jobs: "OrderedDict[str, BuildJob]" = OrderedDict()
+        self._queue: Deque[BuildJob] = deque()
+        self._condition = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+        self._closed = False
+
+    def submit(self, force_rebuild: bool = False, incremental: bool = False) -> Tuple[BuildJob, bool]:
+        """
+        提交构建任务
+
+        Returns:
+            (任务, 是否加入了已有任务)
+        """
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("构建任务管理器已关闭")
+
+            # 参数相同的请求加入已排队或正在运行的任务
+            for job in self._jobs.values():
+                if job.active and job.force_rebuild == force_rebuild and job.incremental == incremental:
+                    logger.info(f"加入已有构建任务: {job.job_id} ({job.status})")
+                    return job, True
+
+            job = BuildJob(force_rebuild=force_rebuild, incremental=incremental)
+            self._jobs[job.job_id] = job
+            self._queue.append(job)
+            self._prune()
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run_loop, name="kb_build", daemon=True)
+                self._worker.start()
+            self._condition.notify()
+
+        logger.info(f"已提交构建任务: {job.job_id} (force_rebuild={force_rebuild}, incremental={incremental})")
+        return job, False
+
+    def get(self, job_id: str) -> Optional[BuildJob]:
+        with self._condition:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[BuildJob]:
+        """按提交时间倒序返回任务"""
+        with self._condition:
+            return list(reversed(self._jobs.values()))
+
+    def is_busy(self) -> bool:
+        """是否有排队或正在运行的构建"""
+        with self._condition:
+            return any(job.active for job in self._jobs.values())
+
+    def _prune(self):
+        """只保留最近的已结束任务"""
+        finished = [job_id for job_id, job in self._jobs.items() if not job.active]
+        for job_id in finished[:max(0, len(finished) - self.max_history)]:
+            del self._jobs[job_id]
+
+    def _run_loop(self):
+        while True:
+            with self._condition:
+                while not self._queue and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                job = self._queue.popleft()
+                job.status = RUNNING
+                job.started_at = time.time()
+
+            logger.info(f"开始执行构建任务: {job.job_id}")
+            try:
+                result = self.runner(force_rebuild=job.force_rebuild, incremental=job.incremental,
+                                     progress=job.progress)
+                status, error = SUCCEEDED, None
+            except Exception as e:
+                logger.error(f"构建任务失败 {job.job_id}: {e}")
+                result, status, error = None, FAILED, str(e)
+
+            with self._condition:
+                job.result = result
+                job.error = error
+                job.status = status
+                job.finished_at = time.time()
+                self._prune()
+            job.done.set()
+            logger.info(f"构建任务结束: {job.job_id} ({status})，耗时 {job.finished_at - job.started_at:.1f}秒")
+
+    def shutdown(self):
+        """停止接收新任务；正在运行的构建会执行完，排队中的任务标记为失败"""
+        with self._condition:
+            self._closed = True
+            while self._queue:
+                job = self._queue.popleft()
+                job.status = FAILED
+                job.error = "系统关闭，任务未执行"
+                job.finished_at = time.time()
+                job.done.set()
+            self._condition.notify_all()
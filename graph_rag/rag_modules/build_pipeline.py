@@ -0,0 +1,276 @@
+"""
+流式索引构建流水线
+文档块 → 向量化 → 插入Milvus 三个阶段各占一个线程，阶段之间用有界队列连接：
+- 向量化和插入同时进行，CPU和网络不再轮流空闲
+- 任意时刻在内存中的向量只有队列容量内的几个批次，峰值内存与语料规模无关
+- 分阶段统计吞吐（块/秒）和阶段运行期间观测到的峰值RSS
+"""
+
+import logging
+import os
+import queue
+import resource
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+# 队列结束标记
+_DONE = object()
+
+
+def current_rss_mb() -> float:
+    """当前进程的常驻内存（MB）；无法读取 /proc 时退化为进程生命周期内的峰值"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except Exception:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS 上以字节为单位，Linux 上以KB为单位
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+@dataclass
+class StageStats:
+    """单个阶段的统计信息"""
+    name: str
+    items: int = 0
+    batches: int = 0
+    busy_seconds: float = 0.0  # 阶段实际处理数据的耗时（不含等待上下游）
+    wait_seconds: float = 0.0  # 等待上游数据或下游队列空位的耗时
+    peak_rss_mb: float = 0.0
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, items: int, busy: float):
+        rss = current_rss_mb()
+        with self._lock:
+            self.items += items
+            self.batches += 1
+            self.busy_seconds += busy
+            self.peak_rss_mb = max(self.peak_rss_mb, rss)
+
+    def to_dict(self) -> Dict[str, Any]:
+        wall = (self.finished or time.perf_counter()) - self.started if self.started else 0.0
+        return {
+            "items": self.items,
+            "batches": self.batches,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "wait_seconds": round(self.wait_seconds, 3),
+            "wall_seconds": round(wall, 3),
+            "chunks_per_second": round(self.items / self.busy_seconds, 1) if self.busy_seconds else 0.0,
+            "peak_rss_mb": round(self.peak_rss_mb, 1)
+        }
+
+
+class StreamingBuildPipeline:
+    """
+    流式构建流水线
+    输入可以是列表，也可以是边从Neo4j读取边分块的生成器
+    """
+
+    def __init__(self,
+                 embed_fn: Callable[[List[str]], List[List[float]]],
+                 to_entity: Callable[[Document, List[float], str], Dict[str, Any]],
+                 insert_fn: Callable[[List[Dict[str, Any]]], Any],
+                 batch_size: int = 256,
+                 queue_size: int = 4,
+                 progress=None):
+        """
+        初始化流水线
+
+        Args:
+            embed_fn: 批量向量化函数（embed_documents）
+            to_entity: (文档块, 向量, 备用主键) -> Milvus实体
+            insert_fn: 批量插入函数
+            batch_size: 每批的文档块数
+            queue_size: 阶段间队列最多缓存的批次数
+            progress: 构建进度（BuildProgress），报告 embedding 和 insert 阶段
+        """
+        self.embed_fn = embed_fn
+        self.to_entity = to_entity
+        self.insert_fn = insert_fn
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.progress = progress
+
+        self.stages = {name: StageStats(name) for name in ("chunk", "embed", "insert")}
+        self._error: Optional[BaseException] = None
+        self._stop = threading.Event()
+
+    def _put(self, q: queue.Queue, item, stats: StageStats) -> bool:
+        """放入下游队列；下游已失败时放弃，返回False"""
+        start = time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                stats.wait_seconds += time.perf_counter() - start
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue, stats: StageStats):
+        """从上游队列取出一个批次；上游已失败时返回结束标记"""
+        start = time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                item = q.get(timeout=0.1)
+                stats.wait_seconds += time.perf_counter() - start
+                return item
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _fail(self, stage: str, error: BaseException):
+        if self._error is None:
+            self._error = error
+            logger.error(f"构建流水线 [{stage}] 阶段失败: {error}")
+        self._stop.set()
+
+    def _chunk_stage(self, chunks: Iterable[Document], out_queue: queue.Queue):
+        """按批次读取文档块（生成器输入时包含从Neo4j读取和分块的耗时）"""
+        stats = self.stages["chunk"]
+        stats.started = time.perf_counter()
+        iterator = None
+        try:
+            iterator = iter(chunks)
+            offset = 0
+            while not self._stop.is_set():
+                start = time.perf_counter()
+                batch = []
+                for chunk in iterator:
+                    batch.append(chunk)
+                    if len(batch) >= self.batch_size:
+                        break
+                if not batch:
+                    # 输入耗尽后下游阶段的总数才能确定
+                    if self.progress:
+                        self.progress.set_total("embedding", offset)
+                        self.progress.set_total("insert", offset)
+                    break
+                stats.record(len(batch), time.perf_counter() - start)
+                if not self._put(out_queue, (offset, batch), stats):
+                    return
+                offset += len(batch)
+        except BaseException as e:
+            self._fail("chunk", e)
+        finally:
+            # 下游失败提前结束时关闭生成器输入，释放其持有的资源（如Neo4j会话）
+            if hasattr(iterator, "close"):
+                try:
+                    iterator.close()
+                except BaseException as e:
+                    self._fail("chunk", e)
+            stats.finished = time.perf_counter()
+            self._put(out_queue, _DONE, stats)
+
+    def _embed_stage(self, in_queue: queue.Queue, out_queue: queue.Queue):
+        """批量向量化并转换为Milvus实体，原始向量在转换后即可释放"""
+        stats = self.stages["embed"]
+        stats.started = time.perf_counter()
+        if self.progress:
+            self.progress.start("embedding")
+        try:
+            while True:
+                item = self._get(in_queue, stats)
+                if item is _DONE:
+                    break
+                offset, batch = item
+                start = time.perf_counter()
+                vectors = self.embed_fn([chunk.page_content for chunk in batch])
+                entities = [
+                    self.to_entity(chunk, vector, f"chunk_{offset + i}")
+                    for i, (chunk, vector) in enumerate(zip(batch, vectors))
+                ]
+                stats.record(len(entities), time.perf_counter() - start)
+                if self.progress:
+                    self.progress.advance("embedding", len(entities))
+                if not self._put(out_queue, entities, stats):
+                    return
+            if self.progress and self._error is None:
+                self.progress.finish("embedding")
+        except BaseException as e:
+            self._fail("embed", e)
+        finally:
+            stats.finished = time.perf_counter()
+            self._put(out_queue, _DONE, stats)
+
+    def _insert_stage(self, in_queue: queue.Queue):
+        """批量插入Milvus"""
+        stats = self.stages["insert"]
+        stats.started = time.perf_counter()
+        if self.progress:
+            self.progress.start("insert")
+        try:
+            while True:
+                entities = self._get(in_queue, stats)
+                if entities is _DONE:
+                    break
+                start = time.perf_counter()
+                self.insert_fn(entities)
+                stats.record(len(entities), time.perf_counter() - start)
+                if self.progress:
+                    self.progress.advance("insert", len(entities))
+                if stats.batches % 10 == 0:
+                    logger.info(f"已插入 {stats.items} 条数据")
+            if self.progress and self._error is None:
+                self.progress.finish("insert")
+        except BaseException as e:
+            self._fail("insert", e)
+        finally:
+            stats.finished = time.perf_counter()
+
+    def run(self, chunks: Iterable[Document]) -> Dict[str, Any]:
+        """
+        执行流水线直到输入耗尽
+
+        Returns:
+            各阶段统计和总体统计
+
+        Raises:
+            任一阶段的异常（其余阶段随之停止）
+        """
+        embed_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        insert_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        start = time.perf_counter()
+        start_rss = current_rss_mb()
+
+        threads = [
+            threading.Thread(target=self._chunk_stage, args=(chunks, embed_queue),
+                             name="build_chunk", daemon=True),
+            threading.Thread(target=self._embed_stage, args=(embed_queue, insert_queue),
+                             name="build_embed", daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+        # 插入阶段在调用线程中执行
+        self._insert_stage(insert_queue)
+        for thread in threads:
+            thread.join()
+
+        if self._error is not None:
+            raise self._error
+
+        elapsed = time.perf_counter() - start
+        inserted = self.stages["insert"].items
+        stats = {
+            "total_chunks": inserted,
+            "elapsed_seconds": round(elapsed, 3),
+            "chunks_per_second": round(inserted / elapsed, 1) if elapsed else 0.0,
+            "start_rss_mb": round(start_rss, 1),
+            "peak_rss_mb": round(max(s.peak_rss_mb for s in self.stages.values()), 1),
+            "batch_size": self.batch_size,
+            "queue_size": self.queue_size,
+            "stages": {name: s.to_dict() for name, s in self.stages.items()}
+        }
+        logger.info(f"流式构建完成: {inserted} 个文档块, 耗时 {elapsed:.2f}s, "
+                    f"{stats['chunks_per_second']} 块/秒, 峰值RSS {stats['peak_rss_mb']}MB")
+        return stats
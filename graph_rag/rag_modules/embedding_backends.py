@@ -0,0 +1,213 @@
+"""
+嵌入模型后端模块
+- torch：HuggingFaceEmbeddings（PyTorch fp32），默认后端
+- onnx-int8：导出为ONNX并做动态int8量化的同一模型，在CPU上用ONNX Runtime推理
+
+ONNX模型首次使用时自动导出到 onnx_model_dir，导出后与torch向量做余弦一致性校验，
+校验结果保存在模型目录中，每次加载时输出
+"""
+
+import json
+import logging
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "onnx-int8")
+
+FP32_FILE = "model.onnx"
+INT8_FILE = "model_int8.onnx"
+PARITY_FILE = "parity.json"
+
+# 一致性校验要求的最小余弦相似度
+PARITY_THRESHOLD = 0.98
+
+PARITY_TEXTS = [
+    "红烧肉怎么做",
+    "鸡肉适合搭配什么蔬菜",
+    "推荐几道用鸡胸肉的减肥菜并说明做法",
+    "# 西红柿炒鸡蛋\n## 所需食材\n1. 西红柿(2个)\n2. 鸡蛋(3个)\n## 制作步骤\n### 第1步\n步骤: 鸡蛋打散炒熟盛出",
+    "川菜有什么特色",
+    "## 制作步骤\n### 第1步\n步骤: 五花肉切块焯水\n方法: 焯\n时间: 5分钟\n### 第2步\n步骤: 炒糖色后下肉翻炒上色",
+]
+
+
+def embedding_model_id(model_name: str, backend: str) -> str:
+    """
+    向量所属的模型标识，用于嵌入缓存键和内容哈希
+    torch后端沿用模型名称（已有缓存继续有效），其余后端加上后缀，避免混用不同后端的向量
+    """
+    return model_name if backend == "torch" else f"{model_name}#{backend}"
+
+
+def onnx_model_path(onnx_model_dir: str, model_name: str) -> str:
+    """模型的ONNX导出目录"""
+    return os.path.join(onnx_model_dir, re.sub(r"[^0-9A-Za-z._-]+", "_", model_name))
+
+
+def cosine_agreement(reference: List[List[float]], candidate: List[List[float]]) -> Dict[str, float]:
+    """逐条计算两组向量的余弦相似度"""
+    a = np.asarray(reference, dtype=np.float32)
+    b = np.asarray(candidate, dtype=np.float32)
+    cosines = np.sum(a * b, axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1) + 1e-12)
+    return {"min_cosine": float(cosines.min()), "mean_cosine": float(cosines.mean())}
+
+
+class OnnxEmbeddings(Embeddings):
+    """ONNX Runtime CPU推理的BGE嵌入（CLS池化 + L2归一化，与sentence-transformers配置一致）"""
+
+    def __init__(self,
+                 model_dir: str,
+                 max_length: int = 512,
+                 batch_size: int = 32,
+                 normalize: bool = True,
+                 intra_op_threads: Optional[int] = None):
+        """
+        加载已导出的int8 ONNX模型
+
+        Args:
+            model_dir: 导出目录（包含量化模型和分词器）
+            max_length: 最大token数
+            batch_size: 每次推理的文本数
+            normalize: 是否归一化向量
+            intra_op_threads: ONNX Runtime算子内线程数，None表示使用默认值
+        """
+        try:
+            import onnxruntime as ort
+            from transformers import AutoTokenizer
+        except ImportError as e:
+            raise ImportError("onnx-int8 嵌入后端需要安装 onnxruntime 和 transformers") from e
+
+        self.model_dir = model_dir
+        self.max_length = max_length
+        self.batch_size = batch_size
+        self.normalize = normalize
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(os.path.join(model_dir, INT8_FILE), options,
+                                            providers=["CPUExecutionProvider"])
+        self.input_names = {node.name for node in self.session.get_inputs()}
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            encoded = self.tokenizer(texts[start:start + self.batch_size], padding=True, truncation=True,
+                                     max_length=self.max_length, return_tensors="np")
+            feeds = {name: value.astype(np.int64) for name, value in encoded.items() if name in self.input_names}
+            hidden = self.session.run(None, feeds)[0]
+            cls = hidden[:, 0]
+            if self.normalize:
+                cls = cls / np.maximum(np.linalg.norm(cls, axis=1, keepdims=True), 1e-12)
+            vectors.extend(cls.astype(np.float32).tolist())
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(list(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text])[0]
+
+
+def export_onnx_int8(model_name: str, output_dir: str, opset: int = 14) -> Dict[str, Any]:
+    """
+    导出ONNX模型、做动态int8量化，并与torch向量做一致性校验
+
+    Returns:
+        一致性校验结果（同时写入 parity.json）
+    """
+    import torch
+    from langchain_huggingface import HuggingFaceEmbeddings
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    logger.info(f"正在导出ONNX模型: {model_name} -> {output_dir}")
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    tokenizer.save_pretrained(output_dir)
+    model = AutoModel.from_pretrained(model_name).eval()
+
+    sample = tokenizer(["示例文本"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    fp32_path = os.path.join(output_dir, FP32_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes={name: {0: "batch", 1: "sequence"} for name in input_names + ["last_hidden_state"]},
+            opset_version=opset
+        )
+    quantize_dynamic(fp32_path, os.path.join(output_dir, INT8_FILE), weight_type=QuantType.QInt8)
+    os.remove(fp32_path)
+
+    reference = HuggingFaceEmbeddings(model_name=model_name, model_kwargs={'device': 'cpu'},
+                                      encode_kwargs={'normalize_embeddings': True})
+    candidate = OnnxEmbeddings(output_dir)
+    parity = cosine_agreement(reference.embed_documents(PARITY_TEXTS), candidate.embed_documents(PARITY_TEXTS))
+    parity.update({"model_name": model_name, "threshold": PARITY_THRESHOLD,
+                   "passed": parity["min_cosine"] >= PARITY_THRESHOLD})
+    with open(os.path.join(output_dir, PARITY_FILE), "w", encoding="utf-8") as f:
+        json.dump(parity, f, ensure_ascii=False, indent=2)
+
+    logger.info(f"ONNX int8模型导出完成，与torch向量的最小余弦相似度: {parity['min_cosine']:.4f}")
+    return parity
+
+
+def create_embeddings(backend: str,
+                      model_name: str,
+                      device: str = "cpu",
+                      onnx_model_dir: str = "./onnx_models",
+                      threads: Optional[int] = None,
+                      batch_size: int = 32) -> Embeddings:
+    """
+    按后端创建嵌入模型
+
+    Args:
+        backend: torch / onnx-int8
+        model_name: 模型名称
+        device: torch后端使用的设备
+        onnx_model_dir: ONNX模型导出根目录
+        threads: onnx后端的算子内线程数
+        batch_size: 模型每次前向计算的文本数
+
+    Raises:
+        ValueError: 未知的后端
+    """
+    if backend == "torch":
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        return HuggingFaceEmbeddings(
+            model_name=model_name,
+            model_kwargs={'device': device},
+            encode_kwargs={'normalize_embeddings': True, 'batch_size': batch_size}
+        )
+
+    if backend == "onnx-int8":
+        model_dir = onnx_model_path(onnx_model_dir, model_name)
+        if not os.path.exists(os.path.join(model_dir, INT8_FILE)):
+            export_onnx_int8(model_name, model_dir)
+
+        parity_path = os.path.join(model_dir, PARITY_FILE)
+        if os.path.exists(parity_path):
+            with open(parity_path, "r", encoding="utf-8") as f:
+                parity = json.load(f)
+            if not parity.get("passed", False):
+                logger.warning(f"ONNX int8模型与torch向量一致性不足（最小余弦 {parity['min_cosine']:.4f} < "
+                               f"{parity['threshold']}），检索质量可能下降")
+            else:
+                logger.info(f"ONNX int8模型一致性校验: 最小余弦 {parity['min_cosine']:.4f}")
+        return OnnxEmbeddings(model_dir, batch_size=batch_size, intra_op_threads=threads)
+
+    raise ValueError(f"未知的嵌入后端: {backend}，可选: {BACKENDS}")
@@ -0,0 +1,288 @@
+"""
+嵌入向量持久化缓存模块
+以(模型名称, 规范化文本)为键的内容寻址缓存：
+- 向量存储在内存映射的float32矩阵中（vectors.f32）
+- 每行对应的键摘要存储在另一个内存映射文件中（keys.bin），读取时校验，
+  索引落后于向量文件（如进程在两次持久化之间退出）时不会返回其他文本的向量
+- 键到矩阵行号的映射保存在哈希索引文件中（index.json），每写入 flush_every 条后重写一次
+- 超出容量时按LRU顺序淘汰
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import List, Optional, Dict, Any
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """嵌入向量持久化缓存 - 同一进程内线程安全"""
+
+    VECTORS_FILE = "vectors.f32"
+    KEYS_FILE = "keys.bin"
+    INDEX_FILE = "index.json"
+    KEY_SIZE = 20  # SHA1摘要字节数；按uint8逐字节存储（"S"类型会截掉末尾的\x00）
+
+    def __init__(self, cache_dir: str, model_name: str, capacity: int = 100000, flush_every: int = 4096):
+        """
+        初始化嵌入缓存
+
+        Args:
+            cache_dir: 缓存根目录（每个模型使用独立子目录）
+            model_name: 嵌入模型名称，参与缓存键计算
+            capacity: 最多缓存的向量条数
+            flush_every: 累计写入多少条后持久化一次索引；构建结束时应调用 flush()
+        """
+        if capacity <= 0:
+            raise ValueError("缓存容量必须大于0")
+        if flush_every <= 0:
+            raise ValueError("持久化间隔必须大于0")
+
+        self.model_name = model_name
+        self.capacity = capacity
+        self.flush_every = flush_every
+        self.cache_dir = os.path.join(cache_dir, re.sub(r"[^0-9A-Za-z._-]+", "_", model_name))
+
+        self.dimension: Optional[int] = None
+        self._vectors: Optional[np.memmap] = None
+        self._keys: Optional[np.memmap] = None  # 每行写入的键摘要
+        self._dirty = 0  # 上次持久化索引后写入的条数
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # key -> 行号，按最近使用排序
+        self._free_slots: List[int] = []
+        self._next_slot = 0
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale_entries = 0
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load()
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.cache_dir, self.VECTORS_FILE)
+
+    @property
+    def _keys_path(self) -> str:
+        return os.path.join(self.cache_dir, self.KEYS_FILE)
+
+    @property
+    def _index_path(self) -> str:
+        return os.path.join(self.cache_dir, self.INDEX_FILE)
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        """规范化文本：Unicode NFKC归一化并去除首尾空白"""
+        return unicodedata.normalize("NFKC", text or "").strip()
+
+    def make_key(self, text: str) -> str:
+        """计算(模型名称, 规范化文本)的缓存键"""
+        payload = f"{self.model_name}\x00{self.normalize_text(text)}"
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def _load(self):
+        """从磁盘加载已有的缓存索引和向量矩阵"""
+        if not all(os.path.exists(path) for path in (self._index_path, self._vectors_path, self._keys_path)):
+            return
+
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+
+            if index.get("model_name") != self.model_name or index.get("capacity") != self.capacity:
+                logger.info("嵌入缓存配置已变化，重置缓存")
+                return
+
+            self.dimension = index["dimension"]
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+",
+                                      shape=(self.capacity, self.dimension))
+            self._keys = np.memmap(self._keys_path, dtype=np.uint8, mode="r+", shape=(self.capacity, self.KEY_SIZE))
+            self._entries = OrderedDict((key, slot) for key, slot in index["entries"])
+            self._next_slot = index["next_slot"]
+            used_slots = set(self._entries.values())
+            self._free_slots = [slot for slot in range(self._next_slot) if slot not in used_slots]
+
+            logger.info(f"已加载嵌入缓存: {len(self._entries)} 条向量 ({self.cache_dir})")
+
+        except Exception as e:
+            logger.warning(f"加载嵌入缓存失败，将重新创建: {e}")
+            self.dimension = None
+            self._vectors = None
+            self._keys = None
+            self._entries = OrderedDict()
+            self._free_slots = []
+            self._next_slot = 0
+
+    def _ensure_storage(self, dimension: int):
+        """按向量维度创建内存映射矩阵"""
+        if self._vectors is not None:
+            if dimension != self.dimension:
+                raise ValueError(f"向量维度不一致: 缓存为 {self.dimension}，实际为 {dimension}")
+            return
+
+        self.dimension = dimension
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="w+",
+                                  shape=(self.capacity, self.dimension))
+        self._keys = np.memmap(self._keys_path, dtype=np.uint8, mode="w+", shape=(self.capacity, self.KEY_SIZE))
+        logger.info(f"已创建嵌入缓存: 容量 {self.capacity}，维度 {self.dimension}")
+
+    def _allocate_slot(self) -> int:
+        """分配一个矩阵行，容量已满时淘汰最久未使用的条目"""
+        if self._free_slots:
+            return self._free_slots.pop()
+        if self._next_slot < self.capacity:
+            slot = self._next_slot
+            self._next_slot += 1
+            return slot
+
+        _, slot = self._entries.popitem(last=False)
+        self.evictions += 1
+        return slot
+
+    def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        批量查询缓存
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            与输入顺序一致的向量列表，未命中的位置为None
+        """
+        results: List[Optional[List[float]]] = []
+        with self._lock:
+            for text in texts:
+                key = self.make_key(text)
+                slot = self._entries.get(key)
+                if slot is not None and self._keys[slot].tobytes() != bytes.fromhex(key):
+                    # 磁盘上的索引落后于向量文件：该行已被其他文本复用
+                    del self._entries[key]
+                    self._free_slots.append(slot)
+                    self.stale_entries += 1
+                    slot = None
+                if slot is None:
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    self.hits += 1
+                    self._entries.move_to_end(key)
+                    results.append(self._vectors[slot].tolist())
+        return results
+
+    def put_many(self, texts: List[str], vectors: List[List[float]]):
+        """
+        批量写入缓存，累计写入 flush_every 条后持久化
+
+        Args:
+            texts: 文本列表
+            vectors: 与文本一一对应的向量
+        """
+        if not texts:
+            return
+
+        with self._lock:
+            self._ensure_storage(len(vectors[0]))
+            for text, vector in zip(texts, vectors):
+                key = self.make_key(text)
+                slot = self._entries.get(key)
+                if slot is None:
+                    slot = self._allocate_slot()
+                # 先清除行的键摘要再写向量，写入过程中中断时该行不会被误认为有效
+                self._keys[slot] = 0
+                self._vectors[slot] = np.asarray(vector, dtype=np.float32)
+                self._keys[slot] = np.frombuffer(bytes.fromhex(key), dtype=np.uint8)
+                self._entries[key] = slot
+                self._entries.move_to_end(key)
+            self._dirty += len(texts)
+            if self._dirty >= self.flush_every:
+                self._flush_locked()
+
+    def flush(self):
+        """将向量矩阵和索引写回磁盘"""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self._vectors is None:
+            return
+
+        self._vectors.flush()
+        self._keys.flush()
+        index = {
+            "model_name": self.model_name,
+            "dimension": self.dimension,
+            "capacity": self.capacity,
+            "next_slot": self._next_slot,
+            "entries": list(self._entries.items())
+        }
+        tmp_path = self._index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self._index_path)
+        self._dirty = 0
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._free_slots = []
+            self._next_slot = 0
+            self._flush_locked()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "capacity": self.capacity,
+                "dimension": self.dimension,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "stale_entries": self.stale_entries,
+                "hit_rate": self.hits / total if total else 0.0,
+                "cache_dir": self.cache_dir
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    带持久化缓存的嵌入模型包装
+    embed_documents 只对缓存未命中的文本调用底层模型，embed_query 直接透传
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        cached = self.cache.get_many(texts)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+
+        if missing:
+            # 同一批次中的重复文本只计算一次
+            unique_texts = list(dict.fromkeys(texts[i] for i in missing))
+            new_vectors = self.embeddings.embed_documents(unique_texts)
+            self.cache.put_many(unique_texts, new_vectors)
+
+            computed = dict(zip(unique_texts, new_vectors))
+            for i in missing:
+                cached[i] = computed[texts[i]]
+
+        return cached
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
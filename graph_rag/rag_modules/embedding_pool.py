@@ -0,0 +1,188 @@
+"""
+多进程嵌入模块
+知识库构建时把文档分片分发到进程池，每个工作进程持有自己的模型副本：
+- 每个进程的torch线程数单独设置（默认平分CPU核数），避免多个进程各自占满全部核心
+- 每次调用的文本平均切分为与进程数相同的分片，构建流水线的每个批次都能让所有进程同时工作
+- 按分片顺序合并结果，输出顺序与输入一致（启用长度分桶时先按长度排序，再按总长度均分为连续的分片，结果写回原位置）
+- 查询向量化仍由主进程的模型完成，不经过进程池
+"""
+
+import logging
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from .embedding_backends import create_embeddings
+from .length_bucketing import LengthBucketedEmbeddings, token_length_fn
+
+logger = logging.getLogger(__name__)
+
+# 工作进程内的模型副本
+_worker_embeddings = None
+
+
+def _init_worker(model_name: str, threads: int, backend: str, onnx_model_dir: str,
+                 token_budget: int, max_batch_size: int):
+    """工作进程初始化：先限制线程数，再加载模型"""
+    global _worker_embeddings
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+    if backend == "torch":
+        import torch
+        torch.set_num_threads(threads)
+    if token_budget > 0:
+        _worker_embeddings = LengthBucketedEmbeddings(
+            create_embeddings(backend, model_name, device="cpu", onnx_model_dir=onnx_model_dir,
+                              threads=threads, batch_size=max_batch_size),
+            token_length_fn(model_name),
+            token_budget=token_budget,
+            max_batch_size=max_batch_size
+        )
+    else:
+        _worker_embeddings = create_embeddings(backend, model_name, device="cpu",
+                                               onnx_model_dir=onnx_model_dir, threads=threads)
+
+
+def _embed_shard(texts: List[str]) -> List[List[float]]:
+    return _worker_embeddings.embed_documents(texts)
+
+
+class ProcessPoolEmbeddings(Embeddings):
+    """
+    多进程CPU嵌入
+    embed_documents 按分片并行计算，embed_query 透传给主进程的模型
+    """
+
+    def __init__(self,
+                 model_name: str,
+                 workers: int,
+                 local_embeddings: Embeddings,
+                 threads_per_worker: Optional[int] = None,
+                 min_shard_size: int = 16,
+                 backend: str = "torch",
+                 onnx_model_dir: str = "./onnx_models",
+                 token_budget: int = 0,
+                 max_batch_size: int = 256):
+        """
+        初始化多进程嵌入
+
+        Args:
+            model_name: 嵌入模型名称（各工作进程各自加载）
+            workers: 工作进程数
+            local_embeddings: 主进程中的模型，用于查询向量化和小批量文档
+            threads_per_worker: 每个工作进程的torch线程数，None表示CPU核数平分给各进程
+            min_shard_size: 每个分片的最少文本数；文本较少时减少分片数，不足一个分片时在主进程计算
+            backend: 工作进程使用的嵌入后端（torch / onnx-int8）
+            onnx_model_dir: onnx后端的模型导出根目录（需已导出，避免多个进程同时导出）
+            token_budget: 工作进程内按长度分桶的每批token上限，0表示不分桶
+            max_batch_size: 分桶时每批最多文本数
+        """
+        if workers < 1:
+            raise ValueError("工作进程数必须大于0")
+
+        self.model_name = model_name
+        self.workers = workers
+        self.local_embeddings = local_embeddings
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+        self.min_shard_size = min_shard_size
+        self.backend = backend
+        self.onnx_model_dir = onnx_model_dir
+        self.token_budget = token_budget
+        self.max_batch_size = max_batch_size
+
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.documents = 0
+        self.seconds = 0.0
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """首次使用时启动进程池（spawn方式，工作进程不继承主进程已加载的模型和线程）"""
+        with self._lock:
+            if self._pool is None:
+                logger.info(f"启动嵌入进程池: {self.workers} 个进程，每个进程 {self.threads_per_worker} 个线程")
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.model_name, self.threads_per_worker, self.backend, self.onnx_model_dir,
+                              self.token_budget, self.max_batch_size)
+                )
+            return self._pool
+
+    def _plan_shards(self, texts: List[str]) -> List[List[int]]:
+        """
+        把文本划分为连续的分片，分片数为进程数（文本较少时按 min_shard_size 减少）
+
+        Returns:
+            分片列表，每个分片为原始下标列表
+        """
+        num_shards = min(self.workers, math.ceil(len(texts) / self.min_shard_size))
+        if self.token_budget <= 0:
+            size = math.ceil(len(texts) / num_shards)
+            return [list(range(s, min(s + size, len(texts)))) for s in range(0, len(texts), size)]
+
+        # 分桶时先按字符长度排序，使每个分片内的文本长度相近；按累计长度切分，长文本所在的分片条数更少
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        total = sum(len(text) for text in texts) or 1
+        shards: List[List[int]] = [[]]
+        accumulated = 0
+        for i in order:
+            if shards[-1] and accumulated >= total * len(shards) / num_shards:
+                shards.append([])
+            shards[-1].append(i)
+            accumulated += len(texts[i])
+        return shards
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if len(texts) <= self.min_shard_size:
+            # 不足一个分片时进程间传输的开销大于并行收益
+            return self.local_embeddings.embed_documents(texts)
+
+        start = time.perf_counter()
+        shard_indices = self._plan_shards(texts)
+        shards = [[texts[i] for i in indices] for indices in shard_indices]
+        order = [i for indices in shard_indices for i in indices]
+        vectors: List[List[float]] = [None] * len(texts)
+        # map 按提交顺序返回结果，按排序下标写回原位置
+        position = 0
+        for shard_vectors in self._get_pool().map(_embed_shard, shards):
+            for vector in shard_vectors:
+                vectors[order[position]] = vector
+                position += 1
+
+        with self._lock:
+            self.documents += len(texts)
+            self.seconds += time.perf_counter() - start
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.local_embeddings.embed_query(text)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取进程池统计信息"""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "backend": self.backend,
+                "threads_per_worker": self.threads_per_worker,
+                "min_shard_size": self.min_shard_size,
+                "documents": self.documents,
+                "chunks_per_second": self.documents / self.seconds if self.seconds else 0.0
+            }
+
+    def close(self):
+        """关闭进程池"""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
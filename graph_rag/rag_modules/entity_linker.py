@@ -0,0 +1,257 @@
+"""
+本地实体链接模块
+基于图索引的键构建Aho-Corasick自动机，在进程内一次扫描查询文本即可提取实体级和主题级关键词，
+只有一个关键词都匹配不到时才回退到LLM提取。
+单字的键（盐、糖、葱、肉……）几乎出现在每个查询里，除非在同义词组中显式列出，否则不参与匹配；
+只匹配到单字关键词时同样视为未匹配
+"""
+
+import json
+import logging
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 内置同义词组：组内任一写法都链接到图中实际存在的那个键
+DEFAULT_SYNONYM_GROUPS: List[List[str]] = [
+    ["西红柿", "番茄"],
+    ["土豆", "马铃薯", "洋芋"],
+    ["红薯", "地瓜", "番薯"],
+    ["香菜", "芫荽"],
+    ["玉米", "苞米", "玉蜀黍"],
+    ["青椒", "柿子椒", "甜椒"],
+    ["花生", "落花生"],
+    ["鸡蛋", "鸡子儿"],
+    ["虾仁", "虾肉"],
+    ["猪里脊", "里脊肉"],
+    ["减肥", "减脂", "瘦身"],
+    ["素食", "素菜", "吃素"],
+    ["快手菜", "简单快手"],
+    ["家常菜", "家常"],
+]
+
+# 图索引中由ID合成的占位名称，不参与匹配
+_SYNTHETIC_KEY = re.compile(r"^(菜谱|食材|步骤)_")
+# 关系类型键（REQUIRES等）和 "菜名_食材" 这类组合键不参与匹配
+_RELATION_TYPE_KEY = re.compile(r"^[A-Z_]+$")
+
+
+class AhoCorasick:
+    """多模式串匹配自动机"""
+
+    def __init__(self, patterns: Iterable[str]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.outputs: List[List[int]] = [[]]  # 每个状态上结束的模式串长度
+        self.size = 0
+
+        for pattern in patterns:
+            if pattern:
+                self._add(pattern)
+        self._build_fail_links()
+
+    def _add(self, pattern: str):
+        state = 0
+        for char in pattern:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][char] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.outputs.append([])
+            state = next_state
+        if len(pattern) not in self.outputs[state]:
+            self.outputs[state].append(len(pattern))
+            self.size += 1
+
+    def _build_fail_links(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                self.outputs[next_state].extend(self.outputs[self.fail[next_state]])
+
+    def find_all(self, text: str) -> List[Tuple[int, int]]:
+        """返回所有匹配的 (起始位置, 结束位置)，允许重叠"""
+        matches = []
+        state = 0
+        for i, char in enumerate(text):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for length in self.outputs[state]:
+                matches.append((i + 1 - length, i + 1))
+        return matches
+
+    def find_longest(self, text: str) -> List[Tuple[int, int]]:
+        """最左最长、互不重叠的匹配，避免"猪肉"同时命中"猪"和"肉\""""
+        selected = []
+        last_end = 0
+        for start, end in sorted(self.find_all(text), key=lambda m: (m[0], -(m[1] - m[0]))):
+            if start >= last_end:
+                selected.append((start, end))
+                last_end = end
+        return selected
+
+
+class EntityLinker:
+    """
+    本地实体链接器
+    - 实体级关键词：图索引中的实体名称（菜谱、食材）
+    - 主题级关键词：关系主题键、菜谱分类和菜系
+    - 同义词：链接到图中实际存在的写法
+    """
+
+    # 图中的键少于该长度时不参与匹配（同义词组中显式列出的写法除外）
+    MIN_KEY_LENGTH = 2
+
+    def __init__(self, synonym_groups: Optional[Sequence[Sequence[str]]] = None):
+        self.synonym_groups = [list(group) for group in (synonym_groups or DEFAULT_SYNONYM_GROUPS)]
+
+        self._automaton: Optional[AhoCorasick] = None
+        # 规范化后的匹配串 -> (图中的键, 是否实体, 是否主题)
+        self._patterns: Dict[str, Tuple[str, bool, bool]] = {}
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.build_seconds = 0.0
+        self.lookups = 0
+        self.matched = 0
+        self.short_only = 0  # 只匹配到单字关键词而回退LLM的次数
+        self.total_ms = 0.0
+
+    @staticmethod
+    def load_synonym_groups(path: Optional[str]) -> List[List[str]]:
+        """从JSON文件加载同义词组（[[写法1, 写法2], ...]），并追加到内置同义词组之后"""
+        groups = [list(group) for group in DEFAULT_SYNONYM_GROUPS]
+        if not path:
+            return groups
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                groups.extend(list(group) for group in json.load(f))
+        except Exception as e:
+            logger.warning(f"加载同义词表失败，仅使用内置同义词: {e}")
+        return groups
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        return text.strip().lower()
+
+    def build(self, graph_indexing, recipes: Iterable[Any] = ()):
+        """
+        基于图索引重建自动机
+
+        Args:
+            graph_indexing: GraphIndexingModule实例
+            recipes: 菜谱节点，用于补充分类和菜系主题
+        """
+        start = time.perf_counter()
+
+        explicit = {self._normalize(word) for group in self.synonym_groups for word in group}
+
+        def usable(key: str) -> bool:
+            return bool(key) and (len(key.strip()) >= self.MIN_KEY_LENGTH or self._normalize(key) in explicit)
+
+        entity_keys = {
+            key for key in graph_indexing.key_to_entities
+            if usable(key) and not _SYNTHETIC_KEY.match(key)
+        }
+        topic_keys = {
+            key for key in graph_indexing.key_to_relations
+            if usable(key) and "_" not in key and not _RELATION_TYPE_KEY.match(key)
+        }
+        for recipe in recipes:
+            props = getattr(recipe, "properties", {}) or {}
+            for field in ("category", "cuisineType"):
+                value = props.get(field)
+                if isinstance(value, str) and usable(value) and value != "未知":
+                    topic_keys.add(value)
+
+        patterns: Dict[str, Tuple[str, bool, bool]] = {}
+        for key in entity_keys | topic_keys:
+            patterns[self._normalize(key)] = (key, key in entity_keys, key in topic_keys)
+
+        # 同义词指向组内第一个在图中存在的写法
+        for group in self.synonym_groups:
+            canonical = next((patterns[self._normalize(w)] for w in group if self._normalize(w) in patterns), None)
+            if canonical is None:
+                continue
+            for word in group:
+                patterns.setdefault(self._normalize(word), canonical)
+
+        automaton = AhoCorasick(patterns.keys())
+        with self._lock:
+            self._automaton = automaton
+            self._patterns = patterns
+        self.build_seconds = time.perf_counter() - start
+        logger.info(f"实体链接自动机构建完成: {len(entity_keys)} 个实体键, {len(topic_keys)} 个主题键, "
+                    f"{automaton.size} 个模式串, 耗时 {self.build_seconds * 1000:.1f}ms")
+
+    def extract(self, query: str, record_stats: bool = True) -> Tuple[List[str], List[str]]:
+        """
+        从查询中提取关键词
+
+        Args:
+            query: 查询文本
+            record_stats: 是否计入匹配统计（答案缓存的命中校验不计入）
+
+        Returns:
+            (实体级关键词, 主题级关键词)；自动机未构建、未匹配或只匹配到单字关键词时均为空
+        """
+        start = time.perf_counter()
+        with self._lock:
+            automaton, patterns = self._automaton, self._patterns
+
+        entity_keywords: List[str] = []
+        topic_keywords: List[str] = []
+        short_only = False
+        if automaton is not None:
+            text = self._normalize(query)
+            matches = automaton.find_longest(text)
+            # 只命中单字关键词时不足以确定检索意图，交给LLM提取
+            short_only = bool(matches) and all(end - begin < self.MIN_KEY_LENGTH for begin, end in matches)
+            if not short_only:
+                for begin, end in matches:
+                    key, is_entity, is_topic = patterns[text[begin:end]]
+                    if is_entity and key not in entity_keywords:
+                        entity_keywords.append(key)
+                    if is_topic and key not in topic_keywords:
+                        topic_keywords.append(key)
+
+        if not record_stats:
+            return entity_keywords, topic_keywords
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.lookups += 1
+            self.total_ms += elapsed_ms
+            if entity_keywords or topic_keywords:
+                self.matched += 1
+            if short_only:
+                self.short_only += 1
+        return entity_keywords, topic_keywords
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取匹配统计信息"""
+        with self._lock:
+            return {
+                "patterns": self._automaton.size if self._automaton else 0,
+                "build_ms": round(self.build_seconds * 1000, 1),
+                "lookups": self.lookups,
+                "matched": self.matched,
+                "unmatched": self.lookups - self.matched,
+                "short_only": self.short_only,
+                "match_rate": self.matched / self.lookups if self.lookups else 0.0,
+                "avg_ms": self.total_ms / self.lookups if self.lookups else 0.0
+            }
@@ -2,20 +2,24 @@
 生成集成模块
 """
 
+import asyncio
 import logging
 import os
 import time
 from typing import List
 
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 from langchain_core.documents import Document
 
+from .request_context import CountingLLMClient
+
 logger = logging.getLogger(__name__)
 
 class GenerationIntegrationModule:
     """生成集成模块 - 负责答案生成"""
 
-    def __init__(self, model_name: str = "kimi-k2-0711-preview", temperature: float = 0.1, max_tokens: int = 2048):
+    def __init__(self, model_name: str = "kimi-k2-0711-preview", temperature: float = 0.1, max_tokens: int = 2048,
+                 base_url: str = "https://chat.intern-ai.org.cn/api/v1/"):
         """
         初始化生成集成模块
         """
@@ -28,18 +32,22 @@ class GenerationIntegrationModule:
         if not api_key:
             raise ValueError("请设置 INTERN_API_KEY 环境变量")
         
-        self.client = OpenAI(
+        # 客户端经过计数包装：每次调用都计入当前请求的LLM调用次数（检索模块共用同一个客户端）
+        self.client = CountingLLMClient(OpenAI(
+            api_key=api_key,
+            base_url=base_url
+        ))
+
+        # 异步客户端：供API的异步请求路径使用，等待LLM响应时不占用线程
+        self.async_client = CountingLLMClient(AsyncOpenAI(
             api_key=api_key,
-            base_url="https://chat.intern-ai.org.cn/api/v1/"
-        )
+            base_url=base_url
+        ))
 
         logger.info(f"生成模块初始化完成，模型: {model_name}")
 
-    def generate_adaptive_answer(self, question: str, documents: List[Document]) -> str:
-        """
-        智能统一答案生成
-        自动适应不同类型的查询，无需预先分类
-        """
+    def _build_prompt(self, question: str, documents: List[Document]) -> str:
+        """构建LightRAG风格的统一提示词"""
         # 构建上下文
         context_parts = []
         
@@ -56,7 +64,7 @@ class GenerationIntegrationModule:
         context = "\n\n".join(context_parts)
         
         # LightRAG风格的统一提示词
-        prompt = f"""
+        return f"""
         作为一位专业的烹饪助手，请基于以下信息回答用户的问题。
 
         检索到的相关信息：
@@ -71,6 +79,13 @@ class GenerationIntegrationModule:
 
         回答：
         """
+
+    def generate_adaptive_answer(self, question: str, documents: List[Document]) -> str:
+        """
+        智能统一答案生成
+        自动适应不同类型的查询，无需预先分类
+        """
+        prompt = self._build_prompt(question, documents)
         
         try:
             response = self.client.chat.completions.create(
@@ -87,41 +102,35 @@ class GenerationIntegrationModule:
         except Exception as e:
             logger.error(f"LightRAG答案生成失败: {e}")
             return f"抱歉，生成回答时出现错误：{str(e)}"
+
+    async def agenerate_adaptive_answer(self, question: str, documents: List[Document]) -> str:
+        """
+        智能统一答案生成 - 异步版本
+        使用AsyncOpenAI客户端，等待LLM响应期间不阻塞事件循环
+        """
+        prompt = self._build_prompt(question, documents)
+        
+        try:
+            response = await self.async_client.chat.completions.create(
+                model=self.model_name,
+                messages=[
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=self.temperature,
+                max_tokens=self.max_tokens
+            )
+            
+            return response.choices[0].message.content.strip()
+            
+        except Exception as e:
+            logger.error(f"LightRAG答案生成失败: {e}")
+            return f"抱歉，生成回答时出现错误：{str(e)}"
     
     def generate_adaptive_answer_stream(self, question: str, documents: List[Document], max_retries: int = 3):
         """
         LightRAG风格的流式答案生成（带重试机制）
         """
-        # 构建上下文
-        context_parts = []
-        
-        for doc in documents:
-            content = doc.page_content.strip()
-            if content:
-                level = doc.metadata.get('retrieval_level', '')
-                if level:
-                    context_parts.append(f"[{level.upper()}] {content}")
-                else:
-                    context_parts.append(content)
-        
-        context = "\n\n".join(context_parts)
-        
-        # LightRAG风格的统一提示词
-        prompt = f"""
-        作为一位专业的烹饪助手，请基于以下信息回答用户的问题。
-
-        检索到的相关信息：
-        {context}
-
-        用户问题：{question}
-
-        请提供准确、实用的回答。根据问题的性质：
-        - 如果是询问多个菜品，请提供清晰的列表
-        - 如果是询问具体制作方法，请提供详细步骤
-        - 如果是一般性咨询，请提供综合性回答
-
-        回答：
-        """
+        prompt = self._build_prompt(question, documents)
         
         for attempt in range(max_retries):
             try:
@@ -172,4 +181,58 @@ class GenerationIntegrationModule:
                         logger.error(f"后备生成也失败: {fallback_error}")
                         error_msg = f"抱歉，生成回答时出现网络错误，请稍后重试。错误信息：{str(e)}"
                         yield error_msg
-                        return 
\ No newline at end of file
+                        return 
+
+    async def agenerate_adaptive_answer_stream(self, question: str, documents: List[Document], max_retries: int = 3):
+        """
+        流式答案生成 - 异步版本
+        - 通过AsyncOpenAI逐个拉取token，等待期间不阻塞事件循环
+        - 调用方按需拉取，消费慢时不会提前读取上游（背压）
+        - 调用方取消或关闭生成器时立即关闭上游连接，中止LLM请求
+        - 尚未输出任何内容时才重试，避免重复输出
+        """
+        prompt = self._build_prompt(question, documents)
+        
+        for attempt in range(max_retries):
+            response = None
+            emitted = False
+            try:
+                response = await self.async_client.chat.completions.create(
+                    model=self.model_name,
+                    messages=[
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens,
+                    stream=True,
+                    timeout=60
+                )
+                
+                async for chunk in response:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        emitted = True
+                        yield chunk.choices[0].delta.content
+                
+                return
+                
+            except Exception as e:
+                if emitted:
+                    # 已输出部分内容，重试会导致重复，交由调用方处理
+                    logger.error(f"流式生成中途失败: {e}")
+                    raise
+                
+                logger.warning(f"流式生成第{attempt + 1}次尝试失败: {e}")
+                
+                if attempt < max_retries - 1:
+                    await asyncio.sleep((attempt + 1) * 2)  # 递增等待时间
+                    continue
+                
+                # 所有重试都失败，使用非流式作为后备
+                logger.error("流式生成完全失败，尝试非流式后备方案")
+                yield await self.agenerate_adaptive_answer(question, documents)
+                return
+                
+            finally:
+                # 正常结束、出错或被取消时都关闭上游响应
+                if response is not None:
+                    await response.close()
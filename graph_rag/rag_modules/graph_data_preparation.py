@@ -4,12 +4,13 @@
 
 import logging
 import json
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional
 from dataclasses import dataclass
 
-from neo4j import GraphDatabase
 from langchain_core.documents import Document
 
+from .neo4j_driver_registry import Neo4jDriverRegistry
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -31,7 +32,8 @@ class GraphRelation:
 class GraphDataPreparationModule:
     """图数据库数据准备模块 - 从Neo4j读取数据并转换为文档"""
     
-    def __init__(self, uri: str, user: str, password: str, database: str = "neo4j"):
+    def __init__(self, uri: str, user: str, password: str, database: str = "neo4j",
+                 driver_registry: Optional[Neo4jDriverRegistry] = None):
         """
         初始化图数据库连接
         
@@ -40,12 +42,14 @@ class GraphDataPreparationModule:
             user: 用户名
             password: 密码
             database: 数据库名称
+            driver_registry: 系统共享的Neo4j驱动，未提供时按连接参数自行创建
         """
         self.uri = uri
         self.user = user
         self.password = password
         self.database = database
-        self.driver = None
+        self.driver = driver_registry or Neo4jDriverRegistry(uri, user, password, database=database)
+        self._owns_driver = driver_registry is None
         self.documents: List[Document] = []
         self.chunks: List[Document] = []
         self.recipes: List[GraphNode] = []
@@ -57,12 +61,7 @@ class GraphDataPreparationModule:
     def _connect(self):
         """建立Neo4j连接"""
         try:
-            self.driver = GraphDatabase.driver(
-                self.uri, 
-                auth=(self.user, self.password),
-                database=self.database
-            )
-            logger.info(f"已连接到Neo4j数据库: {self.uri}")
+            self.driver.connect()
             
             # 测试连接
             with self.driver.session() as session:
@@ -77,9 +76,9 @@ class GraphDataPreparationModule:
     
     def close(self):
         """关闭数据库连接"""
-        if hasattr(self, 'driver') and self.driver:
+        # 共享的Neo4j驱动由系统关闭
+        if self._owns_driver:
             self.driver.close()
-            logger.info("Neo4j连接已关闭")
     
     def load_graph_data(self) -> Dict[str, Any]:
         """
@@ -176,148 +175,277 @@ class GraphDataPreparationModule:
             'cooking_steps': len(self.cooking_steps)
         }
     
-    def build_recipe_documents(self) -> List[Document]:
+    def build_recipe_documents(self, batch_size: int = 500, progress=None) -> List[Document]:
         """
         构建菜谱文档，集成相关的食材和步骤信息
         
+        按批次（UNWIND + collect）一次性拉取一页菜谱的食材和步骤，
+        避免逐个菜谱查询Neo4j带来的N+1次网络往返
+        
+        Args:
+            batch_size: 每批查询的菜谱数量
+            progress: 构建进度（BuildProgress），None表示不报告
+        
         Returns:
             结构化的菜谱文档列表
         """
-        logger.info("正在构建菜谱文档...")
+        logger.info(f"正在构建菜谱文档，批次大小: {batch_size}...")
         
         documents = []
+        for batch_documents in self.iter_recipe_document_batches(batch_size, progress=progress):
+            documents.extend(batch_documents)
         
-        with self.driver.session() as session:
-            for recipe in self.recipes:
+        self.documents = documents
+        logger.info(f"成功构建 {len(documents)} 个菜谱文档")
+        return documents
+    
+    def iter_recipe_document_batches(self, batch_size: int = 500, progress=None) -> Iterator[List[Document]]:
+        """
+        逐批构建菜谱文档（生成器），供流式构建边读取边向量化
+        
+        Args:
+            batch_size: 每批查询的菜谱数量
+            progress: 构建进度（BuildProgress），按已处理的菜谱数报告 documents 阶段
+        
+        Yields:
+            一批菜谱文档
+        """
+        if progress:
+            progress.start("documents", total=len(self.recipes))
+        for start in range(0, len(self.recipes), batch_size):
+            batch = self.recipes[start:start + batch_size]
+            ingredients_by_recipe, steps_by_recipe = self._fetch_recipe_details(
+                [recipe.node_id for recipe in batch], batch_number=start // batch_size + 1
+            )
+            
+            documents = []
+            for recipe in batch:
                 try:
-                    recipe_id = recipe.node_id
-                    recipe_name = recipe.name
-                    
-                    # 获取菜谱的相关食材
-                    ingredients_query = """
-                    MATCH (r:Recipe {nodeId: $recipe_id})-[req:REQUIRES]->(i:Ingredient)
-                    RETURN i.name as name, i.category as category, 
-                           req.amount as amount, req.unit as unit,
-                           i.description as description
-                    ORDER BY i.name
-                    """
-                    
-                    ingredients_result = session.run(ingredients_query, {"recipe_id": recipe_id})
-                    ingredients_info = []
-                    for ing_record in ingredients_result:
-                        amount = ing_record.get("amount", "")
-                        unit = ing_record.get("unit", "")
-                        ingredient_text = f"{ing_record['name']}"
-                        if amount and unit:
-                            ingredient_text += f"({amount}{unit})"
-                        if ing_record.get("description"):
-                            ingredient_text += f" - {ing_record['description']}"
-                        ingredients_info.append(ingredient_text)
-                    
-                    # 获取菜谱的烹饪步骤
-                    steps_query = """
-                    MATCH (r:Recipe {nodeId: $recipe_id})-[c:CONTAINS_STEP]->(s:CookingStep)
-                    RETURN s.name as name, s.description as description,
-                           s.stepNumber as stepNumber, s.methods as methods,
-                           s.tools as tools, s.timeEstimate as timeEstimate,
-                           c.stepOrder as stepOrder
-                    ORDER BY COALESCE(c.stepOrder, s.stepNumber, 999)
-                    """
-                    
-                    steps_result = session.run(steps_query, {"recipe_id": recipe_id})
-                    steps_info = []
-                    for step_record in steps_result:
-                        step_text = f"步骤: {step_record['name']}"
-                        if step_record.get("description"):
-                            step_text += f"\n描述: {step_record['description']}"
-                        if step_record.get("methods"):
-                            step_text += f"\n方法: {step_record['methods']}"
-                        if step_record.get("tools"):
-                            step_text += f"\n工具: {step_record['tools']}"
-                        if step_record.get("timeEstimate"):
-                            step_text += f"\n时间: {step_record['timeEstimate']}"
-                        steps_info.append(step_text)
-                    
-                    # 构建完整的菜谱文档内容
-                    content_parts = [f"# {recipe_name}"]
-                    
-                    # 添加菜谱基本信息
-                    if recipe.properties.get("description"):
-                        content_parts.append(f"\n## 菜品描述\n{recipe.properties['description']}")
-                    
-                    if recipe.properties.get("cuisineType"):
-                        content_parts.append(f"\n菜系: {recipe.properties['cuisineType']}")
-                    
-                    if recipe.properties.get("difficulty"):
-                        content_parts.append(f"难度: {recipe.properties['difficulty']}星")
-                    
-                    if recipe.properties.get("prepTime") or recipe.properties.get("cookTime"):
-                        time_info = []
-                        if recipe.properties.get("prepTime"):
-                            time_info.append(f"准备时间: {recipe.properties['prepTime']}")
-                        if recipe.properties.get("cookTime"):
-                            time_info.append(f"烹饪时间: {recipe.properties['cookTime']}")
-                        content_parts.append(f"\n时间信息: {', '.join(time_info)}")
-                    
-                    if recipe.properties.get("servings"):
-                        content_parts.append(f"份量: {recipe.properties['servings']}")
-                    
-                    # 添加食材信息
-                    if ingredients_info:
-                        content_parts.append("\n## 所需食材")
-                        for i, ingredient in enumerate(ingredients_info, 1):
-                            content_parts.append(f"{i}. {ingredient}")
-                    
-                    # 添加步骤信息
-                    if steps_info:
-                        content_parts.append("\n## 制作步骤")
-                        for i, step in enumerate(steps_info, 1):
-                            content_parts.append(f"\n### 第{i}步\n{step}")
-                    
-                    # 添加标签信息
-                    if recipe.properties.get("tags"):
-                        content_parts.append(f"\n## 标签\n{recipe.properties['tags']}")
-                    
-                    # 组合成最终内容
-                    full_content = "\n".join(content_parts)
-                    
-                    # 创建文档对象
-                    doc = Document(
-                        page_content=full_content,
-                        metadata={
-                            "node_id": recipe_id,
-                            "recipe_name": recipe_name,
-                            "node_type": "Recipe",
-                            "category": recipe.properties.get("category", "未知"),
-                            "cuisine_type": recipe.properties.get("cuisineType", "未知"),
-                            "difficulty": recipe.properties.get("difficulty", 0),
-                            "prep_time": recipe.properties.get("prepTime", ""),
-                            "cook_time": recipe.properties.get("cookTime", ""),
-                            "servings": recipe.properties.get("servings", ""),
-                            "ingredients_count": len(ingredients_info),
-                            "steps_count": len(steps_info),
-                            "doc_type": "recipe",
-                            "content_length": len(full_content)
-                        }
+                    doc = self._build_recipe_document(
+                        recipe,
+                        ingredients_by_recipe.get(recipe.node_id, []),
+                        steps_by_recipe.get(recipe.node_id, [])
                     )
-                    
                     documents.append(doc)
-                    
                 except Exception as e:
-                    logger.warning(f"构建菜谱文档失败 {recipe_name} (ID: {recipe_id}): {e}")
+                    logger.warning(f"构建菜谱文档失败 {recipe.name} (ID: {recipe.node_id}): {e}")
                     continue
+            
+            logger.info(f"已构建 {min(start + batch_size, len(self.recipes))}/{len(self.recipes)} 个菜谱文档")
+            if progress:
+                progress.advance("documents", len(batch))
+            yield documents
+        if progress:
+            progress.finish("documents")
+    
+    def _fetch_recipe_details(self, recipe_ids: List[str], batch_number: int):
+        """
+        获取一批菜谱的食材和步骤
         
-        self.documents = documents
-        logger.info(f"成功构建 {len(documents)} 个菜谱文档")
-        return documents
+        批量查询在只读事务函数中执行，瞬时错误由驱动自动重试；仍然失败时逐个菜谱查询，
+        单个菜谱也查询失败时抛出异常使构建失败，不会静默丢弃菜谱（构建失败时别名不切换）
+        
+        Args:
+            recipe_ids: 菜谱节点ID列表
+            batch_number: 批次序号，用于日志
+            
+        Returns:
+            (菜谱ID -> 食材文本列表, 菜谱ID -> 步骤文本列表)
+        """
+        try:
+            return self.driver.execute_read(self._fetch_recipe_details_tx, recipe_ids)
+        except Exception as e:
+            logger.warning(f"批量获取菜谱详情失败 (第 {batch_number} 批)，改为逐个菜谱获取: {e}")
+        
+        ingredients_by_recipe, steps_by_recipe = {}, {}
+        for recipe_id in recipe_ids:
+            try:
+                ingredients, steps = self.driver.execute_read(self._fetch_recipe_details_tx, [recipe_id])
+            except Exception as e:
+                raise RuntimeError(f"获取菜谱详情失败 (ID: {recipe_id}): {e}") from e
+            ingredients_by_recipe.update(ingredients)
+            steps_by_recipe.update(steps)
+        return ingredients_by_recipe, steps_by_recipe
+    
+    def _fetch_recipe_details_tx(self, tx, recipe_ids: List[str]):
+        """在事务中查询一批菜谱的食材和步骤（可能被重试，无副作用）"""
+        return self._fetch_ingredients_batch(tx, recipe_ids), self._fetch_steps_batch(tx, recipe_ids)
+    
+    def _fetch_ingredients_batch(self, tx, recipe_ids: List[str]) -> Dict[str, List[str]]:
+        """
+        批量获取一页菜谱的食材信息
+        
+        Args:
+            tx: Neo4j事务
+            recipe_ids: 菜谱节点ID列表
+            
+        Returns:
+            菜谱ID -> 格式化后的食材文本列表（按食材名称排序）
+        """
+        ingredients_query = """
+        UNWIND $recipe_ids AS recipe_id
+        MATCH (r:Recipe {nodeId: recipe_id})-[req:REQUIRES]->(i:Ingredient)
+        WITH recipe_id, i, req
+        ORDER BY recipe_id, i.name
+        RETURN recipe_id,
+               collect({name: i.name, category: i.category,
+                        amount: req.amount, unit: req.unit,
+                        description: i.description}) as ingredients
+        """
+        
+        ingredients_by_recipe = {}
+        for record in tx.run(ingredients_query, {"recipe_ids": recipe_ids}):
+            ingredients_by_recipe[record["recipe_id"]] = [
+                self._format_ingredient(ingredient) for ingredient in record["ingredients"]
+            ]
+        return ingredients_by_recipe
     
-    def chunk_documents(self, chunk_size: int = 500, chunk_overlap: int = 50) -> List[Document]:
+    def _fetch_steps_batch(self, tx, recipe_ids: List[str]) -> Dict[str, List[str]]:
+        """
+        批量获取一页菜谱的烹饪步骤
+        
+        Args:
+            tx: Neo4j事务
+            recipe_ids: 菜谱节点ID列表
+            
+        Returns:
+            菜谱ID -> 格式化后的步骤文本列表（按步骤顺序排序）
+        """
+        steps_query = """
+        UNWIND $recipe_ids AS recipe_id
+        MATCH (r:Recipe {nodeId: recipe_id})-[c:CONTAINS_STEP]->(s:CookingStep)
+        WITH recipe_id, s, c
+        ORDER BY recipe_id, COALESCE(c.stepOrder, s.stepNumber, 999)
+        RETURN recipe_id,
+               collect({name: s.name, description: s.description,
+                        stepNumber: s.stepNumber, methods: s.methods,
+                        tools: s.tools, timeEstimate: s.timeEstimate,
+                        stepOrder: c.stepOrder}) as steps
+        """
+        
+        steps_by_recipe = {}
+        for record in tx.run(steps_query, {"recipe_ids": recipe_ids}):
+            steps_by_recipe[record["recipe_id"]] = [
+                self._format_step(step) for step in record["steps"]
+            ]
+        return steps_by_recipe
+    
+    @staticmethod
+    def _format_ingredient(ingredient: Dict[str, Any]) -> str:
+        """格式化单个食材的文本"""
+        amount = ingredient.get("amount", "")
+        unit = ingredient.get("unit", "")
+        ingredient_text = f"{ingredient['name']}"
+        if amount and unit:
+            ingredient_text += f"({amount}{unit})"
+        if ingredient.get("description"):
+            ingredient_text += f" - {ingredient['description']}"
+        return ingredient_text
+    
+    @staticmethod
+    def _format_step(step: Dict[str, Any]) -> str:
+        """格式化单个烹饪步骤的文本"""
+        step_text = f"步骤: {step['name']}"
+        if step.get("description"):
+            step_text += f"\n描述: {step['description']}"
+        if step.get("methods"):
+            step_text += f"\n方法: {step['methods']}"
+        if step.get("tools"):
+            step_text += f"\n工具: {step['tools']}"
+        if step.get("timeEstimate"):
+            step_text += f"\n时间: {step['timeEstimate']}"
+        return step_text
+    
+    def _build_recipe_document(self, recipe: GraphNode, ingredients_info: List[str],
+                               steps_info: List[str]) -> Document:
+        """
+        根据菜谱节点及其食材、步骤组装Markdown文档
+        
+        Args:
+            recipe: 菜谱节点
+            ingredients_info: 格式化后的食材文本列表
+            steps_info: 格式化后的步骤文本列表
+            
+        Returns:
+            菜谱文档
+        """
+        recipe_id = recipe.node_id
+        recipe_name = recipe.name
+        
+        # 构建完整的菜谱文档内容
+        content_parts = [f"# {recipe_name}"]
+        
+        # 添加菜谱基本信息
+        if recipe.properties.get("description"):
+            content_parts.append(f"\n## 菜品描述\n{recipe.properties['description']}")
+        
+        if recipe.properties.get("cuisineType"):
+            content_parts.append(f"\n菜系: {recipe.properties['cuisineType']}")
+        
+        if recipe.properties.get("difficulty"):
+            content_parts.append(f"难度: {recipe.properties['difficulty']}星")
+        
+        if recipe.properties.get("prepTime") or recipe.properties.get("cookTime"):
+            time_info = []
+            if recipe.properties.get("prepTime"):
+                time_info.append(f"准备时间: {recipe.properties['prepTime']}")
+            if recipe.properties.get("cookTime"):
+                time_info.append(f"烹饪时间: {recipe.properties['cookTime']}")
+            content_parts.append(f"\n时间信息: {', '.join(time_info)}")
+        
+        if recipe.properties.get("servings"):
+            content_parts.append(f"份量: {recipe.properties['servings']}")
+        
+        # 添加食材信息
+        if ingredients_info:
+            content_parts.append("\n## 所需食材")
+            for i, ingredient in enumerate(ingredients_info, 1):
+                content_parts.append(f"{i}. {ingredient}")
+        
+        # 添加步骤信息
+        if steps_info:
+            content_parts.append("\n## 制作步骤")
+            for i, step in enumerate(steps_info, 1):
+                content_parts.append(f"\n### 第{i}步\n{step}")
+        
+        # 添加标签信息
+        if recipe.properties.get("tags"):
+            content_parts.append(f"\n## 标签\n{recipe.properties['tags']}")
+        
+        # 组合成最终内容
+        full_content = "\n".join(content_parts)
+        
+        # 创建文档对象
+        return Document(
+            page_content=full_content,
+            metadata={
+                "node_id": recipe_id,
+                "recipe_name": recipe_name,
+                "node_type": "Recipe",
+                "category": recipe.properties.get("category", "未知"),
+                "cuisine_type": recipe.properties.get("cuisineType", "未知"),
+                "difficulty": recipe.properties.get("difficulty", 0),
+                "prep_time": recipe.properties.get("prepTime", ""),
+                "cook_time": recipe.properties.get("cookTime", ""),
+                "servings": recipe.properties.get("servings", ""),
+                "ingredients_count": len(ingredients_info),
+                "steps_count": len(steps_info),
+                "doc_type": "recipe",
+                "content_length": len(full_content)
+            }
+        )
+    
+    def chunk_documents(self, chunk_size: int = 500, chunk_overlap: int = 50, progress=None) -> List[Document]:
         """
         对文档进行分块处理
         
+        块ID由父文档节点ID和块序号组成（{node_id}_chunk_{i}），
+        只要菜谱内容不变，块ID在多次构建之间保持稳定，便于增量同步
+        
         Args:
             chunk_size: 分块大小
             chunk_overlap: 重叠大小
+            progress: 构建进度（BuildProgress），按生成的块数报告 chunking 阶段
             
         Returns:
             分块后的文档列表
@@ -327,88 +455,135 @@ class GraphDataPreparationModule:
         if not self.documents:
             raise ValueError("请先构建文档")
         
+        if progress:
+            progress.start("chunking")
         chunks = []
-        chunk_id = 0
-        
         for doc in self.documents:
-            content = doc.page_content
-            
-            # 简单的按长度分块
-            if len(content) <= chunk_size:
-                # 内容较短，不需要分块
-                chunk = Document(
-                    page_content=content,
-                    metadata={
-                        **doc.metadata,
-                        "chunk_id": f"{doc.metadata['node_id']}_chunk_{chunk_id}",
-                        "parent_id": doc.metadata["node_id"],
-                        "chunk_index": 0,
-                        "total_chunks": 1,
-                        "chunk_size": len(content),
-                        "doc_type": "chunk"
-                    }
-                )
-                chunks.append(chunk)
-                chunk_id += 1
-            else:
-                # 按章节分块（基于标题）
-                sections = content.split('\n## ')
-                if len(sections) <= 1:
-                    # 没有二级标题，按长度强制分块
-                    total_chunks = (len(content) - 1) // (chunk_size - chunk_overlap) + 1
-                    
-                    for i in range(total_chunks):
-                        start = i * (chunk_size - chunk_overlap)
-                        end = min(start + chunk_size, len(content))
-                        
-                        chunk_content = content[start:end]
-                        
-                        chunk = Document(
-                            page_content=chunk_content,
-                            metadata={
-                                **doc.metadata,
-                                "chunk_id": f"{doc.metadata['node_id']}_chunk_{chunk_id}",
-                                "parent_id": doc.metadata["node_id"],
-                                "chunk_index": i,
-                                "total_chunks": total_chunks,
-                                "chunk_size": len(chunk_content),
-                                "doc_type": "chunk"
-                            }
-                        )
-                        chunks.append(chunk)
-                        chunk_id += 1
-                else:
-                    # 按章节分块
-                    total_chunks = len(sections)
-                    for i, section in enumerate(sections):
-                        if i == 0:
-                            # 第一个部分包含标题
-                            chunk_content = section
-                        else:
-                            # 其他部分添加章节标题
-                            chunk_content = f"## {section}"
-                        
-                        chunk = Document(
-                            page_content=chunk_content,
-                            metadata={
-                                **doc.metadata,
-                                "chunk_id": f"{doc.metadata['node_id']}_chunk_{chunk_id}",
-                                "parent_id": doc.metadata["node_id"],
-                                "chunk_index": i,
-                                "total_chunks": total_chunks,
-                                "chunk_size": len(chunk_content),
-                                "doc_type": "chunk",
-                                "section_title": section.split('\n')[0] if i > 0 else "主标题"
-                            }
-                        )
-                        chunks.append(chunk)
-                        chunk_id += 1
+            doc_chunks = self._chunk_document(doc, chunk_size, chunk_overlap)
+            chunks.extend(doc_chunks)
+            if progress:
+                progress.advance("chunking", len(doc_chunks))
+        if progress:
+            progress.finish("chunking")
         
         self.chunks = chunks
         logger.info(f"文档分块完成，共生成 {len(chunks)} 个块")
         return chunks
     
+    def iter_chunks(self, chunk_size: int = 500, chunk_overlap: int = 50,
+                    batch_size: int = 500, collect: bool = True, progress=None) -> Iterator[Document]:
+        """
+        流式构建文档并分块（生成器）：每读取一批菜谱就产出其文档块，
+        与下游的向量化、插入阶段重叠执行
+        
+        Args:
+            chunk_size: 分块大小
+            chunk_overlap: 重叠大小
+            batch_size: 每批查询的菜谱数量
+            collect: 是否同时保存到 self.documents / self.chunks（检索器初始化需要完整的文档块）
+            progress: 构建进度（BuildProgress），报告 documents 和 chunking 阶段
+        
+        Yields:
+            文档块
+        """
+        if collect:
+            self.documents = []
+            self.chunks = []
+        
+        if progress:
+            progress.start("chunking")
+        document_count = 0
+        chunk_count = 0
+        for documents in self.iter_recipe_document_batches(batch_size, progress=progress):
+            for doc in documents:
+                doc_chunks = self._chunk_document(doc, chunk_size, chunk_overlap)
+                if collect:
+                    self.documents.append(doc)
+                    self.chunks.extend(doc_chunks)
+                document_count += 1
+                chunk_count += len(doc_chunks)
+                if progress:
+                    progress.advance("chunking", len(doc_chunks))
+                yield from doc_chunks
+        if progress:
+            progress.finish("chunking")
+        
+        logger.info(f"流式分块完成，共 {document_count} 个文档、{chunk_count} 个块")
+    
+    def _chunk_document(self, doc: Document, chunk_size: int, chunk_overlap: int) -> List[Document]:
+        """对单个文档分块"""
+        content = doc.page_content
+        chunks = []
+        
+        # 简单的按长度分块
+        if len(content) <= chunk_size:
+            # 内容较短，不需要分块
+            chunk = Document(
+                page_content=content,
+                metadata={
+                    **doc.metadata,
+                    "chunk_id": f"{doc.metadata['node_id']}_chunk_0",
+                    "parent_id": doc.metadata["node_id"],
+                    "chunk_index": 0,
+                    "total_chunks": 1,
+                    "chunk_size": len(content),
+                    "doc_type": "chunk"
+                }
+            )
+            chunks.append(chunk)
+        else:
+            # 按章节分块（基于标题）
+            sections = content.split('\n## ')
+            if len(sections) <= 1:
+                # 没有二级标题，按长度强制分块
+                total_chunks = (len(content) - 1) // (chunk_size - chunk_overlap) + 1
+
+                for i in range(total_chunks):
+                    start = i * (chunk_size - chunk_overlap)
+                    end = min(start + chunk_size, len(content))
 
+                    chunk_content = content[start:end]
+
+                    chunk = Document(
+                        page_content=chunk_content,
+                        metadata={
+                            **doc.metadata,
+                            "chunk_id": f"{doc.metadata['node_id']}_chunk_{i}",
+                            "parent_id": doc.metadata["node_id"],
+                            "chunk_index": i,
+                            "total_chunks": total_chunks,
+                            "chunk_size": len(chunk_content),
+                            "doc_type": "chunk"
+                        }
+                    )
+                    chunks.append(chunk)
+            else:
+                # 按章节分块
+                total_chunks = len(sections)
+                for i, section in enumerate(sections):
+                    if i == 0:
+                        # 第一个部分包含标题
+                        chunk_content = section
+                    else:
+                        # 其他部分添加章节标题
+                        chunk_content = f"## {section}"
+
+                    chunk = Document(
+                        page_content=chunk_content,
+                        metadata={
+                            **doc.metadata,
+                            "chunk_id": f"{doc.metadata['node_id']}_chunk_{i}",
+                            "parent_id": doc.metadata["node_id"],
+                            "chunk_index": i,
+                            "total_chunks": total_chunks,
+                            "chunk_size": len(chunk_content),
+                            "doc_type": "chunk",
+                            "section_title": section.split('\n')[0] if i > 0 else "主标题"
+                        }
+                    )
+                    chunks.append(chunk)
+        
+        return chunks
     
     def get_statistics(self) -> Dict[str, Any]:
         """
@@ -11,7 +11,11 @@ from dataclasses import dataclass
 from enum import Enum
 
 from langchain_core.documents import Document
-from neo4j import GraphDatabase
+
+from .graph_schema import GRAPH_LABELS, labeled_node_lookup
+from .graph_snapshot import GraphSnapshot
+from .neo4j_driver_registry import Neo4jDriverRegistry
+from .graph_statistics import degree_expression
 
 logger = logging.getLogger(__name__)
 
@@ -63,37 +67,59 @@ class GraphRAGRetrieval:
     5. 动态查询规划：自适应遍历策略
     """
     
-    def __init__(self, config, llm_client):
+    def __init__(self, config, llm_client, driver_registry=None):
         self.config = config
         self.llm_client = llm_client
-        self.driver = None
+        # 共享的Neo4j驱动（Neo4jDriverRegistry）；未提供时在 initialize 中自行创建并负责关闭
+        self.driver = driver_registry
+        self._owns_driver = False
+        # 连接是否可用；连接失败时保留驱动引用，再次 initialize 时重试
+        self.available = False
         
         # 图结构缓存
         self.entity_cache = {}
         self.relation_cache = {}
         self.subgraph_cache = {}
         
+        # 进程内CSR图快照（可选），启用后多跳遍历和子图提取在本地执行
+        self.snapshot: Optional[GraphSnapshot] = None
+        
     def initialize(self):
         """初始化图RAG检索系统"""
         logger.info("初始化图RAG检索系统...")
         
         # 连接Neo4j
         try:
-            self.driver = GraphDatabase.driver(
-                self.config.neo4j_uri, 
-                auth=(self.config.neo4j_user, self.config.neo4j_password)
-            )
+            if self.driver is None:
+                self.driver = Neo4jDriverRegistry.from_config(self.config)
+                self._owns_driver = True
+            self.driver.connect()
             # 测试连接
-            with self.driver.session() as session:
-                session.run("RETURN 1")
+            self.driver.run_read("RETURN 1")
+            self.available = True
             logger.info("Neo4j连接成功")
         except Exception as e:
             logger.error(f"Neo4j连接失败: {e}")
+            self.available = False
             return
         
         # 预热：构建实体和关系索引
         self._build_graph_index()
         
+        # 加载图快照；检索器随知识库重建而重建，快照也随之刷新
+        if self.config.enable_graph_snapshot:
+            self.load_snapshot()
+        
+    def load_snapshot(self) -> bool:
+        """从Neo4j加载图快照，失败时继续使用Neo4j遍历"""
+        try:
+            self.snapshot = GraphSnapshot.load(self.driver, max_paths=self.config.graph_snapshot_max_paths)
+            return True
+        except Exception as e:
+            logger.error(f"加载图快照失败，使用Neo4j遍历: {e}")
+            self.snapshot = None
+            return False
+        
     def _build_graph_index(self):
         """构建图索引以加速查询"""
         logger.info("构建图结构索引...")
@@ -101,12 +127,17 @@ class GraphRAGRetrieval:
         try:
             with self.driver.session() as session:
                 # 构建实体索引 - 修复Neo4j语法兼容性问题
-                entity_query = """
-                MATCH (n)
-                WHERE n.nodeId IS NOT NULL
-                WITH n, COUNT { (n)--() } as degree
+                # 度数读取物化的 n.degree，不再为每个节点实时计数；按标签分支走 nodeId 索引
+                label_branches = "\n                    UNION".join(f"""
+                    MATCH (n:{label})
+                    WHERE n.nodeId IS NOT NULL
+                    RETURN n""" for label in GRAPH_LABELS)
+                entity_query = f"""
+                CALL {{{label_branches}
+                }}
+                WITH n, {degree_expression("n")} as degree
                 RETURN labels(n) as node_labels, n.nodeId as node_id, 
-                       n.name as name, n.category as category, degree
+                       n.name as name, n.category as category, degree, n.pagerank as pagerank
                 ORDER BY degree DESC
                 LIMIT 1000
                 """
@@ -118,7 +149,8 @@ class GraphRAGRetrieval:
                         "labels": record["node_labels"],
                         "name": record["name"],
                         "category": record["category"],
-                        "degree": record["degree"]
+                        "degree": record["degree"],
+                        "pagerank": record["pagerank"]
                     }
                 
                 # 构建关系类型索引
@@ -260,42 +292,32 @@ class GraphRAGRetrieval:
                 max_depth=2
             )
     
-    def multi_hop_traversal(self, graph_query: GraphQuery) -> List[GraphPath]:
+    @staticmethod
+    def _build_multi_hop_cypher(max_depth: int, has_target_keywords: bool, degree_expr: str = None) -> str:
         """
-        多跳图遍历：这是图RAG的核心优势
-        通过图结构发现隐含的知识关联
-        """
-        logger.info(f"执行多跳遍历: {graph_query.source_entities} -> {graph_query.target_entities}")
+        构建多跳推理Cypher
         
-        paths = []
+        Args:
+            max_depth: 最大跳数
+            has_target_keywords: 是否按目标关键词过滤终点
+            degree_expr: 路径节点 n 的度数表达式，默认读取物化的 n.degree
+        """
+        if degree_expr is None:
+            degree_expr = degree_expression("n")
         
-        if not self.driver:
-            logger.error("Neo4j连接未建立")
-            return paths
-            
-        try:
-            with self.driver.session() as session:
-                # 构建多跳遍历查询
-                source_entities = graph_query.source_entities
-                target_keywords = graph_query.target_entities or []
-                max_depth = graph_query.max_depth
-                
-                # 根据查询类型选择不同的遍历策略
-                if graph_query.query_type == QueryType.MULTI_HOP:
-                    # 根据是否有目标关键词动态拼接过滤条件
-                    target_filter_clause = ""
-                    if target_keywords:
-                        target_filter_clause = """
+        # 根据是否有目标关键词动态拼接过滤条件
+        target_filter_clause = ""
+        if has_target_keywords:
+            target_filter_clause = """
                     AND ANY(kw IN $target_keywords WHERE
                         (target.name IS NOT NULL AND (toString(target.name) CONTAINS kw OR kw CONTAINS toString(target.name))) OR
                         (target.category IS NOT NULL AND (toString(target.category) CONTAINS kw OR kw CONTAINS toString(target.category)))
                     )"""
-                    
-                    cypher_query = f"""
+        
+        return f"""
                     // 多跳推理查询
                     UNWIND $source_entities as source_name
-                    MATCH (source)
-                    WHERE source.name CONTAINS source_name OR source.nodeId = source_name
+                    {labeled_node_lookup("source", "source_name")}
                     
                     // 执行多跳遍历
                     MATCH path = (source)-[*1..{max_depth}]-(target)
@@ -307,10 +329,10 @@ class GraphRAGRetrieval:
                          relationships(path) as rels,
                          nodes(path) as path_nodes
                     
-                    // 路径评分：短路径 + 高度数节点 + 关系类型匹配
+                    // 路径评分：短路径 + 高度数节点 + 关系类型匹配（度数读取物化属性）
                     WITH path, source, target, path_len, rels, path_nodes,
                          (1.0 / path_len) + 
-                         (REDUCE(s = 0.0, n IN path_nodes | s + COUNT {{ (n)--() }}) / 10.0 / size(path_nodes)) +
+                         (REDUCE(s = 0.0, n IN path_nodes | s + {degree_expr}) / 10.0 / size(path_nodes)) +
                          (CASE WHEN ANY(r IN rels WHERE type(r) IN $relation_types) THEN 0.3 ELSE 0.0 END) as relevance
                     
                     ORDER BY relevance DESC
@@ -318,28 +340,81 @@ class GraphRAGRetrieval:
                     
                     RETURN path, source, target, path_len, rels, path_nodes, relevance
                     """
+    
+    @staticmethod
+    def _build_subgraph_cypher(max_depth: int, max_nodes: int) -> str:
+        """
+        构建子图提取Cypher（不依赖APOC）
+        
+        Args:
+            max_depth: 邻居扩展深度
+            max_nodes: 返回的最大节点/关系数
+        """
+        return f"""
+                    // 找到源实体
+                    UNWIND $source_entities as entity_name
+                    {labeled_node_lookup("source", "entity_name")}
                     
-                    params = {
-                        "source_entities": source_entities,
-                        "relation_types": graph_query.relation_types or []
-                    }
-                    if target_keywords:
-                        params["target_keywords"] = target_keywords
+                    // 获取指定深度的邻居
+                    MATCH (source)-[r*1..{max_depth}]-(neighbor)
+                    WITH source, collect(DISTINCT neighbor) as neighbors, 
+                         collect(DISTINCT r) as relationships
+                    WHERE size(neighbors) <= $max_nodes
                     
-                    result = session.run(cypher_query, params)
+                    // 计算图指标
+                    WITH source, neighbors, relationships,
+                         size(neighbors) as node_count,
+                         size(relationships) as rel_count
                     
-                    for record in result:
-                        path_data = self._parse_neo4j_path(record)
-                        if path_data:
-                            paths.append(path_data)
-                
-                elif graph_query.query_type == QueryType.ENTITY_RELATION:
-                    # 实体间关系查询
-                    paths.extend(self._find_entity_relations(graph_query, session))
-                
-                elif graph_query.query_type == QueryType.PATH_FINDING:
-                    # 最短路径查找
-                    paths.extend(self._find_shortest_paths(graph_query, session))
+                    RETURN 
+                        source,
+                        neighbors[0..{max_nodes}] as nodes,
+                        relationships[0..{max_nodes}] as rels,
+                        {{
+                            node_count: node_count,
+                            relationship_count: rel_count,
+                            density: CASE WHEN node_count > 1 THEN toFloat(rel_count) / (node_count * (node_count - 1) / 2) ELSE 0.0 END
+                        }} as metrics
+                    """
+
+    def multi_hop_traversal(self, graph_query: GraphQuery) -> List[GraphPath]:
+        """
+        多跳图遍历：这是图RAG的核心优势
+        通过图结构发现隐含的知识关联
+        """
+        logger.info(f"执行多跳遍历: {graph_query.source_entities} -> {graph_query.target_entities}")
+        
+        paths = []
+        
+        # 本地快照只覆盖多跳查询，失败时回退到Neo4j
+        if self.snapshot and graph_query.query_type == QueryType.MULTI_HOP:
+            try:
+                for path in self.snapshot.multi_hop_paths(
+                    graph_query.source_entities,
+                    graph_query.target_entities,
+                    graph_query.relation_types,
+                    graph_query.max_depth
+                ):
+                    paths.append(GraphPath(
+                        nodes=path["nodes"],
+                        relationships=path["relationships"],
+                        path_length=path["path_length"],
+                        relevance_score=path["relevance"],
+                        path_type="multi_hop"
+                    ))
+                logger.info(f"本地快照多跳遍历完成，找到 {len(paths)} 条路径")
+                return paths
+            except Exception as e:
+                logger.error(f"本地快照多跳遍历失败，回退到Neo4j: {e}")
+                paths = []
+        
+        if not self.available:
+            logger.error("Neo4j连接未建立")
+            return paths
+            
+        try:
+            # 只读事务函数：瞬时错误由驱动自动重试，集群部署时路由到读副本
+            paths.extend(self.driver.execute_read(self._multi_hop_in_tx, graph_query))
                     
         except Exception as e:
             logger.error(f"多跳遍历失败: {e}")
@@ -347,6 +422,42 @@ class GraphRAGRetrieval:
         logger.info(f"多跳遍历完成，找到 {len(paths)} 条路径")
         return paths
     
+    def _multi_hop_in_tx(self, tx, graph_query: GraphQuery) -> List[GraphPath]:
+        """在只读事务中执行多跳遍历（可能被重试，结果在事务内消费完毕）"""
+        paths = []
+        # 构建多跳遍历查询
+        source_entities = graph_query.source_entities
+        target_keywords = graph_query.target_entities or []
+        max_depth = graph_query.max_depth
+
+        # 根据查询类型选择不同的遍历策略
+        if graph_query.query_type == QueryType.MULTI_HOP:
+            cypher_query = self._build_multi_hop_cypher(max_depth, bool(target_keywords))
+
+            params = {
+                "source_entities": source_entities,
+                "relation_types": graph_query.relation_types or []
+            }
+            if target_keywords:
+                params["target_keywords"] = target_keywords
+
+            result = tx.run(cypher_query, params)
+
+            for record in result:
+                path_data = self._parse_neo4j_path(record)
+                if path_data:
+                    paths.append(path_data)
+
+        elif graph_query.query_type == QueryType.ENTITY_RELATION:
+            # 实体间关系查询
+            paths.extend(self._find_entity_relations(graph_query, tx))
+
+        elif graph_query.query_type == QueryType.PATH_FINDING:
+            # 最短路径查找
+            paths.extend(self._find_shortest_paths(graph_query, tx))
+        
+        return paths
+    
     def extract_knowledge_subgraph(self, graph_query: GraphQuery) -> KnowledgeSubgraph:
         """
         提取知识子图：获取实体相关的完整知识网络
@@ -354,50 +465,33 @@ class GraphRAGRetrieval:
         """
         logger.info(f"提取知识子图: {graph_query.source_entities}")
         
-        if not self.driver:
+        if self.snapshot:
+            try:
+                subgraph = self.snapshot.extract_subgraph(
+                    graph_query.source_entities,
+                    graph_query.max_depth,
+                    graph_query.max_nodes
+                )
+                if subgraph is None:
+                    return self._fallback_subgraph_extraction(graph_query)
+                return KnowledgeSubgraph(reasoning_chains=[], **subgraph)
+            except Exception as e:
+                logger.error(f"本地快照子图提取失败，回退到Neo4j: {e}")
+        
+        if not self.available:
             logger.error("Neo4j连接未建立")
             return self._fallback_subgraph_extraction(graph_query)
         
         try:
-            with self.driver.session() as session:
-                # 简化的子图提取（不依赖APOC）
-                cypher_query = f"""
-                // 找到源实体
-                UNWIND $source_entities as entity_name
-                MATCH (source)
-                WHERE source.name CONTAINS entity_name 
-                   OR source.nodeId = entity_name
-                
-                // 获取指定深度的邻居
-                MATCH (source)-[r*1..{graph_query.max_depth}]-(neighbor)
-                WITH source, collect(DISTINCT neighbor) as neighbors, 
-                     collect(DISTINCT r) as relationships
-                WHERE size(neighbors) <= $max_nodes
-                
-                // 计算图指标
-                WITH source, neighbors, relationships,
-                     size(neighbors) as node_count,
-                     size(relationships) as rel_count
-                
-                RETURN 
-                    source,
-                    neighbors[0..{graph_query.max_nodes}] as nodes,
-                    relationships[0..{graph_query.max_nodes}] as rels,
-                    {{
-                        node_count: node_count,
-                        relationship_count: rel_count,
-                        density: CASE WHEN node_count > 1 THEN toFloat(rel_count) / (node_count * (node_count - 1) / 2) ELSE 0.0 END
-                    }} as metrics
-                """
-                
-                result = session.run(cypher_query, {
-                    "source_entities": graph_query.source_entities,
-                    "max_nodes": graph_query.max_nodes
-                })
-                
-                record = result.single()
-                if record:
-                    return self._build_knowledge_subgraph(record)
+            cypher_query = self._build_subgraph_cypher(graph_query.max_depth, graph_query.max_nodes)
+            
+            records = self.driver.run_read(cypher_query, {
+                "source_entities": graph_query.source_entities,
+                "max_nodes": graph_query.max_nodes
+            })
+            
+            if records:
+                return self._build_knowledge_subgraph(records[0])
                     
         except Exception as e:
             logger.error(f"子图提取失败: {e}")
@@ -479,18 +573,22 @@ class GraphRAGRetrieval:
             
         return query_plans
     
-    def graph_rag_search(self, query: str, top_k: int = 5) -> List[Document]:
+    def graph_rag_search(self, query: str, top_k: int = 5, graph_query: Optional[GraphQuery] = None) -> List[Document]:
         """
         图RAG主搜索接口：整合所有图RAG能力
+        
+        Args:
+            graph_query: 统一查询规划已给出的图查询结构，提供时跳过查询意图理解的LLM调用
         """
         logger.info(f"开始图RAG检索: {query}")
         
-        if not self.driver:
+        if not self.available:
             logger.warning("Neo4j连接未建立，返回空结果")
             return []
         
         # 1. 查询意图理解
-        graph_query = self.understand_graph_query(query)
+        if graph_query is None:
+            graph_query = self.understand_graph_query(query)
         logger.info(f"查询类型: {graph_query.query_type.value}")
         
         results = []
@@ -694,8 +792,14 @@ class GraphRAGRetrieval:
             reasoning_chains=[]
         )
     
+    def get_snapshot_stats(self) -> Optional[Dict[str, Any]]:
+        """获取图快照统计信息，未启用时返回None"""
+        return self.snapshot.get_statistics() if self.snapshot else None
+    
     def close(self):
         """关闭资源连接"""
-        if hasattr(self, 'driver') and self.driver:
+        # 共享的Neo4j驱动由系统关闭
+        if self._owns_driver and self.driver:
             self.driver.close()
-            logger.info("图RAG检索系统已关闭") 
\ No newline at end of file
+        self.available = False
+        logger.info("图RAG检索系统已关闭") 
\ No newline at end of file
@@ -0,0 +1,193 @@
+"""
+图模式管理模块
+幂等地创建检索Cypher依赖的索引，并用EXPLAIN检查关键查询是否仍然退化为全节点扫描：
+- RANGE索引：各标签的 nodeId / name，支撑等值和范围查找
+- TEXT索引：各标签的 name 以及菜谱的分类属性，支撑 CONTAINS 查找
+- 全文索引：菜谱/食材/分类名称，使用CJK分析器切分中文
+"""
+
+import logging
+import time
+from typing import Any, Dict, List, Sequence
+
+logger = logging.getLogger(__name__)
+
+# 图中的节点标签
+GRAPH_LABELS = ("Recipe", "Ingredient", "Category", "CookingStep")
+
+# 菜谱上用于主题级 CONTAINS 过滤的属性
+RECIPE_TEXT_PROPERTIES = ("category", "cuisineType", "tags")
+
+# 全文索引：索引名 -> (标签, 属性)
+FULLTEXT_INDEXES = {
+    "recipe_fulltext_index": ("Recipe", ("name", "description")),
+    "ingredient_fulltext_index": ("Ingredient", ("name",)),
+    "category_fulltext_index": ("Category", ("name",)),
+}
+
+FULLTEXT_ANALYZER = "cjk"
+
+# 出现在执行计划中即视为未使用索引的算子
+SCAN_OPERATORS = ("AllNodesScan",)
+
+
+def labeled_node_lookup(var: str, value: str, labels: Sequence[str] = GRAPH_LABELS) -> str:
+    """
+    生成按标签限定的节点查找子查询，语义等价于
+    `MATCH (var) WHERE var.name CONTAINS value OR var.nodeId = value`
+
+    每个标签、每个条件各一个UNION分支，使名称包含走TEXT索引、nodeId相等走RANGE索引，
+    而不是对所有节点做全量扫描
+
+    Args:
+        var: 结果节点变量名
+        value: 外层作用域中的查找值变量名
+        labels: 参与查找的标签
+    """
+    branches = []
+    for label in labels:
+        branches.append(f"""
+                    WITH {value}
+                    MATCH ({var}:{label})
+                    WHERE {var}.name CONTAINS {value}
+                    RETURN {var}""")
+        branches.append(f"""
+                    WITH {value}
+                    MATCH ({var}:{label} {{nodeId: {value}}})
+                    RETURN {var}""")
+    union = "\n                    UNION".join(branches)
+    return f"""CALL {{{union}
+                    }}"""
+
+
+class GraphSchemaModule:
+    """图模式（索引）管理模块"""
+
+    def __init__(self, driver, index_wait_timeout: int = 300):
+        """
+        初始化图模式管理模块
+
+        Args:
+            driver: Neo4j驱动
+            index_wait_timeout: 等待新建索引上线的秒数
+        """
+        self.driver = driver
+        self.index_wait_timeout = index_wait_timeout
+        self.last_run: Dict[str, Any] = {}
+
+    def index_statements(self) -> List[str]:
+        """全部建索引语句（均带 IF NOT EXISTS，可重复执行）"""
+        statements = []
+        for label in GRAPH_LABELS:
+            lower = label.lower()
+            statements.append(
+                f"CREATE RANGE INDEX {lower}_node_id IF NOT EXISTS FOR (n:{label}) ON (n.nodeId)")
+            statements.append(
+                f"CREATE RANGE INDEX {lower}_name IF NOT EXISTS FOR (n:{label}) ON (n.name)")
+            statements.append(
+                f"CREATE TEXT INDEX {lower}_name_text IF NOT EXISTS FOR (n:{label}) ON (n.name)")
+
+        for prop in RECIPE_TEXT_PROPERTIES:
+            statements.append(
+                f"CREATE TEXT INDEX recipe_{prop.lower()}_text IF NOT EXISTS FOR (n:Recipe) ON (n.{prop})")
+
+        for index_name, (label, props) in FULLTEXT_INDEXES.items():
+            fields = ", ".join(f"n.{prop}" for prop in props)
+            statements.append(
+                f"CREATE FULLTEXT INDEX {index_name} IF NOT EXISTS FOR (n:{label}) ON EACH [{fields}] "
+                f"OPTIONS {{indexConfig: {{`fulltext.analyzer`: '{FULLTEXT_ANALYZER}'}}}}")
+        return statements
+
+    def ensure_schema(self) -> Dict[str, Any]:
+        """
+        创建缺失的索引并等待其上线
+
+        Returns:
+            执行统计信息
+        """
+        start = time.perf_counter()
+        statements = self.index_statements()
+
+        with self.driver.session() as session:
+            existing = {record["name"] for record in session.run("SHOW INDEXES YIELD name")}
+            for statement in statements:
+                try:
+                    session.run(statement).consume()
+                except Exception as e:
+                    # 例如同一属性已被唯一约束的后备索引覆盖
+                    logger.warning(f"创建索引失败，跳过: {statement} ({e})")
+            current = {record["name"] for record in session.run("SHOW INDEXES YIELD name")}
+            session.run("CALL db.awaitIndexes($timeout)", {"timeout": self.index_wait_timeout}).consume()
+
+        created = sorted(current - existing)
+        mismatched = self._check_fulltext_analyzers()
+
+        self.last_run = {
+            "indexes": len(statements),
+            "created": created,
+            "analyzer_mismatch": mismatched,
+            "elapsed": round(time.perf_counter() - start, 3),
+            "finished_at": time.time()
+        }
+        logger.info(f"图索引检查完成，新建 {len(created)} 个索引: {created}")
+        return self.last_run
+
+    def _check_fulltext_analyzers(self) -> List[str]:
+        """
+        检查已存在的全文索引是否使用CJK分析器
+        IF NOT EXISTS 不会修改旧索引，分析器不一致时需要手动删除后重建
+        """
+        mismatched = []
+        with self.driver.session() as session:
+            result = session.run("SHOW FULLTEXT INDEXES YIELD name, options")
+            for record in result:
+                if record["name"] not in FULLTEXT_INDEXES:
+                    continue
+                index_config = (record["options"] or {}).get("indexConfig", {})
+                analyzer = index_config.get("fulltext.analyzer")
+                if analyzer != FULLTEXT_ANALYZER:
+                    mismatched.append(record["name"])
+                    logger.warning(f"全文索引 {record['name']} 使用分析器 {analyzer}，"
+                                   f"中文检索效果较差，建议删除后重建为 {FULLTEXT_ANALYZER}")
+        return mismatched
+
+    def verify_query_plans(self, queries: Dict[str, str]) -> Dict[str, List[str]]:
+        """
+        用EXPLAIN检查查询计划，找出仍包含全节点扫描的查询
+
+        Args:
+            queries: 查询名 -> Cypher（参数不需要提供，EXPLAIN只生成计划）
+
+        Returns:
+            查询名 -> 命中的扫描算子列表（只包含有问题的查询）
+        """
+        problems = {}
+        with self.driver.session() as session:
+            for name, cypher in queries.items():
+                try:
+                    plan = session.run("EXPLAIN " + cypher).consume().plan
+                except Exception as e:
+                    logger.warning(f"查询计划检查失败 [{name}]: {e}")
+                    continue
+                scans = self._find_operators(plan or {}, SCAN_OPERATORS)
+                if scans:
+                    problems[name] = scans
+                    logger.warning(f"查询 [{name}] 的执行计划包含全节点扫描: {scans}")
+
+        self.last_run["plan_problems"] = problems
+        logger.info(f"查询计划检查完成: {len(queries)} 个查询, {len(problems)} 个存在全节点扫描")
+        return problems
+
+    def _find_operators(self, plan: Dict[str, Any], operators: Sequence[str]) -> List[str]:
+        """递归查找计划树中的指定算子（operatorType 形如 AllNodesScan@neo4j）"""
+        found = []
+        operator = plan.get("operatorType", "")
+        if any(operator.startswith(name) for name in operators):
+            found.append(operator)
+        for child in plan.get("children", []):
+            found.extend(self._find_operators(child, operators))
+        return found
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """获取最近一次检查的统计信息"""
+        return dict(self.last_run)
@@ -0,0 +1,345 @@
+"""
+图快照模块
+把菜谱图（Recipe/Ingredient/Category/CookingStep）以CSR邻接数组的形式加载到进程内，
+在本地执行有界的多跳遍历和子图提取，避免每次查询都向Neo4j下发变长路径匹配：
+- indptr/indices/edge_rel 三个数组构成无向CSR邻接表（每条关系在两端各出现一次）
+- 节点度数在加载时一次性读取，路径评分直接查表
+- 结果结构与Neo4j路径保持一致，GraphRAGRetrieval可以无缝切换和回退
+"""
+
+import heapq
+import logging
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .graph_statistics import degree_expression
+
+logger = logging.getLogger(__name__)
+
+
+class GraphSnapshot:
+    """菜谱图的只读CSR快照 - 构建完成后线程安全"""
+
+    LABELS = ("Recipe", "Ingredient", "Category", "CookingStep")
+
+    def __init__(self,
+                 node_ids: List[str],
+                 labels: List[List[str]],
+                 properties: List[Dict[str, Any]],
+                 degrees: Sequence[int],
+                 edges: List[tuple],
+                 max_paths: int = 20000):
+        """
+        由节点和关系列表构建快照
+
+        Args:
+            node_ids: 节点ID（nodeId属性）
+            labels: 每个节点的标签
+            properties: 每个节点的属性
+            degrees: 每个节点的度数（物化的 n.degree，与 COUNT { (n)--() } 一致）
+            edges: (起点下标, 终点下标, 关系类型, 关系属性) 列表
+            max_paths: 单次多跳遍历最多枚举的路径数，超出后提前结束
+        """
+        self.max_paths = max_paths
+        self.node_ids = node_ids
+        self.labels = labels
+        self.properties = properties
+        self.names = [props.get("name") for props in properties]
+        self.degrees = np.asarray(degrees, dtype=np.int32)
+
+        num_nodes = len(node_ids)
+        num_rels = len(edges)
+
+        self.rel_types: List[str] = []
+        type_index: Dict[str, int] = {}
+        rel_type_ids = np.empty(num_rels, dtype=np.int16)
+        starts = np.empty(num_rels, dtype=np.int32)
+        ends = np.empty(num_rels, dtype=np.int32)
+        self.rel_properties: List[Dict[str, Any]] = []
+        for rel_id, (start, end, rel_type, rel_props) in enumerate(edges):
+            if rel_type not in type_index:
+                type_index[rel_type] = len(self.rel_types)
+                self.rel_types.append(rel_type)
+            rel_type_ids[rel_id] = type_index[rel_type]
+            starts[rel_id] = start
+            ends[rel_id] = end
+            self.rel_properties.append(rel_props or {})
+        self.rel_type_ids = rel_type_ids
+
+        # 无向CSR：按源节点排序的(邻居, 关系ID)
+        src = np.concatenate([starts, ends])
+        dst = np.concatenate([ends, starts])
+        rel = np.concatenate([np.arange(num_rels, dtype=np.int32)] * 2)
+        order = np.argsort(src, kind="stable")
+        self.indices = dst[order].astype(np.int32)
+        self.edge_rel = rel[order].astype(np.int32)
+        self.indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=num_nodes), out=self.indptr[1:])
+
+        # 遍历在Python中逐步进行，预先转换为列表避免逐元素访问numpy标量的开销
+        self._indptr = self.indptr.tolist()
+        self._indices = self.indices.tolist()
+        self._edge_rel = self.edge_rel.tolist()
+        self._rel_type_ids = self.rel_type_ids.tolist()
+        self._degrees = self.degrees.tolist()
+
+        self.loaded_at = time.time()
+        self.load_seconds = 0.0
+
+    @classmethod
+    def load(cls, driver, max_paths: int = 20000) -> "GraphSnapshot":
+        """
+        从Neo4j加载快照
+
+        Args:
+            driver: Neo4j驱动
+            max_paths: 单次多跳遍历最多枚举的路径数
+        """
+        start = time.perf_counter()
+        label_filter = " OR ".join(f"n:{label}" for label in cls.LABELS)
+
+        node_ids, labels, properties, degrees = [], [], [], []
+        index: Dict[str, int] = {}
+        edges = []
+
+        with driver.session() as session:
+            result = session.run(f"""
+                MATCH (n)
+                WHERE ({label_filter}) AND n.nodeId IS NOT NULL
+                RETURN n.nodeId AS node_id, labels(n) AS labels, properties(n) AS props,
+                       {degree_expression("n")} AS degree
+                ORDER BY n.nodeId
+                """)
+            for record in result:
+                node_id = record["node_id"]
+                if node_id in index:
+                    continue
+                index[node_id] = len(node_ids)
+                node_ids.append(node_id)
+                labels.append(list(record["labels"]))
+                properties.append(dict(record["props"]))
+                degrees.append(record["degree"])
+
+            result = session.run(f"""
+                MATCH (n)-[r]->(m)
+                WHERE ({label_filter}) AND ({label_filter.replace("n:", "m:")})
+                  AND n.nodeId IS NOT NULL AND m.nodeId IS NOT NULL
+                RETURN n.nodeId AS source, m.nodeId AS target, type(r) AS type, properties(r) AS props
+                """)
+            for record in result:
+                source = index.get(record["source"])
+                target = index.get(record["target"])
+                if source is not None and target is not None:
+                    edges.append((source, target, record["type"], dict(record["props"])))
+
+        snapshot = cls(node_ids, labels, properties, degrees, edges, max_paths=max_paths)
+        snapshot.load_seconds = time.perf_counter() - start
+        logger.info(f"图快照加载完成: {len(node_ids)} 个节点, {len(edges)} 条关系, "
+                    f"耗时 {snapshot.load_seconds:.2f}s")
+        return snapshot
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def num_relationships(self) -> int:
+        return len(self.rel_properties)
+
+    def find_nodes(self, entity: str) -> List[int]:
+        """与 `n.name CONTAINS entity OR n.nodeId = entity` 等价的节点查找"""
+        return [
+            i for i, name in enumerate(self.names)
+            if (isinstance(name, str) and entity in name) or self.node_ids[i] == entity
+        ]
+
+    def _node_dict(self, i: int) -> Dict[str, Any]:
+        return {
+            "id": self.node_ids[i],
+            "name": self.names[i] if self.names[i] is not None else "",
+            "labels": self.labels[i],
+            "properties": self.properties[i]
+        }
+
+    def _matches_target(self, i: int, target_keywords: List[str]) -> bool:
+        props = self.properties[i]
+        for field in ("name", "category"):
+            value = props.get(field)
+            if value is None:
+                continue
+            value = str(value)
+            if any(kw in value or value in kw for kw in target_keywords):
+                return True
+        return False
+
+    def multi_hop_paths(self,
+                        source_entities: List[str],
+                        target_keywords: Optional[List[str]],
+                        relation_types: Optional[List[str]],
+                        max_depth: int,
+                        limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        本地多跳遍历，评分与Neo4j版本一致：
+        1/路径长度 + 路径节点平均度数/10 + (含指定关系类型时 0.3)
+        与 `(source)-[*1..max_depth]-(target)` 一样，同一条关系在一条路径中不重复出现
+
+        Returns:
+            按相关性降序的路径字典（nodes, relationships, path_length, relevance）
+        """
+        wanted_types = {self.rel_types.index(t) for t in (relation_types or []) if t in self.rel_types}
+        target_cache: Dict[int, bool] = {}
+        heap: List[tuple] = []
+        counter = 0
+        enumerated = 0
+        truncated = False
+
+        indptr, indices, edge_rel = self._indptr, self._indices, self._edge_rel
+        rel_type_ids, degrees = self._rel_type_ids, self._degrees
+
+        for entity in source_entities:
+            for source in self.find_nodes(entity):
+                # 栈元素：(路径节点, 路径关系, 度数之和, 是否含指定关系类型)
+                stack = [([source], [], degrees[source], False)]
+                while stack:
+                    nodes, rels, degree_sum, has_type = stack.pop()
+                    current = nodes[-1]
+                    for pos in range(indptr[current], indptr[current + 1]):
+                        rel_id = edge_rel[pos]
+                        if rel_id in rels:
+                            continue
+                        neighbor = indices[pos]
+                        new_nodes = nodes + [neighbor]
+                        new_rels = rels + [rel_id]
+                        new_degree_sum = degree_sum + degrees[neighbor]
+                        new_has_type = has_type or rel_type_ids[rel_id] in wanted_types
+
+                        enumerated += 1
+                        if enumerated > self.max_paths:
+                            truncated = True
+                            break
+
+                        if neighbor != source:
+                            if target_keywords:
+                                matched = target_cache.get(neighbor)
+                                if matched is None:
+                                    matched = target_cache[neighbor] = self._matches_target(neighbor, target_keywords)
+                            else:
+                                matched = True
+                            if matched:
+                                relevance = (1.0 / len(new_rels)
+                                             + new_degree_sum / 10.0 / len(new_nodes)
+                                             + (0.3 if new_has_type else 0.0))
+                                counter += 1
+                                item = (relevance, counter, new_nodes, new_rels)
+                                if len(heap) < limit:
+                                    heapq.heappush(heap, item)
+                                elif relevance > heap[0][0]:
+                                    heapq.heapreplace(heap, item)
+
+                        if len(new_rels) < max_depth:
+                            stack.append((new_nodes, new_rels, new_degree_sum, new_has_type))
+                    if truncated:
+                        break
+                if truncated:
+                    break
+            if truncated:
+                break
+
+        if truncated:
+            logger.warning(f"本地多跳遍历达到路径枚举上限 {self.max_paths}，结果为近似Top-{limit}")
+
+        paths = []
+        for relevance, _, nodes, rels in sorted(heap, key=lambda item: (-item[0], item[1])):
+            paths.append({
+                "nodes": [self._node_dict(i) for i in nodes],
+                "relationships": [
+                    {"type": self.rel_types[rel_type_ids[r]], "properties": self.rel_properties[r]}
+                    for r in rels
+                ],
+                "path_length": len(rels),
+                "relevance": relevance
+            })
+        return paths
+
+    def extract_subgraph(self,
+                         source_entities: List[str],
+                         max_depth: int,
+                         max_nodes: int) -> Optional[Dict[str, Any]]:
+        """
+        本地子图提取：取第一个 max_depth 跳内邻居数不超过 max_nodes 的源实体，
+        返回其邻居节点、子图内的关系和图指标
+
+        Returns:
+            子图字典（central_nodes, connected_nodes, relationships, graph_metrics），没有满足条件的源实体时返回None
+        """
+        indptr, indices, edge_rel = self._indptr, self._indices, self._edge_rel
+
+        for entity in source_entities:
+            for source in self.find_nodes(entity):
+                # 有界BFS：邻居超过上限即放弃该源实体
+                distance = {source: 0}
+                frontier = [source]
+                overflow = False
+                for depth in range(1, max_depth + 1):
+                    next_frontier = []
+                    for node in frontier:
+                        for pos in range(indptr[node], indptr[node + 1]):
+                            neighbor = indices[pos]
+                            if neighbor not in distance:
+                                distance[neighbor] = depth
+                                next_frontier.append(neighbor)
+                    if len(distance) - 1 > max_nodes:
+                        overflow = True
+                        break
+                    frontier = next_frontier
+                if overflow:
+                    continue
+
+                neighbors = [node for node in distance if node != source]
+
+                # 子图内的关系：至少有一端距离源实体不足 max_depth 跳
+                rel_ids = []
+                seen = set()
+                for node, depth in distance.items():
+                    if depth >= max_depth:
+                        continue
+                    for pos in range(indptr[node], indptr[node + 1]):
+                        rel_id = edge_rel[pos]
+                        if rel_id not in seen:
+                            seen.add(rel_id)
+                            rel_ids.append(rel_id)
+
+                node_count = len(neighbors)
+                rel_count = len(rel_ids)
+                density = rel_count / (node_count * (node_count - 1) / 2) if node_count > 1 else 0.0
+
+                return {
+                    "central_nodes": [self.properties[source]],
+                    "connected_nodes": [self.properties[node] for node in neighbors[:max_nodes]],
+                    "relationships": [
+                        {"type": self.rel_types[self._rel_type_ids[r]], **self.rel_properties[r]}
+                        for r in rel_ids[:max_nodes]
+                    ],
+                    "graph_metrics": {
+                        "node_count": node_count,
+                        "relationship_count": rel_count,
+                        "density": density
+                    }
+                }
+
+        return None
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """获取快照统计信息"""
+        array_bytes = sum(a.nbytes for a in (self.indptr, self.indices, self.edge_rel,
+                                             self.rel_type_ids, self.degrees))
+        return {
+            "nodes": self.num_nodes,
+            "relationships": self.num_relationships,
+            "relationship_types": len(self.rel_types),
+            "csr_bytes": int(array_bytes),
+            "load_seconds": round(self.load_seconds, 3),
+            "loaded_at": self.loaded_at
+        }
@@ -6,13 +6,18 @@
 
 import json
 import logging
-from typing import List, Dict, Tuple, Any
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import List, Dict, Tuple, Any, Callable, Optional
 from dataclasses import dataclass
 
 from langchain_core.documents import Document
 from langchain_community.retrievers import BM25Retriever
-from neo4j import GraphDatabase
+from .entity_linker import EntityLinker
 from .graph_indexing import GraphIndexingModule
+from .graph_schema import GRAPH_LABELS
+from .memory_cache import LRUCache
+from .request_context import submit_in_context
 
 logger = logging.getLogger(__name__)
 
@@ -37,28 +42,64 @@ class HybridRetrievalModule:
     5. Round-robin轮询合并策略
     """
     
-    def __init__(self, config, milvus_module, data_module, llm_client):
+    # 邻居扩展涉及的节点标签，按标签匹配才能命中 nodeId 索引
+    NEIGHBOR_LABELS = GRAPH_LABELS
+    
+    # 检索线程池：分支 / 双层检索的实体级与主题级 / 投机向量检索
+    EXECUTOR_NAMES = ("branch", "level", "speculative")
+    
+    @classmethod
+    def create_executors(cls, config) -> Dict[str, ThreadPoolExecutor]:
+        """
+        创建检索线程池
+        双层检索分支内部还会再并发实体级/主题级检索，投机向量检索的结果由混合检索分支等待，
+        各层分别使用独立线程池（也与API共享线程池分开），避免在同一个有界线程池内嵌套等待导致死锁
+        
+        Returns:
+            线程池名称 -> 线程池
+        """
+        return {
+            name: ThreadPoolExecutor(max_workers=config.retrieval_branch_workers,
+                                     thread_name_prefix=f"hybrid_{name}")
+            for name in cls.EXECUTOR_NAMES
+        }
+    
+    def __init__(self, config, milvus_module, data_module, llm_client, driver_registry=None,
+                 executors: Optional[Dict[str, ThreadPoolExecutor]] = None):
         self.config = config
         self.milvus_module = milvus_module
         self.data_module = data_module
         self.llm_client = llm_client
-        self.driver = None
+        # 共享的Neo4j驱动（Neo4jDriverRegistry），默认复用数据准备模块的驱动
+        self.driver = driver_registry or data_module.driver
         self.bm25_retriever = None
         
         # 图索引模块
         self.graph_indexing = GraphIndexingModule(config, llm_client)
         self.graph_indexed = False
         
+        # 本地实体链接：图索引构建完成后基于其键重建，匹配不到时才调用LLM提取关键词
+        self.entity_linker = None
+        if getattr(config, "enable_entity_linker", True):
+            self.entity_linker = EntityLinker(
+                EntityLinker.load_synonym_groups(getattr(config, "entity_synonyms_path", None))
+            )
+        
+        # 邻居名称缓存：(node_id, max_neighbors) -> 邻居名称列表，知识库重建时随模块一起重建
+        self.neighbor_cache = LRUCache(maxsize=config.neighbor_cache_size, ttl=config.neighbor_cache_ttl)
+        
+        # 检索线程池（create_executors）：由系统传入时跨知识库重新加载共用，模块重建不会遗留线程；
+        # 未传入时模块自行创建，并在 close 时关闭
+        self._owns_executors = executors is None
+        executors = executors or self.create_executors(config)
+        self.branch_executor = executors["branch"]
+        self.level_executor = executors["level"]
+        self.speculative_executor = executors["speculative"]
+        
     def initialize(self, chunks: List[Document]):
         """初始化检索系统"""
         logger.info("初始化混合检索模块...")
         
-        # 连接Neo4j
-        self.driver = GraphDatabase.driver(
-            self.config.neo4j_uri, 
-            auth=(self.config.neo4j_user, self.config.neo4j_password)
-        )
-        
         # 初始化BM25检索器
         if chunks:
             self.bm25_retriever = BM25Retriever.from_documents(chunks)
@@ -94,6 +135,9 @@ class HybridRetrievalModule:
             stats = self.graph_indexing.get_statistics()
             logger.info(f"图索引构建完成: {stats}")
             
+            if self.entity_linker:
+                self.entity_linker.build(self.graph_indexing, recipes)
+            
         except Exception as e:
             logger.error(f"构建图索引失败: {e}")
             
@@ -102,31 +146,94 @@ class HybridRetrievalModule:
         relationships = []
         
         try:
-            with self.driver.session() as session:
-                query = """
-                MATCH (source)-[r]->(target)
-                WHERE source.nodeId >= '200000000' OR target.nodeId >= '200000000'
-                RETURN source.nodeId as source_id, type(r) as relation_type, target.nodeId as target_id
-                LIMIT 1000
-                """
-                result = session.run(query)
+            result = self.driver.run_read(self._build_relationships_cypher())
                 
-                for record in result:
-                    relationships.append((
-                        record["source_id"],
-                        record["relation_type"],
-                        record["target_id"]
-                    ))
+            for record in result:
+                relationships.append((
+                    record["source_id"],
+                    record["relation_type"],
+                    record["target_id"]
+                ))
                     
         except Exception as e:
             logger.error(f"提取图关系失败: {e}")
             
         return relationships
             
+    @classmethod
+    def _build_relationships_cypher(cls) -> str:
+        """
+        构建关系提取Cypher
+        原来的 `MATCH (source)-[r]->(target) WHERE source.nodeId >= ... OR target.nodeId >= ...`
+        会扫描所有节点，这里按标签和端点拆成UNION分支，使 nodeId 范围条件命中标签上的索引
+        """
+        branches = []
+        for label in cls.NEIGHBOR_LABELS:
+            for pattern, anchor in (("(source:{label})-[r]->(target)", "source"),
+                                    ("(source)-[r]->(target:{label})", "target")):
+                branches.append(f"""
+                    MATCH {pattern.format(label=label)}
+                    WHERE {anchor}.nodeId >= '200000000'
+                    RETURN source.nodeId as source_id, type(r) as relation_type, target.nodeId as target_id""")
+        union = "\n                    UNION".join(branches)
+        return f"""
+                CALL {{{union}
+                }}
+                RETURN source_id, relation_type, target_id
+                LIMIT 1000
+                """
+
+    @classmethod
+    def _build_neighbors_cypher(cls) -> str:
+        """构建批量邻居查询Cypher：每个标签一个分支，使 (n:Label {nodeId}) 走标签上的 nodeId 索引"""
+        match_branches = "\n                    UNION\n".join(
+            f"""                    WITH node_id
+                    MATCH (n:{label} {{nodeId: node_id}})
+                    RETURN n"""
+            for label in cls.NEIGHBOR_LABELS
+        )
+        return f"""
+                UNWIND $node_ids AS node_id
+                CALL {{
+{match_branches}
+                }}
+                CALL {{
+                    WITH n
+                    MATCH (n)--(neighbor)
+                    WHERE neighbor.name IS NOT NULL
+                    RETURN neighbor.name AS name
+                    LIMIT $limit
+                }}
+                RETURN n.nodeId AS node_id, collect(name) AS names
+                """
+            
     def extract_query_keywords(self, query: str) -> Tuple[List[str], List[str]]:
         """
         提取查询关键词：实体级 + 主题级
         """
+        entity_keywords, topic_keywords, _ = self._extract_query_keywords_with_source(query)
+        return entity_keywords, topic_keywords
+    
+    def _extract_query_keywords_with_source(self, query: str) -> Tuple[List[str], List[str], str]:
+        """
+        提取查询关键词，优先使用本地实体链接，匹配不到任何关键词时再调用LLM
+        
+        Returns:
+            (实体级关键词, 主题级关键词, 来源: "linker" 或 "llm")
+        """
+        if self.entity_linker:
+            entity_keywords, topic_keywords = self.entity_linker.extract(query)
+            if entity_keywords or topic_keywords:
+                logger.info(f"本地实体链接命中 - 实体级: {entity_keywords}, 主题级: {topic_keywords}")
+                return entity_keywords, topic_keywords, "linker"
+        
+        entity_keywords, topic_keywords = self._llm_extract_query_keywords(query)
+        return entity_keywords, topic_keywords, "llm"
+    
+    def _llm_extract_query_keywords(self, query: str) -> Tuple[List[str], List[str]]:
+        """
+        使用LLM提取查询关键词（本地实体链接未命中时的回退）
+        """
         prompt = f"""
         作为烹饪知识助手，请分析以下查询并提取关键词，分为两个层次：
 
@@ -190,32 +297,39 @@ class HybridRetrievalModule:
         results = []
         
         # 1. 使用图索引进行实体检索
-        for keyword in entity_keywords:
-            # 检索匹配的实体
-            entities = self.graph_indexing.get_entities_by_key(keyword)
+        matches = [
+            (keyword, entity)
+            for keyword in entity_keywords
+            for entity in self.graph_indexing.get_entities_by_key(keyword)
+        ]
+        
+        # 一次批量查询所有匹配实体的邻居
+        neighbor_map = self._get_neighbors_batch(
+            [entity.metadata["node_id"] for _, entity in matches], max_neighbors=2
+        )
+        
+        for keyword, entity in matches:
+            # 获取邻居信息
+            neighbors = neighbor_map.get(entity.metadata["node_id"], [])
             
-            for entity in entities:
-                # 获取邻居信息
-                neighbors = self._get_node_neighbors(entity.metadata["node_id"], max_neighbors=2)
-                
-                # 构建增强内容
-                enhanced_content = entity.value_content
-                if neighbors:
-                    enhanced_content += f"\n相关信息: {', '.join(neighbors)}"
-                
-                results.append(RetrievalResult(
-                    content=enhanced_content,
-                    node_id=entity.metadata["node_id"],
-                    node_type=entity.entity_type,
-                    relevance_score=0.9,  # 精确匹配得分较高
-                    retrieval_level="entity",
-                    metadata={
-                        "entity_name": entity.entity_name,
-                        "entity_type": entity.entity_type,
-                        "index_keys": entity.index_keys,
-                        "matched_keyword": keyword
-                    }
-                ))
+            # 构建增强内容
+            enhanced_content = entity.value_content
+            if neighbors:
+                enhanced_content += f"\n相关信息: {', '.join(neighbors)}"
+            
+            results.append(RetrievalResult(
+                content=enhanced_content,
+                node_id=entity.metadata["node_id"],
+                node_type=entity.entity_type,
+                relevance_score=0.9,  # 精确匹配得分较高
+                retrieval_level="entity",
+                metadata={
+                    "entity_name": entity.entity_name,
+                    "entity_type": entity.entity_type,
+                    "index_keys": entity.index_keys,
+                    "matched_keyword": keyword
+                }
+            ))
         
         # 2. 如果图索引结果不足，使用Neo4j进行补充检索
         if len(results) < top_k:
@@ -233,46 +347,45 @@ class HybridRetrievalModule:
         results = []
         
         try:
-            with self.driver.session() as session:
-                cypher_query = """
-                UNWIND $keywords as keyword
-                CALL db.index.fulltext.queryNodes('recipe_fulltext_index', keyword + '*') 
-                YIELD node, score
-                WHERE node:Recipe
-                RETURN 
-                    node.nodeId as node_id,
-                    node.name as name,
-                    node.description as description,
-                    labels(node) as labels,
-                    score
-                ORDER BY score DESC
-                LIMIT $limit
-                """
+            cypher_query = """
+            UNWIND $keywords as keyword
+            CALL db.index.fulltext.queryNodes('recipe_fulltext_index', keyword + '*') 
+            YIELD node, score
+            WHERE node:Recipe
+            RETURN 
+                node.nodeId as node_id,
+                node.name as name,
+                node.description as description,
+                labels(node) as labels,
+                score
+            ORDER BY score DESC
+            LIMIT $limit
+            """
                 
-                result = session.run(cypher_query, {
-                    "keywords": keywords,
-                    "limit": limit
-                })
+            result = self.driver.run_read(cypher_query, {
+                "keywords": keywords,
+                "limit": limit
+            })
                 
-                for record in result:
-                    content_parts = []
-                    if record["name"]:
-                        content_parts.append(f"菜品: {record['name']}")
-                    if record["description"]:
-                        content_parts.append(f"描述: {record['description']}")
+            for record in result:
+                content_parts = []
+                if record["name"]:
+                    content_parts.append(f"菜品: {record['name']}")
+                if record["description"]:
+                    content_parts.append(f"描述: {record['description']}")
                     
-                    results.append(RetrievalResult(
-                        content='\n'.join(content_parts),
-                        node_id=record["node_id"],
-                        node_type="Recipe",
-                        relevance_score=float(record["score"]) * 0.7,  # 补充检索得分较低
-                        retrieval_level="entity",
-                        metadata={
-                            "name": record["name"],
-                            "labels": record["labels"],
-                            "source": "neo4j_fallback"
-                        }
-                    ))
+                results.append(RetrievalResult(
+                    content='\n'.join(content_parts),
+                    node_id=record["node_id"],
+                    node_type="Recipe",
+                    relevance_score=float(record["score"]) * 0.7,  # 补充检索得分较低
+                    retrieval_level="entity",
+                    metadata={
+                        "name": record["name"],
+                        "labels": record["labels"],
+                        "source": "neo4j_fallback"
+                    }
+                ))
                     
         except Exception as e:
             logger.error(f"Neo4j补充检索失败: {e}")
@@ -367,81 +480,169 @@ class HybridRetrievalModule:
         results = []
         
         try:
-            with self.driver.session() as session:
-                cypher_query = """
-                UNWIND $keywords as keyword
-                MATCH (r:Recipe)
-                WHERE r.category CONTAINS keyword 
-                   OR r.cuisineType CONTAINS keyword
-                   OR r.tags CONTAINS keyword
-                WITH r, keyword
-                OPTIONAL MATCH (r)-[:REQUIRES]->(i:Ingredient)
-                WITH r, keyword, collect(i.name)[0..3] as ingredients
-                RETURN 
-                    r.nodeId as node_id,
-                    r.name as name,
-                    r.category as category,
-                    r.cuisineType as cuisine_type,
-                    r.difficulty as difficulty,
-                    ingredients,
-                    keyword as matched_keyword
-                ORDER BY r.difficulty ASC, r.name
-                LIMIT $limit
-                """
+            cypher_query = """
+            UNWIND $keywords as keyword
+            MATCH (r:Recipe)
+            WHERE r.category CONTAINS keyword 
+               OR r.cuisineType CONTAINS keyword
+               OR r.tags CONTAINS keyword
+            WITH r, keyword
+            OPTIONAL MATCH (r)-[:REQUIRES]->(i:Ingredient)
+            WITH r, keyword, collect(i.name)[0..3] as ingredients
+            RETURN 
+                r.nodeId as node_id,
+                r.name as name,
+                r.category as category,
+                r.cuisineType as cuisine_type,
+                r.difficulty as difficulty,
+                ingredients,
+                keyword as matched_keyword
+            ORDER BY r.difficulty ASC, r.name
+            LIMIT $limit
+            """
                 
-                result = session.run(cypher_query, {
-                    "keywords": keywords,
-                    "limit": limit
-                })
+            result = self.driver.run_read(cypher_query, {
+                "keywords": keywords,
+                "limit": limit
+            })
                 
-                for record in result:
-                    content_parts = []
-                    content_parts.append(f"菜品: {record['name']}")
+            for record in result:
+                content_parts = []
+                content_parts.append(f"菜品: {record['name']}")
                     
-                    if record["category"]:
-                        content_parts.append(f"分类: {record['category']}")
-                    if record["cuisine_type"]:
-                        content_parts.append(f"菜系: {record['cuisine_type']}")
-                    if record["difficulty"]:
-                        content_parts.append(f"难度: {record['difficulty']}")
+                if record["category"]:
+                    content_parts.append(f"分类: {record['category']}")
+                if record["cuisine_type"]:
+                    content_parts.append(f"菜系: {record['cuisine_type']}")
+                if record["difficulty"]:
+                    content_parts.append(f"难度: {record['difficulty']}")
                     
-                    if record["ingredients"]:
-                        ingredients_str = ', '.join(record["ingredients"][:3])
-                        content_parts.append(f"主要食材: {ingredients_str}")
+                if record["ingredients"]:
+                    ingredients_str = ', '.join(record["ingredients"][:3])
+                    content_parts.append(f"主要食材: {ingredients_str}")
                     
-                    results.append(RetrievalResult(
-                        content='\n'.join(content_parts),
-                        node_id=record["node_id"],
-                        node_type="Recipe",
-                        relevance_score=0.75,  # 补充检索得分
-                        retrieval_level="topic",
-                        metadata={
-                            "name": record["name"],
-                            "category": record["category"],
-                            "cuisine_type": record["cuisine_type"],
-                            "difficulty": record["difficulty"],
-                            "matched_keyword": record["matched_keyword"],
-                            "source": "neo4j_fallback"
-                        }
-                    ))
+                results.append(RetrievalResult(
+                    content='\n'.join(content_parts),
+                    node_id=record["node_id"],
+                    node_type="Recipe",
+                    relevance_score=0.75,  # 补充检索得分
+                    retrieval_level="topic",
+                    metadata={
+                        "name": record["name"],
+                        "category": record["category"],
+                        "cuisine_type": record["cuisine_type"],
+                        "difficulty": record["difficulty"],
+                        "matched_keyword": record["matched_keyword"],
+                        "source": "neo4j_fallback"
+                    }
+                ))
                     
         except Exception as e:
             logger.error(f"Neo4j主题级检索失败: {e}")
             
         return results
         
+    def _run_branches(self, branches: Dict[str, Callable[[], Any]],
+                      executor: ThreadPoolExecutor,
+                      timeout: Optional[float] = None) -> Tuple[Dict[str, Any], Dict[str, float], List[str]]:
+        """
+        并发执行相互独立的检索分支
+        
+        Args:
+            branches: 分支名称 -> 无参调用
+            executor: 执行分支的线程池
+            timeout: 每个分支的超时秒数，默认使用配置的 retrieval_branch_timeout。
+                     从分支开始执行时计时，在线程池中排队的时间不计入；排队超过该时间仍未开始的分支同样放弃
+            
+        Returns:
+            (分支名称 -> 结果, 分支名称 -> 耗时毫秒, 超时或失败的分支名称)
+            超时或失败的分支结果为None，调用方使用其余分支的部分结果
+        """
+        if timeout is None:
+            timeout = self.config.retrieval_branch_timeout
+        
+        started: Dict[str, float] = {}
+        
+        def timed(name, func):
+            started[name] = time.perf_counter()
+            result = func()
+            return result, (time.perf_counter() - started[name]) * 1000
+        
+        submitted = time.perf_counter()
+        # 分支在请求上下文的副本中执行，分支内的LLM调用（关键词提取）计入当前请求
+        futures = {name: submit_in_context(executor, timed, name, func) for name, func in branches.items()}
+        
+        # 等待到所有未完成分支都超过各自的截止时间（开始执行时间，未开始时为提交时间，加上超时）
+        pending = set(futures.values())
+        while pending:
+            deadline = max(started.get(name, submitted) + timeout
+                           for name, future in futures.items() if future in pending)
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            _, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        
+        results, timings, failed = {}, {}, []
+        for name, future in futures.items():
+            elapsed = (time.perf_counter() - started.get(name, submitted)) * 1000
+            if not future.done():
+                # 线程无法强制中止，超时分支在后台跑完后结果被丢弃；尚未开始的分支直接取消
+                future.cancel()
+                state = "超时" if name in started else "排队超时"
+                logger.warning(f"检索分支 {name} {state}（{timeout}s），使用其余分支的部分结果")
+                results[name] = None
+                timings[name] = elapsed
+                failed.append(name)
+                continue
+            try:
+                results[name], timings[name] = future.result()
+            except Exception as e:
+                logger.error(f"检索分支 {name} 失败: {e}")
+                results[name] = None
+                timings[name] = elapsed
+                failed.append(name)
+        
+        return results, timings, failed
+        
     def dual_level_retrieval(self, query: str, top_k: int = 5) -> List[Document]:
         """
         双层检索：结合实体级和主题级检索
         """
-        logger.info(f"开始双层检索: {query}")
+        documents, _, _, _ = self._dual_level_retrieval_timed(query, top_k)
+        return documents
+    
+    def _dual_level_retrieval_timed(self, query: str, top_k: int = 5,
+                                    keywords: Optional[Tuple[List[str], List[str]]] = None
+                                    ) -> Tuple[List[Document], Dict[str, float], List[str], str]:
+        """
+        双层检索，并返回各阶段耗时
+        关键词提取完成后，实体级与主题级检索并发执行
         
-        # 1. 提取关键词
-        entity_keywords, topic_keywords = self.extract_query_keywords(query)
+        Args:
+            keywords: 统一查询规划给出的（实体级, 主题级）关键词，提供时跳过关键词提取
         
-        # 2. 执行双层检索
-        entity_results = self.entity_level_retrieval(entity_keywords, top_k)
-        topic_results = self.topic_level_retrieval(topic_keywords, top_k)
+        Returns:
+            (文档列表, 阶段名称 -> 耗时毫秒, 超时或失败的分支名称, 关键词来源)
+        """
+        logger.info(f"开始双层检索: {query}")
+        
+        # 1. 提取关键词（本地实体链接优先）
+        start = time.perf_counter()
+        if keywords is not None:
+            entity_keywords, topic_keywords = keywords
+            keyword_source = "plan"
+        else:
+            entity_keywords, topic_keywords, keyword_source = self._extract_query_keywords_with_source(query)
+        timings = {"keyword_extraction": (time.perf_counter() - start) * 1000}
+        
+        # 2. 并发执行双层检索
+        results, branch_timings, failed = self._run_branches({
+            "entity": lambda: self.entity_level_retrieval(entity_keywords, top_k),
+            "topic": lambda: self.topic_level_retrieval(topic_keywords, top_k)
+        }, self.level_executor)
+        timings.update(branch_timings)
+        entity_results = results["entity"] or []
+        topic_results = results["topic"] or []
         
         # 3. 结果合并和排序
         all_results = entity_results + topic_results
@@ -470,13 +671,14 @@ class HybridRetrievalModule:
                     "relevance_score": result.relevance_score,
                     "recipe_name": recipe_name,  # 确保有recipe_name字段
                     "search_type": "dual_level",  # 设置搜索类型
+                    "keyword_source": keyword_source,
                     **result.metadata
                 }
             )
             documents.append(doc)
             
         logger.info(f"双层检索完成，返回 {len(documents)} 个文档")
-        return documents
+        return documents, timings, failed, keyword_source
     
     def vector_search_enhanced(self, query: str, top_k: int = 5) -> List[Document]:
         """
@@ -486,6 +688,12 @@ class HybridRetrievalModule:
             # 使用Milvus进行向量检索
             vector_docs = self.milvus_module.similarity_search(query, k=top_k*2)
             
+            # 只有前top_k个结果会被返回，只为它们批量获取邻居信息
+            vector_docs = vector_docs[:top_k]
+            neighbor_map = self._get_neighbors_batch(
+                [result.get("metadata", {}).get("node_id") for result in vector_docs]
+            )
+            
             # 用图信息增强结果并转换为Document对象
             enhanced_docs = []
             for result in vector_docs:
@@ -496,7 +704,7 @@ class HybridRetrievalModule:
                 
                 if node_id:
                     # 从图中获取邻居信息
-                    neighbors = self._get_node_neighbors(node_id)
+                    neighbors = neighbor_map.get(node_id, [])
                     if neighbors:
                         # 将邻居信息添加到内容中
                         neighbor_info = f"\n相关信息: {', '.join(neighbors[:3])}"
@@ -529,31 +737,99 @@ class HybridRetrievalModule:
     
     def _get_node_neighbors(self, node_id: str, max_neighbors: int = 3) -> List[str]:
         """获取节点的邻居信息"""
+        return self._get_neighbors_batch([node_id], max_neighbors).get(node_id, [])
+    
+    def _get_neighbors_batch(self, node_ids: List[str], max_neighbors: int = 3) -> Dict[str, List[str]]:
+        """
+        批量获取节点的邻居名称
+        先查进程内缓存，未命中的节点用一次按标签匹配的UNWIND查询获取
+        
+        Args:
+            node_ids: 节点ID列表（可包含重复和空值）
+            max_neighbors: 每个节点最多返回的邻居数量
+            
+        Returns:
+            节点ID -> 邻居名称列表
+        """
+        neighbor_map = {}
+        missing = []
+        for node_id in dict.fromkeys(n for n in node_ids if n):
+            cached = self.neighbor_cache.get((node_id, max_neighbors))
+            if cached is None:
+                missing.append(node_id)
+            else:
+                neighbor_map[node_id] = cached
+        
+        if not missing:
+            return neighbor_map
+        
+        query = self._build_neighbors_cypher()
+        
         try:
-            with self.driver.session() as session:
-                query = """
-                MATCH (n {nodeId: $node_id})-[r]-(neighbor)
-                RETURN neighbor.name as name
-                LIMIT $limit
-                """
-                result = session.run(query, {"node_id": node_id, "limit": max_neighbors})
-                return [record["name"] for record in result if record["name"]]
+            fetched = {node_id: [] for node_id in missing}
+            result = self.driver.run_read(query, {"node_ids": missing, "limit": max_neighbors})
+            for record in result:
+                fetched[record["node_id"]] = record["names"][:max_neighbors]
+            
+            for node_id, names in fetched.items():
+                self.neighbor_cache.put((node_id, max_neighbors), names)
+            neighbor_map.update(fetched)
+            
         except Exception as e:
-            logger.error(f"获取邻居节点失败: {e}")
-            return []
+            logger.error(f"批量获取邻居节点失败: {e}")
+        
+        return neighbor_map
+    
+    def get_entity_linker_stats(self) -> Dict[str, Any]:
+        """获取本地实体链接统计信息"""
+        return self.entity_linker.get_stats() if self.entity_linker else {}
+    
+    def get_neighbor_cache_stats(self) -> Dict[str, Any]:
+        """获取邻居缓存统计信息"""
+        return self.neighbor_cache.get_stats()
     
-    def hybrid_search(self, query: str, top_k: int = 5) -> List[Document]:
+    def submit_vector_search(self, query: str, top_k: int = 5) -> Future:
+        """
+        提交一次投机性的增强向量检索，供路由决策期间提前执行
+        
+        Returns:
+            结果为文档列表的Future，可传给 hybrid_search 的 vector_future
+        """
+        return self.speculative_executor.submit(self.vector_search_enhanced, query, top_k)
+    
+    def hybrid_search(self, query: str, top_k: int = 5,
+                      keywords: Optional[Tuple[List[str], List[str]]] = None,
+                      vector_future: Optional[Future] = None) -> List[Document]:
         """
         混合检索：使用Round-robin轮询合并策略
         公平轮询合并不同检索结果，不使用权重配置
+        
+        Args:
+            keywords: 统一查询规划给出的（实体级, 主题级）关键词，提供时跳过关键词提取
+            vector_future: 已提前提交的增强向量检索（submit_vector_search），提供时直接等待其结果
         """
         logger.info(f"开始混合检索: {query}")
         
-        # 1. 双层检索（实体+主题检索）
-        dual_docs = self.dual_level_retrieval(query, top_k)
-        
-        # 2. 增强向量检索
-        vector_docs = self.vector_search_enhanced(query, top_k)
+        if vector_future is not None:
+            # 投机检索可能使用了更大的top_k，同一查询的向量结果按得分排序，取前缀即可
+            vector_branch = lambda: vector_future.result()[:top_k]
+        else:
+            vector_branch = lambda: self.vector_search_enhanced(query, top_k)
+        
+        # 1-2. 双层检索（依赖关键词LLM调用）与增强向量检索相互独立，并发执行
+        results, branch_timings, failed = self._run_branches({
+            "dual_level": lambda: self._dual_level_retrieval_timed(query, top_k, keywords),
+            "vector": vector_branch
+        }, self.branch_executor)
+        
+        dual_docs = []
+        keyword_source = None
+        if results["dual_level"] is not None:
+            dual_docs, dual_timings, dual_failed, keyword_source = results["dual_level"]
+            branch_timings.update(dual_timings)
+            failed.extend(dual_failed)
+        vector_docs = results["vector"] or []
+        branch_timings = {name: round(ms, 1) for name, ms in branch_timings.items()}
         
         # 3. Round-robin轮询合并
         merged_docs = []
@@ -591,13 +867,23 @@ class HybridRetrievalModule:
         
         # 取前top_k个结果
         final_docs = merged_docs[:top_k]
+        for doc in final_docs:
+            doc.metadata["branch_timings"] = branch_timings
+            if keyword_source:
+                doc.metadata["keyword_source"] = keyword_source
+                doc.metadata["keyword_extraction_ms"] = branch_timings.get("keyword_extraction")
+            if failed:
+                doc.metadata["partial_branches"] = failed
         
         logger.info(f"Round-robin合并：从总共{origin_len}个结果合并为{len(final_docs)}个文档")
-        logger.info(f"混合检索完成，返回 {len(final_docs)} 个文档")
+        logger.info(f"混合检索完成，返回 {len(final_docs)} 个文档，分支耗时(ms): {branch_timings}")
         return final_docs
         
     def close(self):
         """关闭资源连接"""
-        if self.driver:
-            self.driver.close()
-            logger.info("Neo4j连接已关闭") 
\ No newline at end of file
+        # 系统传入的线程池由系统关闭
+        if self._owns_executors:
+            self.branch_executor.shutdown(wait=False)
+            self.level_executor.shutdown(wait=False)
+            self.speculative_executor.shutdown(wait=False)
+        # Neo4j驱动由系统共享，不在这里关闭 
\ No newline at end of file
@@ -7,6 +7,9 @@
 
 import json
 import logging
+import threading
+import time
+from concurrent.futures import Future
 from typing import List, Dict, Tuple, Any, Optional
 from dataclasses import dataclass
 from enum import Enum
@@ -31,6 +34,15 @@ class QueryAnalysis:
     recommended_strategy: SearchStrategy
     confidence: float  # 推荐置信度
     reasoning: str  # 推荐理由
+    source: str = "llm"  # 决策来源：local（本地路由）/ plan（统一查询规划）/ llm / rule
+    plan: Optional[Any] = None  # 统一查询规划结果（QueryPlan），检索器直接复用其中的图查询和关键词
+
+@dataclass
+class SpeculativeRetrieval:
+    """路由决策期间提前执行的向量检索"""
+    future: Future
+    started: float
+    finished: Optional[float] = None
 
 class IntelligentQueryRouter:
     """
@@ -47,11 +59,17 @@ class IntelligentQueryRouter:
                  traditional_retrieval,  # 传统混合检索模块
                  graph_rag_retrieval,    # 图RAG检索模块
                  llm_client,
-                 config):
+                 config,
+                 local_router=None,      # 本地向量路由器，置信度足够时跳过LLM分析
+                 executor=None,          # 执行抽样对照LLM分析的线程池
+                 planner=None):          # 统一查询规划器，一次LLM调用给出策略、图查询和关键词
         self.traditional_retrieval = traditional_retrieval
         self.graph_rag_retrieval = graph_rag_retrieval
         self.llm_client = llm_client
         self.config = config
+        self.local_router = local_router
+        self.executor = executor
+        self.planner = planner
         
         # 路由统计
         self.route_stats = {
@@ -61,12 +79,89 @@ class IntelligentQueryRouter:
             "total_queries": 0
         }
         
+        # 投机检索统计
+        self.speculation_stats = {
+            "launched": 0,
+            "hits": 0,
+            "misses": 0,
+            "cancelled": 0,
+            "saved_ms": 0.0,
+            "wasted_ms": 0.0
+        }
+        self._speculation_lock = threading.Lock()
+        
     def analyze_query(self, query: str) -> QueryAnalysis:
         """
         深度分析查询特征，决定最佳检索策略
+        本地路由器置信度足够时直接采用其决策，否则调用LLM分析
         """
         logger.info(f"分析查询特征: {query}")
         
+        prediction = None
+        if self.local_router:
+            try:
+                prediction = self.local_router.predict(query)
+            except Exception as e:
+                logger.warning(f"本地路由预测失败，使用LLM分析: {e}")
+            
+            if self.local_router.is_confident(prediction):
+                self.local_router.record_local_decision()
+                shadow_rate = getattr(self.config, "local_router_shadow_rate", 0.0)
+                if self.executor and self.local_router.should_shadow(shadow_rate):
+                    self.executor.submit(self._shadow_llm_analysis, query, prediction)
+                return self._local_analysis(query, prediction)
+        
+        start = time.perf_counter()
+        if self.planner:
+            plan = self.planner.plan(query)
+            analysis = plan.to_query_analysis() if plan else None
+        else:
+            analysis = self._llm_analyze_query(query)
+        if analysis is None:
+            # 降级方案：基于规则的简单分析
+            return self._rule_based_analysis(query)
+        
+        if self.local_router:
+            self.local_router.record_llm_decision(
+                query, analysis.recommended_strategy.value,
+                llm_ms=(time.perf_counter() - start) * 1000,
+                prediction=prediction
+            )
+        return analysis
+    
+    def _local_analysis(self, query: str, prediction) -> QueryAnalysis:
+        """由本地路由预测构造查询分析，复杂度等特征沿用规则估计"""
+        features = self._rule_based_analysis(query)
+        strategy = SearchStrategy(prediction.strategy)
+        logger.info(f"本地路由决策: {strategy.value} (置信度: {prediction.confidence:.2f}, "
+                    f"耗时: {prediction.elapsed_ms:.1f}ms)")
+        return QueryAnalysis(
+            query_complexity=features.query_complexity,
+            relationship_intensity=features.relationship_intensity,
+            reasoning_required=features.reasoning_required,
+            entity_count=features.entity_count,
+            recommended_strategy=strategy,
+            confidence=prediction.confidence,
+            reasoning=f"本地路由：与已标注问题最相似（相似度 {prediction.similarity:.2f}），倾向{strategy.value}",
+            source="local"
+        )
+    
+    def _shadow_llm_analysis(self, query: str, prediction):
+        """抽样对照：对已采用本地决策的问题再做一次LLM分析，只用于统计一致率和积累训练样本"""
+        start = time.perf_counter()
+        analysis = self._llm_analyze_query(query)
+        if analysis is not None:
+            self.local_router.record_llm_decision(
+                query, analysis.recommended_strategy.value,
+                llm_ms=(time.perf_counter() - start) * 1000,
+                prediction=prediction,
+                fallback=False
+            )
+    
+    def _llm_analyze_query(self, query: str) -> Optional[QueryAnalysis]:
+        """
+        使用LLM分析查询特征，失败时返回None
+        """
         # 使用LLM进行智能分析
         analysis_prompt = f"""
         作为RAG系统的查询分析专家，请深度分析以下查询的特征：
@@ -137,9 +232,7 @@ class IntelligentQueryRouter:
             
         except Exception as e:
             logger.error(f"查询分析失败: {e}")
-
-            # 降级方案：基于规则的简单分析
-            return self._rule_based_analysis(query)
+            return None
     
     def _rule_based_analysis(self, query: str) -> QueryAnalysis:
         """基于规则的降级分析"""
@@ -162,36 +255,56 @@ class IntelligentQueryRouter:
             entity_count=len(query.split()),
             recommended_strategy=strategy,
             confidence=0.6,
-            reasoning="基于规则的简单分析"
+            reasoning="基于规则的简单分析",
+            source="rule"
         )
     
-    def route_query(self, query: str, top_k: int = 5) -> Tuple[List[Document], QueryAnalysis]:
+    def route_query(self, query: str, top_k: int = 5,
+                    analysis: Optional[QueryAnalysis] = None) -> Tuple[List[Document], QueryAnalysis]:
         """
         智能路由查询到最适合的检索引擎
+        
+        Args:
+            analysis: 本次请求已得到的查询分析（如解释路由时已分析过），提供时不再重复分析
         """
         logger.info(f"开始智能路由: {query}")
         
-        # 1. 分析查询特征
-        analysis = self.analyze_query(query)
+        # 1. 分析查询特征；传统检索是最常见的路由结果，向量检索与路由分析同时开始
+        speculation = None
+        if analysis is None:
+            speculation = self._start_speculation(query, top_k)
+            analysis = self.analyze_query(query)
+        routed_at = time.perf_counter()
         
         # 2. 更新统计
         self._update_route_stats(analysis.recommended_strategy)
         
-        # 3. 根据策略执行检索
+        # 3. 根据策略执行检索（有统一规划时直接复用其中的关键词和图查询，不再单独调用LLM）
         documents = []
+        plan = analysis.plan
+        keywords = plan.keywords() if plan else None
+        graph_query = plan.to_graph_query() if plan else None
+        
+        # 仅图RAG检索时投机结果用不上，丢弃
+        vector_future = self._resolve_speculation(
+            speculation, routed_at,
+            used=analysis.recommended_strategy != SearchStrategy.GRAPH_RAG
+        )
         
         try:
             if analysis.recommended_strategy == SearchStrategy.HYBRID_TRADITIONAL:
                 logger.info("使用传统混合检索")
-                documents = self.traditional_retrieval.hybrid_search(query, top_k)
+                documents = self.traditional_retrieval.hybrid_search(
+                    query, top_k, keywords=keywords, vector_future=vector_future)
                 
             elif analysis.recommended_strategy == SearchStrategy.GRAPH_RAG:
                 logger.info("🕸️ 使用图RAG检索")
-                documents = self.graph_rag_retrieval.graph_rag_search(query, top_k)
+                documents = self.graph_rag_retrieval.graph_rag_search(query, top_k, graph_query=graph_query)
                 
             elif analysis.recommended_strategy == SearchStrategy.COMBINED:
                 logger.info("🔄 使用组合检索策略")
-                documents = self._combined_search(query, top_k)
+                documents = self._combined_search(query, top_k, keywords=keywords, graph_query=graph_query,
+                                                  vector_future=vector_future)
             
             # 4. 结果后处理
             documents = self._post_process_results(documents, analysis)
@@ -202,20 +315,90 @@ class IntelligentQueryRouter:
         except Exception as e:
             logger.error(f"查询路由失败: {e}")
             # 降级到传统检索
-            documents = self.traditional_retrieval.hybrid_search(query, top_k)
+            documents = self.traditional_retrieval.hybrid_search(query, top_k, keywords=keywords)
             return documents, analysis
     
-    def _combined_search(self, query: str, top_k: int) -> List[Document]:
+    def _start_speculation(self, query: str, top_k: int) -> Optional[SpeculativeRetrieval]:
+        """提交投机向量检索，未启用时返回None"""
+        if not getattr(self.config, "enable_speculative_retrieval", False):
+            return None
+        try:
+            speculation = SpeculativeRetrieval(
+                future=self.traditional_retrieval.submit_vector_search(query, top_k),
+                started=time.perf_counter()
+            )
+        except Exception as e:
+            logger.warning(f"提交投机检索失败: {e}")
+            return None
+        
+        def mark_finished(_):
+            speculation.finished = time.perf_counter()
+        speculation.future.add_done_callback(mark_finished)
+        
+        with self._speculation_lock:
+            self.speculation_stats["launched"] += 1
+        return speculation
+    
+    def _resolve_speculation(self, speculation: Optional[SpeculativeRetrieval], routed_at: float,
+                             used: bool) -> Optional[Future]:
+        """
+        路由决策完成后处理投机检索
+        
+        Args:
+            speculation: 投机检索，可能为None
+            routed_at: 路由决策完成的时间
+            used: 路由结果是否需要传统检索
+            
+        Returns:
+            命中时返回向量检索Future，否则None
+        """
+        if speculation is None:
+            return None
+        
+        # 与路由决策重叠执行的时长即节省的延迟
+        overlap_ms = (min(speculation.finished or routed_at, routed_at) - speculation.started) * 1000
+        
+        with self._speculation_lock:
+            if used:
+                self.speculation_stats["hits"] += 1
+                self.speculation_stats["saved_ms"] += overlap_ms
+                return speculation.future
+            
+            self.speculation_stats["misses"] += 1
+            if speculation.future.cancel():
+                # 尚未开始执行，取消后不占用检索资源
+                self.speculation_stats["cancelled"] += 1
+            else:
+                self.speculation_stats["wasted_ms"] += overlap_ms
+        return None
+    
+    def get_speculation_statistics(self) -> Dict[str, Any]:
+        """获取投机检索统计：命中率和节省的延迟"""
+        with self._speculation_lock:
+            stats = dict(self.speculation_stats)
+        resolved = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / resolved if resolved else 0.0
+        stats["avg_saved_ms"] = stats["saved_ms"] / stats["hits"] if stats["hits"] else 0.0
+        return stats
+    
+    def _combined_search(self, query: str, top_k: int, keywords=None, graph_query=None,
+                         vector_future: Optional[Future] = None) -> List[Document]:
         """
         组合搜索策略：结合传统检索和图RAG的优势
+        
+        Args:
+            keywords: 统一规划给出的（实体级, 主题级）关键词
+            graph_query: 统一规划给出的图查询结构
+            vector_future: 投机执行的向量检索
         """
         # 分配结果数量
         traditional_k = max(1, top_k // 2)
         graph_k = top_k - traditional_k
         
         # 执行两种检索
-        traditional_docs = self.traditional_retrieval.hybrid_search(query, traditional_k)
-        graph_docs = self.graph_rag_retrieval.graph_rag_search(query, graph_k)
+        traditional_docs = self.traditional_retrieval.hybrid_search(query, traditional_k, keywords=keywords,
+                                                                    vector_future=vector_future)
+        graph_docs = self.graph_rag_retrieval.graph_rag_search(query, graph_k, graph_query=graph_query)
         
         # 合并和去重
         combined_docs = []
@@ -253,7 +436,8 @@ class IntelligentQueryRouter:
             doc.metadata.update({
                 "route_strategy": analysis.recommended_strategy.value,
                 "query_complexity": analysis.query_complexity,
-                "route_confidence": analysis.confidence
+                "route_confidence": analysis.confidence,
+                "route_source": analysis.source
             })
         
         return documents
@@ -282,9 +466,15 @@ class IntelligentQueryRouter:
             "combined_ratio": self.route_stats["combined_count"] / total
         }
     
-    def explain_routing_decision(self, query: str) -> str:
-        """解释路由决策过程"""
-        analysis = self.analyze_query(query)
+    def explain_routing_decision(self, query: str, analysis: Optional[QueryAnalysis] = None) -> str:
+        """
+        解释路由决策过程
+        
+        Args:
+            analysis: 已有的查询分析，提供时直接解释，不再调用LLM；随后应传给 route_query 复用
+        """
+        if analysis is None:
+            analysis = self.analyze_query(query)
         
         explanation = f"""
         查询路由分析报告
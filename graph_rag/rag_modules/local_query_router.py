@@ -0,0 +1,322 @@
+"""
+本地查询路由模块
+用已加载的BGE模型向量化问题，与各检索策略的标注原型问题做kNN分类：
+- 置信度达到阈值时直接给出路由决策，不再调用LLM
+- 置信度不足时由LLM决策，决策日志作为新样本定期重训；日志只保留最近 max_samples 条
+- 统计本地路由延迟以及与LLM路由的一致率
+"""
+
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 各策略的原型问题（键为 SearchStrategy 的取值）
+DEFAULT_PROTOTYPES: Dict[str, List[str]] = {
+    "hybrid_traditional": [
+        "红烧肉怎么做",
+        "西红柿炒鸡蛋的做法",
+        "宫保鸡丁需要哪些食材",
+        "糖醋排骨要炖多久",
+        "麻婆豆腐的制作步骤",
+        "鱼香肉丝怎么做才好吃",
+        "可乐鸡翅的做法步骤",
+        "蛋炒饭需要放什么调料",
+        "清蒸鲈鱼要蒸几分钟",
+        "酸辣土豆丝怎么切",
+    ],
+    "graph_rag": [
+        "鸡肉适合搭配什么蔬菜",
+        "哪些菜同时用到土豆和牛肉",
+        "用花椒的菜有哪些共同特点",
+        "为什么川菜常用豆瓣酱",
+        "和红烧肉用料相似的菜还有哪些",
+        "西兰花可以和哪些食材一起做",
+        "豆腐在不同菜系里都怎么做",
+        "辣椒都出现在哪些菜系的哪些菜里",
+        "哪些素菜和麻婆豆腐用的调料相同",
+        "猪肉最常和哪些配料搭配",
+    ],
+    "combined": [
+        "推荐几道用鸡胸肉的减肥菜并说明做法",
+        "川菜有什么特色，推荐几道代表菜",
+        "冬天适合吃什么菜，怎么做",
+        "比较红烧肉和东坡肉的做法和用料",
+        "家里只有鸡蛋和西红柿能做哪些菜，步骤是什么",
+        "适合老人吃的清淡菜有哪些，怎么做",
+        "年夜饭有哪些搭配建议和做法",
+        "素食者补充蛋白质可以做哪些菜，做法是什么",
+    ],
+}
+
+
+@dataclass
+class LocalRoutePrediction:
+    """本地路由预测结果"""
+    strategy: str
+    confidence: float  # 近邻中获胜策略的相似度加权票数占比；与所有样本都不相似时为0
+    similarity: float  # 最近邻的余弦相似度
+    elapsed_ms: float
+    vector: Optional[np.ndarray] = None
+
+
+class LocalQueryRouter:
+    """
+    基于向量kNN的本地查询路由器 - 线程安全
+    训练样本 = 原型问题 + 最近的LLM决策日志
+    """
+
+    def __init__(self,
+                 embed_fn: Callable[[str], List[float]],
+                 embed_batch_fn: Optional[Callable[[List[str]], List[List[float]]]] = None,
+                 threshold: float = 0.7,
+                 k: int = 5,
+                 min_similarity: float = 0.5,
+                 log_path: Optional[str] = None,
+                 max_samples: int = 2000,
+                 retrain_interval: int = 50,
+                 prototypes: Optional[Dict[str, List[str]]] = None):
+        """
+        初始化本地查询路由器
+
+        Args:
+            embed_fn: 问题向量化函数（复用已加载的BGE模型）
+            embed_batch_fn: 批量向量化函数，训练时原型问题和历史日志一次性向量化；None时逐条调用 embed_fn
+            threshold: 采用本地决策所需的最小置信度
+            k: 近邻数量
+            min_similarity: 最近邻相似度低于该值时视为未知问题，置信度记为0
+            log_path: LLM决策日志文件（JSONL），None表示只保存在内存中
+            max_samples: 参与训练的日志样本上限（保留最新的），日志文件也按此上限截断
+            retrain_interval: 每新增多少条LLM决策重训一次
+            prototypes: 原型问题，默认使用内置原型
+        """
+        self.embed_fn = embed_fn
+        self.embed_batch_fn = embed_batch_fn
+        self.threshold = threshold
+        self.k = k
+        self.min_similarity = min_similarity
+        self.log_path = log_path
+        self.retrain_interval = retrain_interval
+        self.prototypes = prototypes or DEFAULT_PROTOTYPES
+        if log_path and os.path.dirname(log_path):
+            os.makedirs(os.path.dirname(log_path), exist_ok=True)
+
+        self._prototype_vectors: Optional[np.ndarray] = None
+        self._prototype_labels: List[str] = []
+        # (问题, 策略, 向量, 记录时间)
+        self._samples: "deque[Tuple[str, str, np.ndarray, float]]" = deque(maxlen=max_samples)
+        self._log_lines = 0  # 日志文件当前行数，超过 max_samples 时在重训时截断
+        self._matrix: Optional[np.ndarray] = None
+        self._labels: np.ndarray = np.array([])
+        self._pending = 0
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.predictions = 0
+        self.predict_ms = 0.0
+        self.local_decisions = 0
+        self.llm_fallbacks = 0
+        self.llm_ms = 0.0
+        self.compared = 0
+        self.agreed = 0
+        self.retrains = 0
+        self.last_retrain: Optional[float] = None
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.asarray(self.embed_fn(text.strip()), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _embed_many(self, texts: List[str]) -> np.ndarray:
+        """批量向量化并归一化，返回 (文本数, 维度) 矩阵"""
+        texts = [text.strip() for text in texts]
+        if self.embed_batch_fn is not None:
+            vectors = np.asarray(self.embed_batch_fn(texts), dtype=np.float32)
+        else:
+            vectors = np.vstack([np.asarray(self.embed_fn(text), dtype=np.float32) for text in texts])
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1.0)
+
+    @property
+    def ready(self) -> bool:
+        return self._matrix is not None
+
+    def fit(self):
+        """向量化原型问题并加载历史LLM决策日志，然后训练"""
+        questions, labels = [], []
+        for strategy, strategy_questions in self.prototypes.items():
+            for question in strategy_questions:
+                questions.append(question)
+                labels.append(strategy)
+        self._prototype_vectors = self._embed_many(questions)
+        self._prototype_labels = labels
+
+        loaded = self._load_log()
+        self.retrain()
+        logger.info(f"本地查询路由器就绪: {len(labels)} 个原型问题, {loaded} 条历史LLM决策")
+
+    def _load_log(self) -> int:
+        """读取LLM决策日志中最近的样本（一次批量向量化），日志超出上限时截断"""
+        if not self.log_path or not os.path.exists(self.log_path):
+            return 0
+        records = deque(maxlen=self._samples.maxlen)
+        lines = 0
+        try:
+            with open(self.log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        records.append(json.loads(line))
+                        lines += 1
+        except Exception as e:
+            logger.warning(f"读取路由决策日志失败: {e}")
+        if records:
+            vectors = self._embed_many([record["query"] for record in records])
+            for record, vector in zip(records, vectors):
+                self._samples.append((record["query"], record["strategy"], vector, record.get("time", 0.0)))
+
+        with self._lock:
+            self._log_lines = lines
+            if lines > len(records):
+                self._compact_log_locked()
+        return len(records)
+
+    def _compact_log_locked(self):
+        """用内存中保留的样本重写日志，丢弃超出上限的旧记录（调用方持有锁）"""
+        tmp_path = self.log_path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for query, strategy, _, logged_at in self._samples:
+                    f.write(json.dumps({"query": query, "strategy": strategy, "time": logged_at},
+                                       ensure_ascii=False) + "\n")
+            os.replace(tmp_path, self.log_path)
+            logger.info(f"路由决策日志已截断: {self._log_lines} → {len(self._samples)} 条")
+            self._log_lines = len(self._samples)
+        except Exception as e:
+            logger.warning(f"截断路由决策日志失败: {e}")
+
+    def retrain(self):
+        """用原型问题和日志样本重建kNN索引"""
+        if self._prototype_vectors is None:
+            return
+        with self._lock:
+            samples = list(self._samples)
+            self._pending = 0
+            if self.log_path and self._log_lines > self._samples.maxlen:
+                self._compact_log_locked()
+        vectors = [self._prototype_vectors] + [vector[None, :] for _, _, vector, _ in samples]
+        labels = self._prototype_labels + [strategy for _, strategy, _, _ in samples]
+
+        matrix = np.vstack(vectors)
+        with self._lock:
+            self._matrix = matrix
+            self._labels = np.asarray(labels)
+            self.retrains += 1
+            self.last_retrain = time.time()
+        logger.info(f"本地查询路由器已重训: {len(labels)} 个样本")
+
+    def predict(self, query: str) -> Optional[LocalRoutePrediction]:
+        """预测检索策略，未训练时返回None"""
+        with self._lock:
+            matrix, labels = self._matrix, self._labels
+        if matrix is None:
+            return None
+
+        start = time.perf_counter()
+        vector = self._embed(query)
+        similarities = matrix @ vector
+        k = min(self.k, len(similarities))
+        nearest = np.argpartition(-similarities, k - 1)[:k]
+
+        votes: Dict[str, float] = {}
+        for i in nearest:
+            label = str(labels[i])
+            votes[label] = votes.get(label, 0.0) + max(float(similarities[i]), 0.0)
+        strategy = max(votes, key=votes.get)
+        total = sum(votes.values())
+        top_similarity = float(similarities[nearest].max())
+        confidence = votes[strategy] / total if total > 0 and top_similarity >= self.min_similarity else 0.0
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.predictions += 1
+            self.predict_ms += elapsed_ms
+        return LocalRoutePrediction(strategy=strategy, confidence=confidence, similarity=top_similarity,
+                                    elapsed_ms=elapsed_ms, vector=vector)
+
+    def is_confident(self, prediction: Optional[LocalRoutePrediction]) -> bool:
+        return prediction is not None and prediction.confidence >= self.threshold
+
+    def record_local_decision(self):
+        """记录一次采用本地决策的路由"""
+        with self._lock:
+            self.local_decisions += 1
+
+    def record_llm_decision(self, query: str, strategy: str, llm_ms: float,
+                            prediction: Optional[LocalRoutePrediction] = None, fallback: bool = True):
+        """
+        记录一次LLM路由决策：作为训练样本写入日志，并统计与本地预测的一致率
+
+        Args:
+            query: 问题
+            strategy: LLM选择的策略
+            llm_ms: LLM分析耗时
+            prediction: 同一问题的本地预测
+            fallback: 是否因本地置信度不足而调用LLM（False表示抽样对照）
+        """
+        vector = prediction.vector if prediction is not None and prediction.vector is not None else self._embed(query)
+        with self._lock:
+            if fallback:
+                self.llm_fallbacks += 1
+                self.llm_ms += llm_ms
+            if prediction is not None:
+                self.compared += 1
+                self.agreed += int(prediction.strategy == strategy)
+            logged_at = time.time()
+            self._samples.append((query, strategy, vector, logged_at))
+            self._pending += 1
+            should_retrain = self._pending >= self.retrain_interval
+            if self.log_path:
+                try:
+                    with open(self.log_path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps({"query": query, "strategy": strategy, "time": logged_at},
+                                           ensure_ascii=False) + "\n")
+                    self._log_lines += 1
+                except Exception as e:
+                    logger.warning(f"写入路由决策日志失败: {e}")
+
+        if should_retrain:
+            self.retrain()
+
+    def should_shadow(self, rate: float) -> bool:
+        """按比例抽样本地决策，交给LLM做对照以评估一致率"""
+        return rate > 0 and random.random() < rate
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取路由统计信息"""
+        with self._lock:
+            total = self.local_decisions + self.llm_fallbacks
+            return {
+                "ready": self._matrix is not None,
+                "samples": len(self._labels),
+                "logged_samples": len(self._samples),
+                "threshold": self.threshold,
+                "local_decisions": self.local_decisions,
+                "llm_fallbacks": self.llm_fallbacks,
+                "local_ratio": self.local_decisions / total if total else 0.0,
+                "avg_local_ms": self.predict_ms / self.predictions if self.predictions else 0.0,
+                "avg_llm_ms": self.llm_ms / self.llm_fallbacks if self.llm_fallbacks else 0.0,
+                "compared": self.compared,
+                "agreement_rate": self.agreed / self.compared if self.compared else None,
+                "retrains": self.retrains,
+                "last_retrain": self.last_retrain
+            }
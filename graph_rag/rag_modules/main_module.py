@@ -7,8 +7,10 @@
 import os
 import sys
 import time
+import asyncio
 import logging
-from typing import List, Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Dict, Any, Callable, FrozenSet
 
 # 设置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -24,6 +26,14 @@ from rag_modules.generation_integration import GenerationIntegrationModule
 from rag_modules.hybrid_retrieval import HybridRetrievalModule
 from rag_modules.graph_rag_retrieval import GraphRAGRetrieval
 from rag_modules.intelligent_query_router import IntelligentQueryRouter
+from rag_modules.local_query_router import LocalQueryRouter
+from rag_modules.query_planner import QueryPlanner
+from rag_modules.answer_cache import SemanticAnswerCache
+from rag_modules.graph_statistics import GraphStatisticsModule
+from rag_modules.graph_schema import GraphSchemaModule
+from rag_modules.request_context import bind_context, current_request, request_scope
+from rag_modules.neo4j_driver_registry import Neo4jDriverRegistry
+from rag_modules.build_jobs import BuildJobManager, BuildProgress
 
 # 加载环境变量
 load_dotenv()
@@ -35,6 +45,8 @@ class AdvancedGraphRAGSystem:
     修改：移除自动构建知识库，改为手动控制
     """
 
+    NO_DOCUMENTS_ANSWER = "抱歉，没有找到相关的烹饪信息。请尝试其他问题。"
+
     def __init__(self, config: Optional[GraphRAGConfig] = None):
         self.config = config or DEFAULT_CONFIG
 
@@ -48,6 +60,37 @@ class AdvancedGraphRAGSystem:
         self.graph_rag_retrieval = None
         self.query_router = None
 
+        # 本地查询路由器（跨知识库重建保留，累积的LLM决策样本不丢失）
+        self.local_router = None
+
+        # 统一查询规划器
+        self.query_planner = None
+
+        # 语义答案缓存
+        self.answer_cache = None
+
+        # 图统计物化（度数/PageRank）
+        self.graph_statistics = None
+
+        # 图索引管理
+        self.graph_schema = None
+
+        # 共享的Neo4j驱动：所有图模块共用一个连接池
+        self.neo4j = Neo4jDriverRegistry.from_config(self.config)
+
+        # 共享的有界线程池：异步请求路径中的同步检索、向量化都在这里执行，
+        # 避免每个请求各自创建线程池
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.config.executor_max_workers,
+            thread_name_prefix="graph_rag"
+        )
+        # 混合检索的线程池同样由系统持有：知识库重新加载时新旧检索模块共用，不随模块重建遗留线程
+        self.retrieval_executors = HybridRetrievalModule.create_executors(self.config)
+
+        # 知识库构建任务：后台单线程依次执行，同一时刻最多一个构建
+        self.build_jobs = BuildJobManager(self.load_or_build_knowledge_base,
+                                          max_history=self.config.build_job_history)
+
         # 系统状态
         self.system_ready = False
         self.knowledge_base_loaded = False
@@ -63,9 +106,21 @@ class AdvancedGraphRAGSystem:
                 uri=self.config.neo4j_uri,
                 user=self.config.neo4j_user,
                 password=self.config.neo4j_password,
-                database=self.config.neo4j_database
+                database=self.config.neo4j_database,
+                driver_registry=self.neo4j
             )
 
+            # 创建检索Cypher依赖的索引（幂等），并检查关键查询是否退化为全节点扫描
+            if self.config.enable_graph_schema_bootstrap:
+                self._bootstrap_graph_schema()
+
+            # 图统计物化复用数据准备模块的连接
+            if self.config.enable_graph_statistics:
+                self.graph_statistics = GraphStatisticsModule(
+                    driver=self.neo4j,
+                    enable_pagerank=self.config.enable_pagerank
+                )
+
             # 2. 向量索引模块（但不自动构建）
             print("初始化Milvus向量索引模块...")
             self.index_module = MilvusIndexConstructionModule(
@@ -73,17 +128,55 @@ class AdvancedGraphRAGSystem:
                 port=self.config.milvus_port,
                 collection_name=self.config.milvus_collection_name,
                 dimension=self.config.milvus_dimension,
-                model_name=self.config.embedding_model
+                model_name=self.config.embedding_model,
+                embedding_cache_dir=self.config.embedding_cache_dir,
+                embedding_cache_capacity=self.config.embedding_cache_capacity,
+                embedding_cache_flush_every=self.config.embedding_cache_flush_every,
+                query_cache_size=self.config.query_embedding_cache_size,
+                query_cache_ttl=self.config.query_embedding_cache_ttl,
+                build_batch_size=self.config.build_batch_size,
+                build_queue_size=self.config.build_queue_size,
+                embedding_workers=self.config.embedding_workers,
+                embedding_threads_per_worker=self.config.embedding_threads_per_worker,
+                embedding_backend=self.config.embedding_backend,
+                onnx_model_dir=self.config.onnx_model_dir,
+                embedding_token_budget=self.config.embedding_token_budget,
+                embedding_max_batch_size=self.config.embedding_max_batch_size,
+                index_build_timeout=self.config.index_build_timeout,
+                index_poll_interval=self.config.index_poll_interval,
+                version_gc_grace_seconds=self.config.milvus_version_gc_grace_seconds,
+                scalar_indexes=self.config.milvus_scalar_indexes,
+                partition_key=self.config.milvus_partition_key,
+                num_partitions=self.config.milvus_num_partitions
             )
 
-            # 3. 生成模块
+            # 3. 语义答案缓存（复用已加载的嵌入模型）
+            if self.config.enable_answer_cache:
+                self.answer_cache = SemanticAnswerCache(
+                    embed_fn=self.index_module.embed_query,
+                    keyword_fn=self._answer_cache_keywords,
+                    threshold=self.config.answer_cache_threshold,
+                    capacity=self.config.answer_cache_size,
+                    ttl=self.config.answer_cache_ttl
+                )
+
+            # 本地查询路由器（复用已加载的嵌入模型）
+            if self.config.enable_local_router:
+                self._init_local_router()
+
+            # 4. 生成模块
             print("初始化生成模块...")
             self.generation_module = GenerationIntegrationModule(
                 model_name=self.config.llm_model,
                 temperature=self.config.temperature,
-                max_tokens=self.config.max_tokens
+                max_tokens=self.config.max_tokens,
+                base_url=self.config.llm_base_url
             )
 
+            # 统一查询规划：路由、图查询理解和关键词提取合并为一次LLM调用
+            if self.config.enable_query_planner:
+                self.query_planner = QueryPlanner(self.generation_module.client, self.config)
+
             print("✅ 高级图RAG系统模块初始化完成！")
             print("⚠️  注意：知识库需要手动构建")
 
@@ -91,19 +184,69 @@ class AdvancedGraphRAGSystem:
             logger.error(f"系统初始化失败: {e}")
             raise
 
-    def load_or_build_knowledge_base(self, force_rebuild: bool = False) -> Dict[str, Any]:
+    def load_or_build_knowledge_base(self, force_rebuild: bool = False, incremental: bool = False,
+                                     progress: Optional[BuildProgress] = None) -> Dict[str, Any]:
         """
         手动加载或构建知识库
         
         Args:
             force_rebuild: 是否强制重新构建（删除旧数据）
+            incremental: 是否增量同步（仅重新向量化内容发生变化的文档块）
+            progress: 分阶段构建进度，由构建任务管理器传入
             
         Returns:
             构建结果信息
         """
         print("\n检查知识库状态...")
+        progress = progress or BuildProgress()
 
         try:
+            # 增量同步：只处理内容哈希发生变化的文档块
+            if incremental and self.index_module.has_collection():
+                print("开始增量同步知识库...")
+                print("从Neo4j加载图数据...")
+                self._load_graph_data(progress)
+                print("构建菜谱文档...")
+                self.data_module.build_recipe_documents(batch_size=self.config.document_batch_size,
+                                                        progress=progress)
+                print("进行文档分块...")
+                chunks = self.data_module.chunk_documents(
+                    chunk_size=self.config.chunk_size,
+                    chunk_overlap=self.config.chunk_overlap,
+                    progress=progress
+                )
+
+                print("增量同步Milvus向量索引...")
+                sync_stats = self.index_module.sync_vector_index(chunks, progress=progress)
+                if sync_stats is None:
+                    raise Exception("增量同步向量索引失败")
+
+                progress.skip("index")
+
+                # 只重算变化菜谱及其邻居的度数；回退为全量构建时全量重算
+                self._refresh_graph_statistics(sync_stats.get("affected_node_ids"))
+
+                self._initialize_retrievers(chunks)
+
+                # 只失效引用了变更菜谱的缓存答案；回退为全量构建时全部失效
+                if self.answer_cache:
+                    if "affected_node_ids" in sync_stats:
+                        self.answer_cache.invalidate_nodes(sync_stats["affected_node_ids"])
+                    else:
+                        self.answer_cache.invalidate_all()
+
+                stats = self._get_knowledge_base_stats()
+                stats["sync"] = sync_stats
+                self.knowledge_base_loaded = True
+
+                print(f"✅ 增量同步完成: 更新 {sync_stats['upserted']} 个，删除 {sync_stats['deleted']} 个，"
+                      f"未变化 {sync_stats['unchanged']} 个")
+                return {
+                    "status": "synced",
+                    "message": "知识库增量同步完成",
+                    "stats": stats
+                }
+
             # 检查Milvus集合是否存在
             if self.index_module.has_collection() and not force_rebuild:
                 print("✅ 发现已存在的知识库，尝试加载...")
@@ -112,16 +255,26 @@ class AdvancedGraphRAGSystem:
                     
                     # 加载图数据以支持图索引
                     print("加载图数据以支持图检索...")
-                    self.data_module.load_graph_data()
+                    self._load_graph_data(progress)
                     print("构建菜谱文档...")
-                    self.data_module.build_recipe_documents()
+                    self.data_module.build_recipe_documents(batch_size=self.config.document_batch_size,
+                                                            progress=progress)
                     print("进行文档分块...")
                     chunks = self.data_module.chunk_documents(
                         chunk_size=self.config.chunk_size,
-                        chunk_overlap=self.config.chunk_overlap
+                        chunk_overlap=self.config.chunk_overlap,
+                        progress=progress
                     )
 
+                    for stage in ("embedding", "insert", "index"):
+                        progress.skip(stage)
+
+                    # 只补齐尚未物化的节点
+                    self._refresh_graph_statistics([])
+
                     self._initialize_retrievers(chunks)
+                    if self.answer_cache:
+                        self.answer_cache.invalidate_all()
                     
                     result = {
                         "status": "loaded",
@@ -138,29 +291,31 @@ class AdvancedGraphRAGSystem:
 
             # 从Neo4j加载图数据
             print("从Neo4j加载图数据...")
-            self.data_module.load_graph_data()
+            self._load_graph_data(progress)
 
-            # 构建菜谱文档
-            print("构建菜谱文档...")
-            self.data_module.build_recipe_documents()
-
-            # 进行文档分块
-            print("进行文档分块...")
-            chunks = self.data_module.chunk_documents(
+            # 流式构建：菜谱文档分批构建、分块后直接进入向量化和插入阶段
+            print("流式构建菜谱文档并构建Milvus向量索引...")
+            chunk_stream = self.data_module.iter_chunks(
                 chunk_size=self.config.chunk_size,
-                chunk_overlap=self.config.chunk_overlap
+                chunk_overlap=self.config.chunk_overlap,
+                batch_size=self.config.document_batch_size,
+                progress=progress
             )
-
-            # 构建Milvus向量索引
-            print("构建Milvus向量索引...")
-            if not self.index_module.build_vector_index(chunks):
+            if not self.index_module.build_vector_index(chunk_stream, progress=progress):
                 raise Exception("构建向量索引失败")
+            chunks = self.data_module.chunks
+
+            # 物化图统计属性
+            self._refresh_graph_statistics()
 
             # 初始化检索器
             self._initialize_retrievers(chunks)
+            if self.answer_cache:
+                self.answer_cache.invalidate_all()
 
             # 显示统计信息
             stats = self._get_knowledge_base_stats()
+            stats["build_pipeline"] = self.index_module.get_build_stats()
             self._show_knowledge_base_stats(stats)
 
             self.knowledge_base_loaded = True
@@ -176,9 +331,18 @@ class AdvancedGraphRAGSystem:
 
         except Exception as e:
             logger.error(f"知识库构建失败: {e}")
-            self.knowledge_base_loaded = False
+            # 新版本构建失败时别名仍指向旧版本，旧知识库继续提供检索
+            if not self.index_module.has_collection():
+                self.knowledge_base_loaded = False
             raise
 
+    def _load_graph_data(self, progress: BuildProgress):
+        """从Neo4j加载图数据，按加载的节点数报告 graph_load 阶段"""
+        progress.start("graph_load")
+        counts = self.data_module.load_graph_data()
+        progress.update("graph_load", sum(counts.values()))
+        progress.finish("graph_load")
+
     def unload_knowledge_base(self) -> Dict[str, Any]:
         """
         卸载知识库（从内存中移除）
@@ -189,6 +353,8 @@ class AdvancedGraphRAGSystem:
         try:
             if self.index_module:
                 self.index_module.close()
+            if self.answer_cache:
+                self.answer_cache.invalidate_all()
             
             # 重置相关模块
             self.traditional_retrieval = None
@@ -220,6 +386,156 @@ class AdvancedGraphRAGSystem:
             "stats": stats
         }
 
+    def get_performance_stats(self) -> Dict[str, Any]:
+        """
+        获取性能相关统计（缓存命中率等）
+        
+        Returns:
+            性能统计信息
+        """
+        stats = {}
+        
+        stats["neo4j_pool"] = self.neo4j.get_pool_stats()
+        
+        if self.index_module:
+            stats["query_embedding_cache"] = self.index_module.get_query_cache_stats()
+            stats["embedding_cache"] = self.index_module.get_embedding_cache_stats()
+            stats["embedding_batching"] = self.index_module.get_embedding_batching_stats()
+        
+        if self.answer_cache:
+            stats["answer_cache"] = self.answer_cache.get_stats()
+        
+        if self.traditional_retrieval:
+            stats["neighbor_cache"] = self.traditional_retrieval.get_neighbor_cache_stats()
+            stats["entity_linker"] = self.traditional_retrieval.get_entity_linker_stats()
+        
+        if self.local_router:
+            stats["local_router"] = self.local_router.get_stats()
+        
+        if self.query_planner:
+            stats["query_planner"] = self.query_planner.get_stats()
+        
+        if self.query_router:
+            stats["speculative_retrieval"] = self.query_router.get_speculation_statistics()
+        
+        if self.graph_statistics:
+            stats["graph_statistics"] = self.graph_statistics.get_statistics()
+        
+        if self.graph_schema:
+            stats["graph_schema"] = self.graph_schema.get_statistics()
+        
+        if self.graph_rag_retrieval and self.graph_rag_retrieval.snapshot:
+            stats["graph_snapshot"] = self.graph_rag_retrieval.get_snapshot_stats()
+        
+        return stats
+
+    def lookup_cached_answer(self, question: str):
+        """
+        查找语义相近问题的缓存答案
+        
+        Returns:
+            缓存条目，未启用缓存或未命中时返回None
+        """
+        if not self.answer_cache:
+            return None
+        try:
+            hit = self.answer_cache.lookup(question)
+        except Exception as e:
+            logger.warning(f"查询答案缓存失败: {e}")
+            return None
+        return hit[0] if hit else None
+
+    def _answer_cache_keywords(self, question: str) -> FrozenSet[str]:
+        """答案缓存命中校验用的关键词：本地实体链接提取的实体级和主题级关键词"""
+        linker = self.traditional_retrieval.entity_linker if self.traditional_retrieval else None
+        if not linker:
+            return frozenset()
+        entity_keywords, topic_keywords = linker.extract(question, record_stats=False)
+        return frozenset(entity_keywords) | frozenset(topic_keywords)
+
+    def answer_cache_snapshot(self) -> Optional[int]:
+        """请求开始时的答案缓存版本快照，未启用缓存时返回None"""
+        return self.answer_cache.snapshot() if self.answer_cache else None
+
+    def cache_answer(self, question: str, answer: str, documents: List, analysis=None, chunks: List[str] = None,
+                     snapshot: Optional[int] = None):
+        """
+        缓存生成成功的答案（出错的回答不缓存）
+        
+        Args:
+            question: 用户问题
+            answer: 完整答案
+            documents: 生成答案时使用的检索文档
+            analysis: 查询分析结果
+            chunks: 流式输出的分块
+            snapshot: 请求开始时的缓存版本快照，生成期间知识库已变化的答案不写入
+        """
+        if not self.answer_cache or not answer or answer.startswith("抱歉"):
+            return
+
+        # 任一文档缺少节点ID时来源未知，增量同步时一律失效
+        node_ids = [doc.metadata.get("node_id") for doc in documents]
+        if not all(node_ids):
+            node_ids = None
+
+        try:
+            self.answer_cache.store(question, answer, chunks=chunks, analysis=analysis, node_ids=node_ids,
+                                    snapshot=snapshot)
+        except Exception as e:
+            logger.warning(f"写入答案缓存失败: {e}")
+
+    def _init_local_router(self):
+        """创建并训练本地查询路由器，失败时所有路由决策回退到LLM"""
+        try:
+            print("训练本地查询路由器...")
+            router = LocalQueryRouter(
+                embed_fn=self.index_module.embed_query,
+                embed_batch_fn=self.index_module.embed_queries,
+                threshold=self.config.local_router_threshold,
+                k=self.config.local_router_k,
+                log_path=self.config.local_router_log_path,
+                retrain_interval=self.config.local_router_retrain_interval
+            )
+            router.fit()
+            self.local_router = router
+        except Exception as e:
+            logger.warning(f"本地查询路由器初始化失败，路由全部使用LLM分析: {e}")
+            self.local_router = None
+
+    def _bootstrap_graph_schema(self):
+        """创建缺失的Neo4j索引并用EXPLAIN检查检索查询计划，失败时只记录警告"""
+        self.graph_schema = GraphSchemaModule(
+            driver=self.neo4j,
+            index_wait_timeout=self.config.graph_index_wait_timeout
+        )
+        try:
+            print("检查Neo4j索引...")
+            self.graph_schema.ensure_schema()
+            depth = self.config.max_graph_depth
+            self.graph_schema.verify_query_plans({
+                "multi_hop": GraphRAGRetrieval._build_multi_hop_cypher(depth, True),
+                "subgraph": GraphRAGRetrieval._build_subgraph_cypher(depth, 50),
+                "neighbors": HybridRetrievalModule._build_neighbors_cypher(),
+                "relationships": HybridRetrievalModule._build_relationships_cypher(),
+            })
+        except Exception as e:
+            logger.warning(f"Neo4j索引初始化失败，检索查询可能退化为全节点扫描: {e}")
+
+    def _refresh_graph_statistics(self, changed_node_ids: Optional[List[str]] = None):
+        """
+        刷新物化的图统计属性，失败时路径评分回退为实时计数
+        
+        Args:
+            changed_node_ids: 内容变化的节点ID；None表示全量重算
+        """
+        if not self.graph_statistics:
+            return
+        try:
+            print("更新图统计属性...")
+            self.graph_statistics.refresh(changed_node_ids)
+        except Exception as e:
+            logger.warning(f"更新图统计属性失败: {e}")
+
     def _initialize_retrievers(self, chunks: List = None):
         """初始化检索器"""
         print("初始化检索引擎...")
@@ -233,14 +549,17 @@ class AdvancedGraphRAGSystem:
             config=self.config,
             milvus_module=self.index_module,
             data_module=self.data_module,
-            llm_client=self.generation_module.client
+            llm_client=self.generation_module.client,
+            driver_registry=self.neo4j,
+            executors=self.retrieval_executors
         )
         self.traditional_retrieval.initialize(chunks)
 
         # 初始化图RAG检索器
         self.graph_rag_retrieval = GraphRAGRetrieval(
             config=self.config,
-            llm_client=self.generation_module.client
+            llm_client=self.generation_module.client,
+            driver_registry=self.neo4j
         )
         self.graph_rag_retrieval.initialize()
 
@@ -249,7 +568,10 @@ class AdvancedGraphRAGSystem:
             traditional_retrieval=self.traditional_retrieval,
             graph_rag_retrieval=self.graph_rag_retrieval,
             llm_client=self.generation_module.client,
-            config=self.config
+            config=self.config,
+            local_router=self.local_router,
+            executor=self.executor,
+            planner=self.query_planner
         )
 
         self.system_ready = True
@@ -273,6 +595,7 @@ class AdvancedGraphRAGSystem:
         if self.index_module and self.index_module.has_collection():
             milvus_stats = self.index_module.get_collection_stats()
             stats["milvus_records"] = milvus_stats.get("row_count", 0)
+            stats["milvus_collection"] = milvus_stats.get("live_collection")
         
         return stats
 
@@ -287,85 +610,196 @@ class AdvancedGraphRAGSystem:
         print(f"   烹饪步骤: {stats.get('cooking_steps', 0)}")
         print(f"   文档数量: {stats.get('documents', 0)}")
         print(f"   文本块数: {stats.get('chunks', 0)}")
-        print(f"   向量索引: {stats.get('milvus_records', 0)} 条记录")
+        print(f"   向量索引: {stats.get('milvus_records', 0)} 条记录"
+              + (f"（{stats['milvus_collection']}）" if stats.get('milvus_collection') else ""))
         
         if stats.get('categories'):
             categories = list(stats['categories'].keys())[:10]
             print(f"   🏷️ 主要分类: {', '.join(categories)}")
+        
+        pipeline = stats.get('build_pipeline')
+        if pipeline:
+            stages = ", ".join(f"{name} {stage['chunks_per_second']}块/秒"
+                               for name, stage in pipeline['stages'].items())
+            print(f"   流式构建: {pipeline['chunks_per_second']} 块/秒 ({stages})，峰值RSS {pipeline['peak_rss_mb']}MB")
 
     def ask_question_with_routing(self, question: str, stream: bool = False, explain_routing: bool = False):
         """
         智能问答：自动选择最佳检索策略
+        与 aask_question 步骤相同：答案缓存查找 → 路由解释 → 检索 → 生成 → 写入答案缓存；
+        语义答案缓存仅用于非流式问答
         """
         if not self.system_ready or not self.knowledge_base_loaded:
             raise ValueError("系统或知识库未就绪，请先构建/加载知识库")
 
         print(f"\n❓ 用户问题: {question}")
+        start_time = time.time()
 
-        # 显示路由决策解释（可选）
-        if explain_routing:
-            explanation = self.query_router.explain_routing_decision(question)
-            print(explanation)
+        # 请求作用域统计本次问答的LLM调用次数（调用方已进入作用域时沿用）
+        with request_scope(current_request()) as request:
+            result, analysis = self._ask_question(question, stream, explain_routing)
 
-        start_time = time.time()
+        print(f"\n⏱️ 问答完成，耗时: {time.time() - start_time:.2f}秒，LLM调用 {request.llm_calls} 次")
+        return result, analysis
+
+    def _ask_question(self, question: str, stream: bool, explain_routing: bool):
+        """智能问答主流程（在请求作用域内执行）"""
+        use_cache = not stream
+        # 版本快照在查找缓存之前获取，生成期间知识库发生变化时不写入缓存
+        snapshot = self.answer_cache_snapshot()
+        if use_cache:
+            cached = self.lookup_cached_answer(question)
+            if cached:
+                print("⚡ 命中语义答案缓存")
+                return cached.answer, cached.analysis
 
         try:
-            # 1. 智能路由检索
-            print("执行智能查询路由...")
-            relevant_docs, analysis = self.query_router.route_query(question, self.config.top_k)
-
-            # 2. 显示路由信息
-            strategy_icons = {
-                "hybrid_traditional": "🔍",
-                "graph_rag": "🕸️",
-                "combined": "🔄"
-            }
-            strategy_icon = strategy_icons.get(analysis.recommended_strategy.value, "❓")
-            print(f"{strategy_icon} 使用策略: {analysis.recommended_strategy.value}")
-            print(f"📊 复杂度: {analysis.query_complexity:.2f}, 关系密集度: {analysis.relationship_intensity:.2f}")
-
-            # 3. 显示检索结果信息
-            if relevant_docs:
-                doc_info = []
-                for doc in relevant_docs:
-                    recipe_name = doc.metadata.get('recipe_name', '未知内容')
-                    search_type = doc.metadata.get('search_type', doc.metadata.get('route_strategy', 'unknown'))
-                    score = doc.metadata.get('final_score', doc.metadata.get('relevance_score', 0))
-                    doc_info.append(f"{recipe_name}({search_type}, {score:.3f})")
-
-                print(f"📋 找到 {len(relevant_docs)} 个相关文档: {', '.join(doc_info[:3])}")
-                if len(doc_info) > 3:
-                    print(f"    等 {len(relevant_docs)} 个结果...")
-            else:
+            analysis = None
+            if explain_routing:
+                analysis, explanation = self._explain_routing(question)
+                print(explanation)
+
+            relevant_docs, analysis = self._route_query_verbose(question, analysis)
+            if not relevant_docs:
                 # 保持返回值签名一致：始终返回 (result, analysis)
-                return "抱歉，没有找到相关的烹饪信息。请尝试其他问题。", analysis
-
-            # 4. 生成回答
-            print("🎯 智能生成回答...")
-
-            if stream:
-                try:
-                    for chunk_text in self.generation_module.generate_adaptive_answer_stream(question, relevant_docs):
-                        print(chunk_text, end="", flush=True)
-                    print("\n")
-                    result = "流式输出完成"
-                except Exception as stream_error:
-                    logger.error(f"流式输出过程中出现错误: {stream_error}")
-                    print(f"\n⚠️ 流式输出中断，切换到标准模式...")
-                    # 使用非流式作为后备
-                    result = self.generation_module.generate_adaptive_answer(question, relevant_docs)
-            else:
-                result = self.generation_module.generate_adaptive_answer(question, relevant_docs)
+                return self.NO_DOCUMENTS_ANSWER, analysis
+
+            result = self._generate_answer_verbose(question, relevant_docs, stream)
+            if use_cache:
+                self.cache_answer(question, result, relevant_docs, analysis, snapshot=snapshot)
+            return result, analysis
+
+        except Exception as e:
+            return self._answer_failed(e)
+
+    def _explain_routing(self, question: str):
+        """
+        分析查询并生成路由决策解释；分析结果随后直接用于路由，不重复调用LLM
+
+        Returns:
+            (查询分析结果, 解释文本)
+        """
+        analysis = self.query_router.analyze_query(question)
+        return analysis, self.query_router.explain_routing_decision(question, analysis)
+
+    @staticmethod
+    def _answer_failed(error: Exception):
+        """问答出错时的统一返回值"""
+        logger.error(f"问答处理失败: {error}")
+        return f"抱歉，处理问题时出现错误：{str(error)}", None
+
+    def _route_query_verbose(self, question: str, analysis=None):
+        """智能路由检索并显示路由信息和检索结果"""
+        print("执行智能查询路由...")
+        relevant_docs, analysis = self.query_router.route_query(question, self.config.top_k, analysis=analysis)
+
+        strategy_icons = {
+            "hybrid_traditional": "🔍",
+            "graph_rag": "🕸️",
+            "combined": "🔄"
+        }
+        strategy_icon = strategy_icons.get(analysis.recommended_strategy.value, "❓")
+        print(f"{strategy_icon} 使用策略: {analysis.recommended_strategy.value}")
+        print(f"📊 复杂度: {analysis.query_complexity:.2f}, 关系密集度: {analysis.relationship_intensity:.2f}")
+
+        if relevant_docs:
+            doc_info = []
+            for doc in relevant_docs:
+                recipe_name = doc.metadata.get('recipe_name', '未知内容')
+                search_type = doc.metadata.get('search_type', doc.metadata.get('route_strategy', 'unknown'))
+                score = doc.metadata.get('final_score', doc.metadata.get('relevance_score', 0))
+                doc_info.append(f"{recipe_name}({search_type}, {score:.3f})")
+
+            print(f"📋 找到 {len(relevant_docs)} 个相关文档: {', '.join(doc_info[:3])}")
+            if len(doc_info) > 3:
+                print(f"    等 {len(relevant_docs)} 个结果...")
+
+        return relevant_docs, analysis
+
+    def _generate_answer_verbose(self, question: str, relevant_docs: List, stream: bool) -> str:
+        """生成回答，流式时直接输出到终端"""
+        print("🎯 智能生成回答...")
+
+        if not stream:
+            return self.generation_module.generate_adaptive_answer(question, relevant_docs)
+
+        try:
+            for chunk_text in self.generation_module.generate_adaptive_answer_stream(question, relevant_docs):
+                print(chunk_text, end="", flush=True)
+            print("\n")
+            return "流式输出完成"
+        except Exception as stream_error:
+            logger.error(f"流式输出过程中出现错误: {stream_error}")
+            print(f"\n⚠️ 流式输出中断，切换到标准模式...")
+            # 使用非流式作为后备
+            return self.generation_module.generate_adaptive_answer(question, relevant_docs)
+
+    async def run_in_executor(self, func: Callable, *args, **kwargs):
+        """在共享线程池中执行同步函数，不阻塞事件循环（携带当前请求上下文）"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, bind_context(func, *args, **kwargs))
+
+    async def aretrieve(self, question: str, analysis=None):
+        """
+        智能路由检索 - 异步版本
+        检索链路（Neo4j、Milvus、路由LLM调用）在共享线程池中执行
+        
+        Args:
+            analysis: 本次请求已得到的查询分析，提供时路由不再重复分析
+        
+        Returns:
+            (相关文档, 查询分析结果)
+        """
+        if not self.system_ready or not self.knowledge_base_loaded:
+            raise ValueError("系统或知识库未就绪，请先构建/加载知识库")
+
+        return await self.run_in_executor(self.query_router.route_query, question, self.config.top_k,
+                                          analysis=analysis)
+
+    async def alookup_cached_answer(self, question: str):
+        """查找缓存答案 - 异步版本（问题向量化在共享线程池中执行）"""
+        if not self.answer_cache:
+            return None
+        return await self.run_in_executor(self.lookup_cached_answer, question)
+
+    async def aask_question(self, question: str, explain_routing: bool = False):
+        """
+        智能问答 - 异步版本（非流式），供API使用
+        与 ask_question_with_routing 步骤相同：检索在共享线程池中执行，
+        答案生成使用AsyncOpenAI，并发请求的I/O等待可以相互重叠
+        
+        Returns:
+            (答案, 查询分析结果)
+        """
+        if not self.system_ready or not self.knowledge_base_loaded:
+            raise ValueError("系统或知识库未就绪，请先构建/加载知识库")
+
+        snapshot = self.answer_cache_snapshot()
+        cached = await self.alookup_cached_answer(question)
+        if cached:
+            return cached.answer, cached.analysis
+
+        start_time = time.time()
+
+        try:
+            analysis = None
+            if explain_routing:
+                analysis, explanation = await self.run_in_executor(self._explain_routing, question)
+                logger.info(explanation)
+
+            relevant_docs, analysis = await self.aretrieve(question, analysis=analysis)
+            if not relevant_docs:
+                return self.NO_DOCUMENTS_ANSWER, analysis
 
-            # 5. 性能统计
-            end_time = time.time()
-            print(f"\n⏱️ 问答完成，耗时: {end_time - start_time:.2f}秒")
+            result = await self.generation_module.agenerate_adaptive_answer(question, relevant_docs)
+            await self.run_in_executor(self.cache_answer, question, result, relevant_docs, analysis,
+                                       snapshot=snapshot)
 
+            logger.info(f"问答完成（{analysis.recommended_strategy.value}），耗时: {time.time() - start_time:.2f}秒")
             return result, analysis
 
         except Exception as e:
-            logger.error(f"问答处理失败: {e}")
-            return f"抱歉，处理问题时出现错误：{str(e)}", None
+            return self._answer_failed(e)
 
     def run_interactive(self):
         """运行交互式问答"""
@@ -460,6 +894,7 @@ class AdvancedGraphRAGSystem:
 
     def _cleanup(self):
         """清理资源"""
+        self.build_jobs.shutdown()
         if self.data_module:
             self.data_module.close()
         if self.traditional_retrieval:
@@ -468,3 +903,7 @@ class AdvancedGraphRAGSystem:
             self.graph_rag_retrieval.close()
         if self.index_module:
             self.index_module.close()
+        self.neo4j.close()
+        self.executor.shutdown(wait=False)
+        for executor in self.retrieval_executors.values():
+            executor.shutdown(wait=False)
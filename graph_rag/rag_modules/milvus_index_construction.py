@@ -1,18 +1,113 @@
 """
 Milvus索引构建模块
+
+集合按版本构建（{collection_name}_v{n}），检索始终通过别名 {collection_name} 访问：
+全量重建时新版本在后台写入、建索引并加载完成后，才原子地把别名切换过去，
+旧版本在宽限期后删除，重建期间的检索不会看到空集合或未完成的索引
 """
 
+import hashlib
+import json
 import logging
+import re
+import threading
 import time
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Optional
 
 from pymilvus import MilvusClient, DataType, CollectionSchema, FieldSchema
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_core.documents import Document
 import numpy as np
 
+from .build_pipeline import StreamingBuildPipeline
+from .embedding_backends import create_embeddings, embedding_model_id
+from .embedding_cache import EmbeddingCache, CachedEmbeddings
+from .embedding_pool import ProcessPoolEmbeddings
+from .length_bucketing import LengthBucketedEmbeddings, token_length_fn
+from .memory_cache import LRUCache
+
 logger = logging.getLogger(__name__)
 
+# 向量字段索引名称
+VECTOR_INDEX_NAME = "vector"
+
+# similarity_search 可过滤字段的标量索引：取值较少的字段用位图索引，菜系取值较多用倒排索引
+SCALAR_INDEXES = {
+    "node_type": "BITMAP",
+    "category": "BITMAP",
+    "difficulty": "BITMAP",
+    "cuisine_type": "INVERTED"
+}
+
+# 可作为分区键的字段
+PARTITION_KEY_FIELDS = ("cuisine_type", "category")
+
+
+def build_collection_schema(dimension: int, partition_key: Optional[str] = None) -> CollectionSchema:
+    """
+    构建集合模式
+    
+    Args:
+        dimension: 向量维度
+        partition_key: 分区键字段（cuisine_type / category），None表示不分区
+    
+    Returns:
+        集合模式对象
+    """
+    # 定义字段
+    fields = [
+        FieldSchema(name="id", dtype=DataType.VARCHAR, max_length=150, is_primary=True),
+        FieldSchema(name="vector", dtype=DataType.FLOAT_VECTOR, dim=dimension),
+        FieldSchema(name="text", dtype=DataType.VARCHAR, max_length=15000),
+        FieldSchema(name="node_id", dtype=DataType.VARCHAR, max_length=100),
+        FieldSchema(name="recipe_name", dtype=DataType.VARCHAR, max_length=300),
+        FieldSchema(name="node_type", dtype=DataType.VARCHAR, max_length=100),
+        FieldSchema(name="category", dtype=DataType.VARCHAR, max_length=100,
+                    is_partition_key=partition_key == "category"),
+        FieldSchema(name="cuisine_type", dtype=DataType.VARCHAR, max_length=200,
+                    is_partition_key=partition_key == "cuisine_type"),
+        FieldSchema(name="difficulty", dtype=DataType.INT64),
+        FieldSchema(name="doc_type", dtype=DataType.VARCHAR, max_length=50),
+        FieldSchema(name="chunk_id", dtype=DataType.VARCHAR, max_length=150),
+        FieldSchema(name="parent_id", dtype=DataType.VARCHAR, max_length=100),
+        FieldSchema(name="content_hash", dtype=DataType.VARCHAR, max_length=64)
+    ]
+    
+    # 创建集合模式
+    return CollectionSchema(
+        fields=fields,
+        description="中式烹饪知识图谱向量集合"
+    )
+
+
+def add_collection_indexes(index_params, scalar_indexes: bool = True, partition_key: Optional[str] = None):
+    """
+    添加向量索引和可过滤字段的标量索引
+    
+    Args:
+        index_params: MilvusClient.prepare_index_params() 返回的对象
+        scalar_indexes: 是否为过滤字段创建标量索引
+        partition_key: 分区键字段（分区键字段统一使用倒排索引）
+    """
+    # 添加向量字段索引
+    index_params.add_index(
+        field_name="vector",
+        index_name=VECTOR_INDEX_NAME,
+        index_type="HNSW",
+        metric_type="COSINE",
+        params={
+            "M": 16,
+            "efConstruction": 200
+        }
+    )
+    
+    if scalar_indexes:
+        for field_name, index_type in SCALAR_INDEXES.items():
+            index_params.add_index(
+                field_name=field_name,
+                index_name=f"{field_name}_idx",
+                index_type="INVERTED" if field_name == partition_key else index_type
+            )
+
 class MilvusIndexConstructionModule:
     """Milvus索引构建模块 - 负责向量化和Milvus索引构建"""
 
@@ -21,26 +116,102 @@ class MilvusIndexConstructionModule:
                  port: int = 19530,
                  collection_name: str = "cooking_knowledge",
                  dimension: int = 512,
-                 model_name: str = "BAAI/bge-small-zh-v1.5"):
+                 model_name: str = "BAAI/bge-small-zh-v1.5",
+                 embedding_cache_dir: Optional[str] = None,
+                 embedding_cache_capacity: int = 100000,
+                 embedding_cache_flush_every: int = 4096,
+                 query_cache_size: int = 1024,
+                 query_cache_ttl: Optional[float] = None,
+                 build_batch_size: int = 256,
+                 build_queue_size: int = 4,
+                 embedding_workers: int = 0,
+                 embedding_threads_per_worker: Optional[int] = None,
+                 embedding_backend: str = "torch",
+                 onnx_model_dir: str = "./onnx_models",
+                 embedding_token_budget: int = 8192,
+                 embedding_max_batch_size: int = 256,
+                 index_build_timeout: float = 600.0,
+                 index_poll_interval: float = 0.5,
+                 version_gc_grace_seconds: float = 300.0,
+                 scalar_indexes: bool = True,
+                 partition_key: Optional[str] = None,
+                 num_partitions: int = 16):
         """
         初始化Milvus索引构建模块
 
         Args:
             host: Milvus服务器地址
             port: Milvus服务器端口
-            collection_name: 集合名称
+            collection_name: 集合别名，检索通过别名访问当前版本的集合
             dimension: 向量维度
             model_name: 嵌入模型名称
+            embedding_cache_dir: 嵌入向量持久化缓存目录，None表示不启用
+            embedding_cache_capacity: 嵌入缓存最多保存的向量条数
+            embedding_cache_flush_every: 嵌入缓存每写入多少条持久化一次索引
+            query_cache_size: 查询向量LRU缓存容量，0表示不启用
+            query_cache_ttl: 查询向量缓存过期秒数，None表示永不过期
+            build_batch_size: 流式构建时每批向量化/插入的文档块数
+            build_queue_size: 流式构建阶段间队列最多缓存的批次数
+            embedding_workers: 文档向量化的工作进程数，0或1表示在当前进程中计算
+            embedding_threads_per_worker: 每个工作进程的torch线程数，None表示CPU核数平分
+            embedding_backend: 嵌入推理后端（torch / onnx-int8）
+            onnx_model_dir: onnx-int8后端的模型导出目录
+            embedding_token_budget: 文档向量化按长度分桶时每批的token上限，0表示不分桶
+            embedding_max_batch_size: 按长度分桶时每批最多文本数
+            index_build_timeout: 等待向量索引构建完成的最长秒数
+            index_poll_interval: 查询索引构建进度的间隔秒数
+            version_gc_grace_seconds: 别名切换后旧版本集合保留的秒数（供切换前发出的检索完成）
+            scalar_indexes: 是否为过滤字段（node_type/category/difficulty/cuisine_type）创建标量索引
+            partition_key: 分区键字段（cuisine_type / category），None表示不分区；修改后需全量重建
+            num_partitions: 使用分区键时的分区数
+            
+        Raises:
+            ValueError: 不支持的分区键字段
         """
+        if partition_key and partition_key not in PARTITION_KEY_FIELDS:
+            raise ValueError(f"不支持的分区键字段: {partition_key}，可选: {PARTITION_KEY_FIELDS}")
+        
         self.host = host
         self.port = port
         self.collection_name = collection_name
         self.dimension = dimension
         self.model_name = model_name
+        self.embedding_cache_dir = embedding_cache_dir
+        self.embedding_cache_capacity = embedding_cache_capacity
+        self.embedding_cache_flush_every = embedding_cache_flush_every
+        self.build_batch_size = build_batch_size
+        self.build_queue_size = build_queue_size
+        self.embedding_workers = embedding_workers
+        self.embedding_threads_per_worker = embedding_threads_per_worker
+        self.embedding_backend = embedding_backend
+        self.onnx_model_dir = onnx_model_dir
+        self.embedding_token_budget = embedding_token_budget
+        self.embedding_max_batch_size = embedding_max_batch_size
+        self.index_build_timeout = index_build_timeout
+        self.index_poll_interval = index_poll_interval
+        self.version_gc_grace_seconds = version_gc_grace_seconds
+        self.scalar_indexes = scalar_indexes
+        self.partition_key = partition_key
+        self.num_partitions = num_partitions
+        self.last_build_stats: Dict[str, Any] = {}
         
         self.client = None
         self.embeddings = None
-        self.collection_created = False
+        self.embedding_cache = None
+        self.embedding_pool = None
+        self.length_bucketing = None
+        self.local_embeddings = None  # 当前进程中的模型（不经过进程池和持久化缓存）
+        self.collection_created = False  # 别名已指向可检索的集合
+        
+        # 已退役、等待删除的旧版本集合 -> 删除定时器
+        self._retired_versions: Dict[str, threading.Timer] = {}
+        self._version_lock = threading.Lock()
+        
+        # 查询向量LRU缓存（请求路径上的embed_query）
+        self.query_cache = LRUCache(maxsize=query_cache_size, ttl=query_cache_ttl) if query_cache_size > 0 else None
+        self._query_embed_lock = threading.Lock()
+        self._query_embed_count = 0
+        self._query_embed_seconds = 0.0
         
         self._setup_client()
         self._setup_embeddings()
@@ -60,6 +231,50 @@ class MilvusIndexConstructionModule:
             return ""
         return str(text)[:max_length]
     
+    def _chunk_to_entity(self, chunk: Document, vector: Optional[List[float]], fallback_id: str) -> Dict[str, Any]:
+        """
+        将文档块转换为Milvus实体
+        
+        Args:
+            chunk: 文档块
+            vector: 向量（计算内容哈希时可为None）
+            fallback_id: 文档块缺少chunk_id时使用的主键
+            
+        Returns:
+            Milvus实体字典（包含content_hash字段）
+        """
+        entity = {
+            "id": self._safe_truncate(chunk.metadata.get("chunk_id", fallback_id), 150),
+            "text": self._safe_truncate(chunk.page_content, 15000),
+            "node_id": self._safe_truncate(chunk.metadata.get("node_id", ""), 100),
+            "recipe_name": self._safe_truncate(chunk.metadata.get("recipe_name", ""), 300),
+            "node_type": self._safe_truncate(chunk.metadata.get("node_type", ""), 100),
+            "category": self._safe_truncate(chunk.metadata.get("category", ""), 100),
+            "cuisine_type": self._safe_truncate(chunk.metadata.get("cuisine_type", ""), 200),
+            "difficulty": int(chunk.metadata.get("difficulty", 0)),
+            "doc_type": self._safe_truncate(chunk.metadata.get("doc_type", ""), 50),
+            "chunk_id": self._safe_truncate(chunk.metadata.get("chunk_id", fallback_id), 150),
+            "parent_id": self._safe_truncate(chunk.metadata.get("parent_id", ""), 100)
+        }
+        entity["content_hash"] = self._compute_content_hash(entity)
+        entity["vector"] = vector
+        return entity
+    
+    def _compute_content_hash(self, entity: Dict[str, Any]) -> str:
+        """
+        计算实体内容哈希（文本 + 标量字段 + 嵌入模型及后端）
+        
+        Args:
+            entity: 不含向量的Milvus实体字段
+            
+        Returns:
+            SHA-256十六进制摘要
+        """
+        payload = {key: value for key, value in entity.items() if key not in ("vector", "content_hash")}
+        payload["embedding_model"] = embedding_model_id(self.model_name, self.embedding_backend)
+        serialized = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+    
     def _setup_client(self):
         """初始化Milvus客户端"""
         try:
@@ -78,14 +293,51 @@ class MilvusIndexConstructionModule:
     
     def _setup_embeddings(self):
         """初始化嵌入模型"""
-        logger.info(f"正在初始化嵌入模型: {self.model_name}")
+        logger.info(f"正在初始化嵌入模型: {self.model_name}（后端: {self.embedding_backend}）")
         
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=self.model_name,
-            model_kwargs={'device': 'cpu'},
-            encode_kwargs={'normalize_embeddings': True}
+        self.embeddings = create_embeddings(
+            self.embedding_backend,
+            self.model_name,
+            device='cpu',
+            onnx_model_dir=self.onnx_model_dir,
+            batch_size=self.embedding_max_batch_size if self.embedding_token_budget > 0 else 32
         )
         
+        # 按长度分桶：长度相近的文本同批计算，减少填充token
+        if self.embedding_token_budget > 0:
+            self.length_bucketing = LengthBucketedEmbeddings(
+                self.embeddings,
+                token_length_fn(self.model_name),
+                token_budget=self.embedding_token_budget,
+                max_batch_size=self.embedding_max_batch_size
+            )
+            self.embeddings = self.length_bucketing
+        self.local_embeddings = self.embeddings
+        
+        # 多进程向量化：构建时文档分片到进程池，查询仍由当前进程的模型计算
+        if self.embedding_workers > 1:
+            self.embedding_pool = ProcessPoolEmbeddings(
+                model_name=self.model_name,
+                workers=self.embedding_workers,
+                local_embeddings=self.embeddings,
+                threads_per_worker=self.embedding_threads_per_worker,
+                backend=self.embedding_backend,
+                onnx_model_dir=self.onnx_model_dir,
+                token_budget=self.embedding_token_budget,
+                max_batch_size=self.embedding_max_batch_size
+            )
+            self.embeddings = self.embedding_pool
+        
+        # 包装持久化嵌入缓存：未变化的文本在重建时无需再次前向计算
+        if self.embedding_cache_dir:
+            self.embedding_cache = EmbeddingCache(
+                cache_dir=self.embedding_cache_dir,
+                model_name=embedding_model_id(self.model_name, self.embedding_backend),
+                capacity=self.embedding_cache_capacity,
+                flush_every=self.embedding_cache_flush_every
+            )
+            self.embeddings = CachedEmbeddings(self.embeddings, self.embedding_cache)
+        
         logger.info("嵌入模型初始化完成")
     
     def _create_collection_schema(self) -> CollectionSchema:
@@ -95,97 +347,152 @@ class MilvusIndexConstructionModule:
         Returns:
             集合模式对象
         """
-        # 定义字段
-        fields = [
-            FieldSchema(name="id", dtype=DataType.VARCHAR, max_length=150, is_primary=True),
-            FieldSchema(name="vector", dtype=DataType.FLOAT_VECTOR, dim=self.dimension),
-            FieldSchema(name="text", dtype=DataType.VARCHAR, max_length=15000),
-            FieldSchema(name="node_id", dtype=DataType.VARCHAR, max_length=100),
-            FieldSchema(name="recipe_name", dtype=DataType.VARCHAR, max_length=300),
-            FieldSchema(name="node_type", dtype=DataType.VARCHAR, max_length=100),
-            FieldSchema(name="category", dtype=DataType.VARCHAR, max_length=100),
-            FieldSchema(name="cuisine_type", dtype=DataType.VARCHAR, max_length=200),
-            FieldSchema(name="difficulty", dtype=DataType.INT64),
-            FieldSchema(name="doc_type", dtype=DataType.VARCHAR, max_length=50),
-            FieldSchema(name="chunk_id", dtype=DataType.VARCHAR, max_length=150),
-            FieldSchema(name="parent_id", dtype=DataType.VARCHAR, max_length=100)
-        ]
-        
-        # 创建集合模式
-        schema = CollectionSchema(
-            fields=fields,
-            description="中式烹饪知识图谱向量集合"
-        )
-        
-        return schema
+        return build_collection_schema(self.dimension, self.partition_key)
     
-    def create_collection(self, force_recreate: bool = False) -> bool:
+    def create_collection(self, force_recreate: bool = False, collection_name: Optional[str] = None) -> bool:
         """
         创建Milvus集合
         
         Args:
             force_recreate: 是否强制重新创建集合
+            collection_name: 物理集合名称，默认为配置的集合名
         
         Returns:
             是否创建成功
         """
+        collection_name = collection_name or self.collection_name
         try:
             # 检查集合是否存在
-            if self.client.has_collection(self.collection_name):
+            if self.client.has_collection(collection_name):
                 if force_recreate:
-                    logger.info(f"删除已存在的集合: {self.collection_name}")
-                    self.client.drop_collection(self.collection_name)
+                    logger.info(f"删除已存在的集合: {collection_name}")
+                    self.client.drop_collection(collection_name)
                 else:
-                    logger.info(f"集合 {self.collection_name} 已存在")
-                    self.collection_created = True
+                    logger.info(f"集合 {collection_name} 已存在")
                     return True
             
             # 创建集合
             schema = self._create_collection_schema()
             
+            partition_kwargs = {"num_partitions": self.num_partitions} if self.partition_key else {}
             self.client.create_collection(
-                collection_name=self.collection_name,
+                collection_name=collection_name,
                 schema=schema,
                 metric_type="COSINE",  # 使用余弦相似度
-                consistency_level="Strong"
+                consistency_level="Strong",
+                **partition_kwargs
             )
             
-            logger.info(f"成功创建集合: {self.collection_name}")
-            self.collection_created = True
-            
+            logger.info(f"成功创建集合: {collection_name}")
             return True
             
         except Exception as e:
             logger.error(f"创建集合失败: {e}")
             return False
     
-    def create_index(self) -> bool:
+    def _version_name(self, version: int) -> str:
+        return f"{self.collection_name}_v{version}"
+    
+    def _list_versions(self) -> List[int]:
+        """已存在的版本号（升序）"""
+        pattern = re.compile(rf"^{re.escape(self.collection_name)}_v(\d+)$")
+        versions = []
+        for name in self.client.list_collections():
+            match = pattern.match(name)
+            if match:
+                versions.append(int(match.group(1)))
+        return sorted(versions)
+    
+    def _resolve_alias(self) -> Optional[str]:
+        """别名当前指向的集合，别名不存在时返回None"""
+        try:
+            return self.client.describe_alias(alias=self.collection_name).get("collection_name") or None
+        except Exception:
+            return None
+    
+    def live_collection(self) -> Optional[str]:
         """
-        创建向量索引
+        当前提供检索的物理集合
+        
+        Returns:
+            别名指向的版本集合；尚未迁移到版本化集合时为同名的旧集合；都不存在时返回None
+        """
+        target = self._resolve_alias()
+        if target:
+            return target
+        if self.collection_name in self.client.list_collections():
+            return self.collection_name
+        return None
+    
+    def _switch_alias(self, target: str, previous: Optional[str]):
+        """把别名原子地切换到新版本，旧版本在宽限期后删除"""
+        if self._resolve_alias():
+            self.client.alter_alias(collection_name=target, alias=self.collection_name)
+        else:
+            if previous == self.collection_name:
+                # 别名不能与已有集合同名：从未版本化的旧集合迁移时只能先删除旧集合，仅发生一次
+                logger.warning(f"迁移到版本化集合：删除未版本化的旧集合 {previous} 并创建别名")
+                self.client.drop_collection(previous)
+                previous = None
+            self.client.create_alias(collection_name=target, alias=self.collection_name)
+        logger.info(f"别名 {self.collection_name} 已切换到 {target}")
+        
+        if previous and previous != target:
+            self._retire_version(previous)
+    
+    def _retire_version(self, name: str):
+        """宽限期后删除已退役的版本"""
+        if self.version_gc_grace_seconds <= 0:
+            self._drop_version(name)
+            return
+        timer = threading.Timer(self.version_gc_grace_seconds, self._drop_version, args=(name,))
+        timer.daemon = True
+        with self._version_lock:
+            self._retired_versions[name] = timer
+        timer.start()
+        logger.info(f"旧版本 {name} 将在 {self.version_gc_grace_seconds:.0f} 秒后删除")
+    
+    def _drop_version(self, name: str):
+        with self._version_lock:
+            self._retired_versions.pop(name, None)
+        try:
+            if name == self._resolve_alias():
+                return
+            self.client.drop_collection(name)
+            logger.info(f"已删除旧版本集合: {name}")
+        except Exception as e:
+            logger.warning(f"删除旧版本集合失败 {name}: {e}")
+    
+    def _drop_stale_versions(self, keep: Optional[str]):
+        """删除未被别名引用、也不在宽限期内的版本（如之前失败的构建遗留的集合）"""
+        with self._version_lock:
+            retired = set(self._retired_versions)
+        for version in self._list_versions():
+            name = self._version_name(version)
+            if name != keep and name not in retired:
+                self._drop_version(name)
+    
+    def create_index(self, collection_name: Optional[str] = None) -> bool:
+        """
+        创建向量索引（以及过滤字段的标量索引）
+        
+        Args:
+            collection_name: 物理集合名称，默认为当前提供检索的集合
         
         Returns:
             是否创建成功
         """
+        collection_name = collection_name or self.live_collection()
         try:
-            if not self.collection_created:
+            if not collection_name or not self.client.has_collection(collection_name):
                 raise ValueError("请先创建集合")
             
             # 使用prepare_index_params创建正确的IndexParams对象
             index_params = self.client.prepare_index_params()
-            
-            # 添加向量字段索引
-            index_params.add_index(
-                field_name="vector",
-                index_type="HNSW",
-                metric_type="COSINE",
-                params={
-                    "M": 16,
-                    "efConstruction": 200
-                }
-            )
+            add_collection_indexes(index_params, self.scalar_indexes, self.partition_key)
             
             self.client.create_index(
-                collection_name=self.collection_name,
+                collection_name=collection_name,
                 index_params=index_params
             )
             
@@ -196,79 +503,125 @@ class MilvusIndexConstructionModule:
             logger.error(f"创建索引失败: {e}")
             return False
     
-    def build_vector_index(self, chunks: List[Document]) -> bool:
+    def wait_for_index(self, progress=None, collection_name: Optional[str] = None) -> bool:
+        """
+        轮询Milvus报告的索引构建进度，直到所有行都已建索引
+        
+        Args:
+            progress: 构建进度（BuildProgress），按已建索引行数报告 index 阶段
+            collection_name: 物理集合名称，默认为当前提供检索的集合
+            
+        Returns:
+            是否在超时前完成
+            
+        Raises:
+            RuntimeError: Milvus报告索引构建失败
+        """
+        collection_name = collection_name or self.live_collection()
+        deadline = time.time() + self.index_build_timeout
+        while True:
+            info = self.client.describe_index(collection_name=collection_name, index_name=VECTOR_INDEX_NAME)
+            total = info.get("total_rows", 0)
+            indexed = info.get("indexed_rows", 0)
+            pending = info.get("pending_index_rows", 0)
+            state = info.get("state", "")
+            if progress:
+                progress.update("index", indexed, total)
+            
+            if state == "Failed":
+                raise RuntimeError(f"索引构建失败: {info.get('index_state_fail_reason', '')}")
+            if state == "Finished" or (indexed >= total and not pending):
+                logger.info(f"索引构建完成: {indexed}/{total} 行")
+                return True
+            if time.time() >= deadline:
+                logger.warning(f"等待索引构建超时（{self.index_build_timeout}秒），当前进度 {indexed}/{total} 行")
+                return False
+            time.sleep(self.index_poll_interval)
+    
+    def build_vector_index(self, chunks: Iterable[Document], progress=None) -> bool:
         """
         构建向量索引
         
+        写入新版本集合，索引完成并加载后再切换别名，构建期间检索继续使用当前版本。
+        文档块 → 向量化 → 插入 以流水线方式执行，阶段之间用有界队列连接，
+        向量化与插入重叠进行，内存中只保留队列容量内的几个批次
+        
         Args:
-            chunks: 文档块列表
+            chunks: 文档块列表，或边读取边分块的生成器（如 GraphDataPreparationModule.iter_chunks）
+            progress: 构建进度（BuildProgress），报告 embedding、insert 和 index 阶段
             
         Returns:
             是否构建成功
         """
-        logger.info(f"正在构建Milvus向量索引，文档数量: {len(chunks)}...")
-        
-        if not chunks:
-            raise ValueError("文档块列表不能为空")
+        if isinstance(chunks, list):
+            logger.info(f"正在构建Milvus向量索引，文档数量: {len(chunks)}...")
+            if not chunks:
+                raise ValueError("文档块列表不能为空")
+        else:
+            logger.info("正在流式构建Milvus向量索引...")
         
+        target = None
         try:
-            # 1. 创建集合（如果schema不兼容则强制重新创建）
-            if not self.create_collection(force_recreate=True):
+            # 1. 创建新版本集合（先清理之前失败的构建遗留的版本）
+            live = self.live_collection()
+            self._drop_stale_versions(keep=live)
+            versions = self._list_versions()
+            target = self._version_name((versions[-1] if versions else 0) + 1)
+            logger.info(f"正在构建新版本集合: {target}（构建期间检索继续使用 {live or '无'}）")
+            if not self.create_collection(force_recreate=True, collection_name=target):
                 return False
             
-            # 2. 准备数据
-            logger.info("正在生成向量embeddings...")
-            texts = [chunk.page_content for chunk in chunks]
-            vectors = self.embeddings.embed_documents(texts)
-            
-            # 3. 准备插入数据
-            entities = []
-            for i, (chunk, vector) in enumerate(zip(chunks, vectors)):
-                entity = {
-                    "id": self._safe_truncate(chunk.metadata.get("chunk_id", f"chunk_{i}"), 150),
-                    "vector": vector,
-                    "text": self._safe_truncate(chunk.page_content, 15000),
-                    "node_id": self._safe_truncate(chunk.metadata.get("node_id", ""), 100),
-                    "recipe_name": self._safe_truncate(chunk.metadata.get("recipe_name", ""), 300),
-                    "node_type": self._safe_truncate(chunk.metadata.get("node_type", ""), 100),
-                    "category": self._safe_truncate(chunk.metadata.get("category", ""), 100),
-                    "cuisine_type": self._safe_truncate(chunk.metadata.get("cuisine_type", ""), 200),
-                    "difficulty": int(chunk.metadata.get("difficulty", 0)),
-                    "doc_type": self._safe_truncate(chunk.metadata.get("doc_type", ""), 50),
-                    "chunk_id": self._safe_truncate(chunk.metadata.get("chunk_id", f"chunk_{i}"), 150),
-                    "parent_id": self._safe_truncate(chunk.metadata.get("parent_id", ""), 100)
-                }
-                entities.append(entity)
-            
-            # 4. 批量插入数据
-            logger.info("正在插入向量数据...")
-            batch_size = 100
-            for i in range(0, len(entities), batch_size):
-                batch = entities[i:i + batch_size]
-                self.client.insert(
-                    collection_name=self.collection_name,
-                    data=batch
-                )
-                logger.info(f"已插入 {min(i + batch_size, len(entities))}/{len(entities)} 条数据")
-            
-            # 5. 创建索引
-            if not self.create_index():
+            # 2-4. 流式向量化并批量插入
+            logger.info("正在生成向量并插入数据...")
+            pipeline = StreamingBuildPipeline(
+                embed_fn=self.embeddings.embed_documents,
+                to_entity=self._chunk_to_entity,
+                insert_fn=lambda batch: self.client.insert(collection_name=target, data=batch),
+                batch_size=self.build_batch_size,
+                queue_size=self.build_queue_size,
+                progress=progress
+            )
+            self.last_build_stats = pipeline.run(chunks)
+            total = self.last_build_stats["total_chunks"]
+            if total == 0:
+                logger.error("文档块列表为空，未插入任何数据")
                 return False
             
-            # 6. 加载集合到内存
-            self.client.load_collection(self.collection_name)
-            logger.info("集合已加载到内存")
+            # 5. 落盘并创建索引（增长中的段不会建索引，需先flush）
+            if progress:
+                progress.start("index", total=total)
+            self.client.flush(collection_name=target)
+            if not self.create_index(target):
+                return False
             
-            # 7. 等待索引构建完成
+            # 6. 等待索引构建完成
+            # 超时视为构建失败：未完成索引的版本不切换别名，由 finally 删除，检索继续使用旧版本
             logger.info("等待索引构建完成...")
-            time.sleep(2)
+            if not self.wait_for_index(progress, collection_name=target):
+                logger.error(f"新版本集合 {target} 索引未在超时前完成，保留当前版本 {live or '无'}")
+                return False
+            if progress:
+                progress.finish("index")
             
-            logger.info(f"向量索引构建完成，包含 {len(chunks)} 个向量")
+            # 7. 加载新版本到内存后切换别名
+            self.client.load_collection(target)
+            logger.info(f"集合 {target} 已加载到内存")
+            self._switch_alias(target, previous=live)
+            self.collection_created = True
+            target = None
+            
+            logger.info(f"向量索引构建完成，包含 {total} 个向量")
             return True
             
         except Exception as e:
             logger.error(f"构建向量索引失败: {e}")
             return False
+        
+        finally:
+            self.flush_embedding_cache()
+            # 未切换别名的新版本不会被检索使用，直接删除
+            if target:
+                self._drop_version(target)
     
     def add_documents(self, new_chunks: List[Document]) -> bool:
         """
@@ -289,25 +642,13 @@ class MilvusIndexConstructionModule:
             # 生成向量
             texts = [chunk.page_content for chunk in new_chunks]
             vectors = self.embeddings.embed_documents(texts)
+            self.flush_embedding_cache()
             
             # 准备插入数据
-            entities = []
-            for i, (chunk, vector) in enumerate(zip(new_chunks, vectors)):
-                entity = {
-                    "id": self._safe_truncate(chunk.metadata.get("chunk_id", f"new_chunk_{i}_{int(time.time())}"), 150),
-                    "vector": vector,
-                    "text": self._safe_truncate(chunk.page_content, 15000),
-                    "node_id": self._safe_truncate(chunk.metadata.get("node_id", ""), 100),
-                    "recipe_name": self._safe_truncate(chunk.metadata.get("recipe_name", ""), 300),
-                    "node_type": self._safe_truncate(chunk.metadata.get("node_type", ""), 100),
-                    "category": self._safe_truncate(chunk.metadata.get("category", ""), 100),
-                    "cuisine_type": self._safe_truncate(chunk.metadata.get("cuisine_type", ""), 200),
-                    "difficulty": int(chunk.metadata.get("difficulty", 0)),
-                    "doc_type": self._safe_truncate(chunk.metadata.get("doc_type", ""), 50),
-                    "chunk_id": self._safe_truncate(chunk.metadata.get("chunk_id", f"new_chunk_{i}_{int(time.time())}"), 150),
-                    "parent_id": self._safe_truncate(chunk.metadata.get("parent_id", ""), 100)
-                }
-                entities.append(entity)
+            entities = [
+                self._chunk_to_entity(chunk, vector, f"new_chunk_{i}_{int(time.time())}")
+                for i, (chunk, vector) in enumerate(zip(new_chunks, vectors))
+            ]
             
             # 插入数据
             self.client.insert(
@@ -322,10 +663,162 @@ class MilvusIndexConstructionModule:
             logger.error(f"添加新文档失败: {e}")
             return False
     
+    def sync_vector_index(self, chunks: List[Document], progress=None) -> Optional[Dict[str, Any]]:
+        """
+        增量同步向量索引
+        
+        按chunk_id比较当前文档块与集合中已存储的内容哈希，只对新增或内容变化的块
+        重新生成向量并upsert，删除已不存在的块。集合不存在或缺少content_hash字段时
+        回退为全量构建。
+        
+        Args:
+            chunks: 当前完整的文档块列表
+            progress: 构建进度（BuildProgress），报告 embedding 和 insert 阶段
+            
+        Returns:
+            同步统计信息，失败时返回None
+        """
+        logger.info(f"正在增量同步Milvus向量索引，文档数量: {len(chunks)}...")
+        
+        if not chunks:
+            raise ValueError("文档块列表不能为空")
+        
+        if not self.has_collection() or not self._collection_has_field("content_hash"):
+            logger.info("集合不存在或不支持内容哈希，回退到全量构建")
+            if not self.build_vector_index(chunks, progress=progress):
+                return None
+            return {"mode": "full", "upserted": len(chunks), "deleted": 0, "unchanged": 0}
+        
+        try:
+            start_time = time.time()
+            if not self.load_collection():
+                return None
+            
+            # 1. 读取已存储的内容哈希
+            stored = self._fetch_stored_hashes()
+            
+            # 2. 找出新增或变化的块
+            changed = []
+            current_ids = set()
+            for i, chunk in enumerate(chunks):
+                entity = self._chunk_to_entity(chunk, None, f"chunk_{i}")
+                current_ids.add(entity["id"])
+                if stored.get(entity["id"], {}).get("content_hash") != entity["content_hash"]:
+                    changed.append((chunk, entity))
+            
+            stale_ids = [chunk_id for chunk_id in stored if chunk_id not in current_ids]
+            affected_node_ids = {entity["parent_id"] for _, entity in changed}
+            affected_node_ids.update(stored[chunk_id]["parent_id"] for chunk_id in stale_ids)
+            logger.info(f"增量对比完成: 变化 {len(changed)} 个，删除 {len(stale_ids)} 个，"
+                        f"未变化 {len(chunks) - len(changed)} 个")
+            
+            # 3. 仅为变化的块生成向量并upsert
+            if progress:
+                progress.start("embedding", total=len(changed))
+                progress.start("insert", total=len(changed))
+            if changed:
+                vectors = self.embeddings.embed_documents([chunk.page_content for chunk, _ in changed])
+                self.flush_embedding_cache()
+                for (_, entity), vector in zip(changed, vectors):
+                    entity["vector"] = vector
+                if progress:
+                    progress.advance("embedding", len(changed))
+                
+                batch_size = 100
+                for i in range(0, len(changed), batch_size):
+                    batch = [entity for _, entity in changed[i:i + batch_size]]
+                    self.client.upsert(
+                        collection_name=self.collection_name,
+                        data=batch
+                    )
+                    logger.info(f"已upsert {min(i + batch_size, len(changed))}/{len(changed)} 条数据")
+                    if progress:
+                        progress.advance("insert", len(batch))
+            if progress:
+                progress.finish("embedding")
+                progress.finish("insert")
+            
+            # 4. 删除已不存在的块
+            if stale_ids:
+                batch_size = 1000
+                for i in range(0, len(stale_ids), batch_size):
+                    self.client.delete(
+                        collection_name=self.collection_name,
+                        ids=stale_ids[i:i + batch_size]
+                    )
+                logger.info(f"已删除 {len(stale_ids)} 条过期数据")
+            
+            stats = {
+                "mode": "incremental",
+                "upserted": len(changed),
+                "deleted": len(stale_ids),
+                "unchanged": len(chunks) - len(changed),
+                "affected_node_ids": sorted(affected_node_ids),
+                "elapsed": time.time() - start_time
+            }
+            logger.info(f"增量同步完成: 更新 {stats['upserted']} 个，删除 {stats['deleted']} 个，"
+                        f"涉及 {len(affected_node_ids)} 个菜谱，耗时 {stats['elapsed']:.2f}秒")
+            return stats
+            
+        except Exception as e:
+            logger.error(f"增量同步向量索引失败: {e}")
+            return None
+    
+    def _collection_has_field(self, field_name: str) -> bool:
+        """
+        检查集合是否包含指定字段
+        
+        Args:
+            field_name: 字段名称
+            
+        Returns:
+            是否包含该字段
+        """
+        try:
+            description = self.client.describe_collection(self.live_collection())
+            return any(field.get("name") == field_name for field in description.get("fields", []))
+        except Exception as e:
+            logger.error(f"获取集合结构失败: {e}")
+            return False
+    
+    def _fetch_stored_hashes(self, batch_size: int = 1000) -> Dict[str, Dict[str, str]]:
+        """
+        读取集合中所有主键及其内容哈希
+        
+        Args:
+            batch_size: 迭代查询批次大小
+            
+        Returns:
+            chunk_id -> {"content_hash": ..., "parent_id": ...}
+        """
+        stored = {}
+        iterator = self.client.query_iterator(
+            collection_name=self.collection_name,
+            batch_size=batch_size,
+            filter='id != ""',
+            output_fields=["id", "content_hash", "parent_id"]
+        )
+        try:
+            while True:
+                batch = iterator.next()
+                if not batch:
+                    break
+                for row in batch:
+                    stored[row["id"]] = {
+                        "content_hash": row.get("content_hash", ""),
+                        "parent_id": row.get("parent_id", "")
+                    }
+        finally:
+            iterator.close()
+        
+        return stored
+    
     def similarity_search(self, query: str, k: int = 5, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """
         相似度搜索
         
+        过滤字段有标量索引时先按索引筛选再做ANN检索；过滤条件包含分区键时只搜索对应分区
+        
         Args:
             query: 查询文本
             k: 返回结果数量
@@ -338,8 +831,8 @@ class MilvusIndexConstructionModule:
             raise ValueError("请先构建或加载向量索引")
         
         try:
-            # 生成查询向量
-            query_vector = self.embeddings.embed_query(query)
+            # 生成查询向量（优先读取LRU缓存）
+            query_vector = self.embed_query(query)
             
             # 构建过滤表达式
             filter_expr = ""
@@ -414,6 +907,71 @@ class MilvusIndexConstructionModule:
             logger.error(f"相似度搜索失败: {e}")
             return []
     
+    def embed_query(self, query: str) -> List[float]:
+        """
+        生成查询向量，前置LRU缓存避免重复查询的模型计算
+        
+        Args:
+            query: 查询文本
+            
+        Returns:
+            查询向量
+        """
+        if self.query_cache is not None:
+            vector = self.query_cache.get(query)
+            if vector is not None:
+                return vector
+        
+        start_time = time.perf_counter()
+        vector = self.embeddings.embed_query(query)
+        elapsed = time.perf_counter() - start_time
+        
+        with self._query_embed_lock:
+            self._query_embed_count += 1
+            self._query_embed_seconds += elapsed
+        
+        if self.query_cache is not None:
+            self.query_cache.put(query, vector)
+        return vector
+    
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """
+        批量生成查询向量（如本地路由器的训练样本）
+        在当前进程的模型上计算，不写入文档嵌入的持久化缓存
+        
+        Args:
+            queries: 查询文本列表
+            
+        Returns:
+            查询向量列表
+        """
+        return self.local_embeddings.embed_documents(queries)
+    
+    def get_query_cache_stats(self) -> Dict[str, Any]:
+        """
+        获取查询向量缓存统计信息
+        
+        Returns:
+            命中率、平均向量化耗时及估算节省的时间
+        """
+        with self._query_embed_lock:
+            embed_count = self._query_embed_count
+            embed_seconds = self._query_embed_seconds
+        
+        avg_embed_ms = embed_seconds / embed_count * 1000 if embed_count else 0.0
+        if self.query_cache is None:
+            return {"enabled": False, "embed_count": embed_count, "avg_embed_ms": avg_embed_ms}
+        
+        stats = self.query_cache.get_stats()
+        return {
+            "enabled": True,
+            **stats,
+            "embed_count": embed_count,
+            "avg_embed_ms": avg_embed_ms,
+            # 每次命中按平均模型耗时估算节省的时间
+            "saved_seconds": stats["hits"] * avg_embed_ms / 1000
+        }
+    
     def get_collection_stats(self) -> Dict[str, Any]:
         """
         获取集合统计信息
@@ -425,9 +983,12 @@ class MilvusIndexConstructionModule:
             if not self.collection_created:
                 return {"error": "集合未创建"}
             
-            stats = self.client.get_collection_stats(self.collection_name)
+            live = self.live_collection()
+            stats = self.client.get_collection_stats(live)
             return {
                 "collection_name": self.collection_name,
+                "live_collection": live,
+                "versions": [self._version_name(version) for version in self._list_versions()],
                 "row_count": stats.get("row_count", 0),
                 "index_building_progress": stats.get("index_building_progress", 0),
                 "stats": stats
@@ -437,22 +998,68 @@ class MilvusIndexConstructionModule:
             logger.error(f"获取集合统计信息失败: {e}")
             return {"error": str(e)}
     
+    def get_build_stats(self) -> Dict[str, Any]:
+        """获取最近一次流式构建的分阶段统计（吞吐、峰值RSS）"""
+        return dict(self.last_build_stats)
+    
+    def get_embedding_batching_stats(self) -> Dict[str, Any]:
+        """
+        获取文档向量化分批统计（实际token数与填充token数）
+        
+        Returns:
+            统计信息字典，未启用分桶时返回 {"enabled": False}；启用多进程时只统计当前进程计算的部分
+        """
+        if not self.length_bucketing:
+            return {"enabled": False}
+        return {"enabled": True, **self.length_bucketing.get_stats()}
+    
+    def flush_embedding_cache(self):
+        """持久化嵌入缓存（构建结束时调用，构建过程中只按间隔持久化）"""
+        if not self.embedding_cache:
+            return
+        try:
+            self.embedding_cache.flush()
+        except Exception as e:
+            logger.warning(f"持久化嵌入缓存失败: {e}")
+    
+    def get_embedding_cache_stats(self) -> Dict[str, Any]:
+        """
+        获取嵌入缓存统计信息
+        
+        Returns:
+            统计信息字典，未启用缓存时返回 {"enabled": False}
+        """
+        if not self.embedding_cache:
+            return {"enabled": False}
+        return {"enabled": True, **self.embedding_cache.get_stats()}
+    
     def delete_collection(self) -> bool:
         """
-        删除集合
+        删除别名及所有版本的集合
         
         Returns:
             是否删除成功
         """
         try:
-            if self.client.has_collection(self.collection_name):
-                self.client.drop_collection(self.collection_name)
-                logger.info(f"集合 {self.collection_name} 已删除")
-                self.collection_created = False
-                return True
+            with self._version_lock:
+                for timer in self._retired_versions.values():
+                    timer.cancel()
+                self._retired_versions.clear()
+            
+            if self._resolve_alias():
+                self.client.drop_alias(alias=self.collection_name)
+            names = [self._version_name(version) for version in self._list_versions()]
+            if self.collection_name in self.client.list_collections():
+                names.append(self.collection_name)
+            for name in names:
+                self.client.drop_collection(name)
+            self.collection_created = False
+            
+            if names:
+                logger.info(f"集合 {self.collection_name} 已删除（{', '.join(names)}）")
             else:
                 logger.info(f"集合 {self.collection_name} 不存在")
-                return True
+            return True
                 
         except Exception as e:
             logger.error(f"删除集合失败: {e}")
@@ -460,32 +1067,33 @@ class MilvusIndexConstructionModule:
     
     def has_collection(self) -> bool:
         """
-        检查集合是否存在
+        检查是否存在可检索的集合
         
         Returns:
             集合是否存在
         """
         try:
-            return self.client.has_collection(self.collection_name)
+            return self.live_collection() is not None
         except Exception as e:
             logger.error(f"检查集合存在性失败: {e}")
             return False
     
     def load_collection(self) -> bool:
         """
-        加载集合到内存
+        加载当前版本的集合到内存
         
         Returns:
             是否加载成功
         """
         try:
-            if not self.client.has_collection(self.collection_name):
+            live = self.live_collection()
+            if not live:
                 logger.error(f"集合 {self.collection_name} 不存在")
                 return False
             
-            self.client.load_collection(self.collection_name)
+            self.client.load_collection(live)
             self.collection_created = True
-            logger.info(f"集合 {self.collection_name} 已加载到内存")
+            logger.info(f"集合 {live} 已加载到内存")
             return True
             
         except Exception as e:
@@ -494,6 +1102,14 @@ class MilvusIndexConstructionModule:
     
     def close(self):
         """关闭连接"""
+        # 未到期的旧版本留给下次构建时清理
+        for timer in list(getattr(self, '_retired_versions', {}).values()):
+            timer.cancel()
+        if getattr(self, 'embedding_pool', None):
+            # 进程池在下次构建时按需重新启动
+            self.embedding_pool.close()
+        if getattr(self, 'embedding_cache', None):
+            self.flush_embedding_cache()
         if hasattr(self, 'client') and self.client:
             # Milvus客户端不需要显式关闭
             logger.info("Milvus连接已关闭")
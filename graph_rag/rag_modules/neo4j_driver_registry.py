@@ -0,0 +1,194 @@
+"""
+Neo4j驱动注册模块
+整个系统共用一个Neo4j驱动（连接池），由 AdvancedGraphRAGSystem 持有并传给各图模块：
+- 连接池大小、获取连接超时、fetch size 统一可配
+- 读查询使用 execute_read 事务函数：遇到瞬时错误自动重试，集群部署（neo4j://）时路由到读副本
+- 统计连接池占用（使用中/空闲）和获取连接的等待时间
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from neo4j import GraphDatabase, READ_ACCESS
+
+logger = logging.getLogger(__name__)
+
+
+class Neo4jDriverRegistry:
+    """
+    共享的Neo4j驱动 - 线程安全
+    session() 与 neo4j.Driver.session() 用法一致，可以直接替代原来各模块各自创建的驱动
+    """
+
+    def __init__(self,
+                 uri: str,
+                 user: str,
+                 password: str,
+                 database: str = "neo4j",
+                 max_connection_pool_size: int = 50,
+                 connection_acquisition_timeout: float = 30.0,
+                 fetch_size: int = 1000,
+                 max_transaction_retry_time: float = 15.0):
+        """
+        初始化驱动注册表（不立即连接）
+
+        Args:
+            uri: Neo4j连接URI
+            user: 用户名
+            password: 密码
+            database: 数据库名称
+            max_connection_pool_size: 连接池最大连接数
+            connection_acquisition_timeout: 从连接池获取连接的超时秒数
+            fetch_size: 每批从服务端拉取的记录数
+            max_transaction_retry_time: 事务函数遇到瞬时错误时的最长重试秒数
+        """
+        self.uri = uri
+        self.user = user
+        self.password = password
+        self.database = database
+        self.max_connection_pool_size = max_connection_pool_size
+        self.connection_acquisition_timeout = connection_acquisition_timeout
+        self.fetch_size = fetch_size
+        self.max_transaction_retry_time = max_transaction_retry_time
+        self.driver = None
+
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.active_sessions = 0
+        self.peak_sessions = 0
+        self.sessions_opened = 0
+        self.reads = 0
+        self.read_retries = 0
+        self.read_failures = 0
+        self.waits = 0
+        self.wait_ms = 0.0
+        self.max_wait_ms = 0.0
+
+    @classmethod
+    def from_config(cls, config) -> "Neo4jDriverRegistry":
+        """按系统配置创建"""
+        return cls(
+            uri=config.neo4j_uri,
+            user=config.neo4j_user,
+            password=config.neo4j_password,
+            database=config.neo4j_database,
+            max_connection_pool_size=config.neo4j_max_connection_pool_size,
+            connection_acquisition_timeout=config.neo4j_connection_acquisition_timeout,
+            fetch_size=config.neo4j_fetch_size,
+            max_transaction_retry_time=config.neo4j_max_transaction_retry_time
+        )
+
+    def connect(self):
+        """创建驱动并验证连接"""
+        if self.driver is not None:
+            return
+        try:
+            self.driver = GraphDatabase.driver(
+                self.uri,
+                auth=(self.user, self.password),
+                max_connection_pool_size=self.max_connection_pool_size,
+                connection_acquisition_timeout=self.connection_acquisition_timeout,
+                max_transaction_retry_time=self.max_transaction_retry_time
+            )
+            self.driver.verify_connectivity()
+            logger.info(f"已连接到Neo4j数据库: {self.uri}（连接池上限 {self.max_connection_pool_size}）")
+        except Exception as e:
+            logger.error(f"连接Neo4j失败: {e}")
+            self.driver = None
+            raise
+
+    @contextmanager
+    def session(self, **kwargs) -> Iterator[Any]:
+        """打开会话（默认使用配置的数据库和fetch size），并统计同时打开的会话数"""
+        if self.driver is None:
+            raise RuntimeError("Neo4j驱动未连接")
+        kwargs.setdefault("database", self.database)
+        kwargs.setdefault("fetch_size", self.fetch_size)
+
+        with self._lock:
+            self.active_sessions += 1
+            self.sessions_opened += 1
+            self.peak_sessions = max(self.peak_sessions, self.active_sessions)
+        try:
+            with self.driver.session(**kwargs) as session:
+                yield session
+        finally:
+            with self._lock:
+                self.active_sessions -= 1
+
+    def execute_read(self, work: Callable, *args, **kwargs) -> Any:
+        """
+        以只读事务函数执行 work(tx, *args, **kwargs)
+        瞬时错误（连接中断、集群切主等）由驱动在 max_transaction_retry_time 内自动重试，
+        work 可能被执行多次，不能有副作用；结果需在函数内消费完毕
+        """
+        attempts = 0
+        started = time.perf_counter()
+        waited_ms = None
+
+        def run(tx):
+            nonlocal attempts, waited_ms
+            attempts += 1
+            if waited_ms is None:
+                # 首次进入事务函数前的耗时即获取连接（含排队）和开启事务的等待时间
+                waited_ms = (time.perf_counter() - started) * 1000
+            return work(tx, *args, **kwargs)
+
+        try:
+            with self.session(default_access_mode=READ_ACCESS) as session:
+                return session.execute_read(run)
+        except Exception:
+            with self._lock:
+                self.read_failures += 1
+            raise
+        finally:
+            with self._lock:
+                self.reads += 1
+                self.read_retries += max(attempts - 1, 0)
+                if waited_ms is not None:
+                    self.waits += 1
+                    self.wait_ms += waited_ms
+                    self.max_wait_ms = max(self.max_wait_ms, waited_ms)
+
+    def run_read(self, query: str, parameters: Optional[Dict[str, Any]] = None) -> List[Any]:
+        """执行只读查询并返回全部记录（带重试）"""
+        return self.execute_read(lambda tx: list(tx.run(query, parameters or {})))
+
+    def _pool_connections(self) -> Optional[Dict[str, int]]:
+        """读取驱动连接池中的连接状态；驱动未公开该信息，取不到时返回None"""
+        try:
+            connections = [conn for pool in self.driver._pool.connections.values() for conn in pool]
+        except Exception:
+            return None
+        in_use = sum(1 for conn in connections if getattr(conn, "in_use", False))
+        return {"in_use": in_use, "idle": len(connections) - in_use}
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """获取连接池统计信息"""
+        pool = self._pool_connections() if self.driver else None
+        with self._lock:
+            return {
+                "connected": self.driver is not None,
+                "max_pool_size": self.max_connection_pool_size,
+                "in_use": pool["in_use"] if pool else None,
+                "idle": pool["idle"] if pool else None,
+                "active_sessions": self.active_sessions,
+                "peak_sessions": self.peak_sessions,
+                "sessions_opened": self.sessions_opened,
+                "reads": self.reads,
+                "read_retries": self.read_retries,
+                "read_failures": self.read_failures,
+                "avg_wait_ms": self.wait_ms / self.waits if self.waits else 0.0,
+                "max_wait_ms": self.max_wait_ms
+            }
+
+    def close(self):
+        """关闭驱动（连接池中的所有连接）"""
+        if self.driver is not None:
+            self.driver.close()
+            self.driver = None
+            logger.info("Neo4j连接已关闭")
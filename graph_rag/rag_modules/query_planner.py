@@ -0,0 +1,254 @@
+"""
+统一查询规划模块
+一次LLM调用同时给出路由策略、图查询结构和检索关键词，替代原来依次进行的
+analyze_query、understand_graph_query、extract_query_keywords 三次调用
+"""
+
+import json
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from .graph_rag_retrieval import GraphQuery, QueryType
+from .intelligent_query_router import QueryAnalysis, SearchStrategy
+
+logger = logging.getLogger(__name__)
+
+RELATION_TYPES = ("REQUIRES", "BELONGS_TO_CATEGORY", "CONTAINS_STEP")
+
+
+@dataclass
+class QueryPlan:
+    """查询规划结果（已通过校验）"""
+    strategy: SearchStrategy
+    confidence: float
+    reasoning: str
+    query_complexity: float
+    relationship_intensity: float
+    reasoning_required: bool
+    graph_query_type: QueryType
+    source_entities: List[str] = field(default_factory=list)
+    target_entities: List[str] = field(default_factory=list)
+    relation_types: List[str] = field(default_factory=list)
+    max_depth: int = 2
+    constraints: Dict[str, Any] = field(default_factory=dict)
+    entity_keywords: List[str] = field(default_factory=list)
+    topic_keywords: List[str] = field(default_factory=list)
+    elapsed_ms: float = 0.0
+
+    def to_query_analysis(self) -> QueryAnalysis:
+        """转换为路由器使用的查询分析结果，规划本身随分析结果一起传递给检索器"""
+        return QueryAnalysis(
+            query_complexity=self.query_complexity,
+            relationship_intensity=self.relationship_intensity,
+            reasoning_required=self.reasoning_required,
+            entity_count=len(self.source_entities) + len(self.target_entities),
+            recommended_strategy=self.strategy,
+            confidence=self.confidence,
+            reasoning=self.reasoning,
+            source="plan",
+            plan=self
+        )
+
+    def to_graph_query(self) -> GraphQuery:
+        """转换为图RAG检索使用的图查询结构"""
+        return GraphQuery(
+            query_type=self.graph_query_type,
+            source_entities=list(self.source_entities),
+            target_entities=list(self.target_entities),
+            relation_types=list(self.relation_types),
+            max_depth=self.max_depth,
+            max_nodes=50,
+            constraints=dict(self.constraints)
+        )
+
+    def keywords(self) -> Optional[Tuple[List[str], List[str]]]:
+        """检索关键词（实体级, 主题级），都为空时返回None，由检索器自行提取"""
+        if not self.entity_keywords and not self.topic_keywords:
+            return None
+        return list(self.entity_keywords), list(self.topic_keywords)
+
+
+class QueryPlanner:
+    """统一查询规划器"""
+
+    def __init__(self, llm_client, config):
+        self.llm_client = llm_client
+        self.config = config
+
+        # 统计信息
+        self.plans = 0
+        self.failures = 0
+        self.total_ms = 0.0
+
+    def _build_prompt(self, query: str) -> str:
+        return f"""
+        作为烹饪知识图谱RAG系统的查询规划专家，请一次性给出下面查询的完整检索规划。
+
+        图中的节点和关系：
+        - Recipe：菜谱，属性 name、description、cuisineType、category、tags、prepTime、cookTime
+        - Ingredient：食材，属性 name、category（如"蔬菜"、"蛋白质"）
+        - Category：菜品分类（如"川菜"、"家常菜"、"素菜"）
+        - CookingStep：烹饪步骤
+        - (Recipe)-[:REQUIRES]->(Ingredient)
+        - (Recipe)-[:BELONGS_TO_CATEGORY]->(Category)
+        - (Recipe)-[:CONTAINS_STEP]->(CookingStep)
+
+        查询：{query}
+
+        规划内容：
+        1. strategy：检索策略
+           - hybrid_traditional：简单直接的信息查找（如：红烧肉怎么做？）
+           - graph_rag：实体间关系推理、知识发现（如：鸡肉配什么蔬菜？）
+           - combined：两者都需要（如：推荐几道减肥菜并说明做法）
+        2. confidence：策略置信度（0-1）；reasoning：一句话理由
+        3. query_complexity、relationship_intensity：查询复杂度与关系密集度（0-1）；reasoning_required：是否需要推理
+        4. graph_query：图查询结构
+           - query_type：entity_relation / multi_hop / subgraph / path_finding / clustering
+           - source_entities：图中很可能有对应节点的具体名称（菜系、菜名、食材名），不要放抽象概念或约束
+           - target_entities：只在需要限制路径终点时填写，否则为 []
+           - relation_types：优先考虑的关系类型，取值于 {list(RELATION_TYPES)}
+           - max_depth：图遍历深度（1-3 的整数）
+           - constraints：图结构之外的属性约束，如 {{"health": ["低糖"], "time": {{"max_minutes": 30}}}}
+        5. keywords：检索关键词
+           - entity_keywords：具体的食材、菜品名称等有形实体；抽象查询时推测相关的具体食材/菜品
+           - topic_keywords：烹饪主题、饮食风格、营养特点等抽象概念，排除"推荐"、"怎么做"等动作词
+
+        示例：
+        查询："鸡肉配什么蔬菜好？"
+        {{
+          "strategy": "graph_rag",
+          "confidence": 0.85,
+          "reasoning": "需要通过菜品推理鸡肉与蔬菜的搭配关系",
+          "query_complexity": 0.6,
+          "relationship_intensity": 0.8,
+          "reasoning_required": true,
+          "graph_query": {{
+            "query_type": "multi_hop",
+            "source_entities": ["鸡肉"],
+            "target_entities": ["蔬菜"],
+            "relation_types": ["REQUIRES"],
+            "max_depth": 3,
+            "constraints": {{}}
+          }},
+          "keywords": {{
+            "entity_keywords": ["鸡肉", "西兰花", "胡萝卜"],
+            "topic_keywords": ["食材搭配"]
+          }}
+        }}
+
+        请严格返回一个合法的JSON对象，不要包含任何多余的说明文字。
+        """
+
+    def plan(self, query: str) -> Optional[QueryPlan]:
+        """
+        生成查询规划
+
+        Returns:
+            校验通过的规划；LLM调用失败或返回不合法时返回None
+        """
+        start = time.perf_counter()
+        try:
+            response = self.llm_client.chat.completions.create(
+                model=self.config.llm_model,
+                messages=[{"role": "user", "content": self._build_prompt(query)}],
+                temperature=0.1,
+                max_tokens=1000
+            )
+            plan = self.validate(self._parse_json(response.choices[0].message.content))
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"查询规划失败: {e}")
+            return None
+
+        plan.elapsed_ms = (time.perf_counter() - start) * 1000
+        self.plans += 1
+        self.total_ms += plan.elapsed_ms
+        logger.info(f"查询规划完成: {plan.strategy.value}/{plan.graph_query_type.value} "
+                    f"(置信度: {plan.confidence:.2f}, 耗时: {plan.elapsed_ms:.0f}ms)")
+        return plan
+
+    @staticmethod
+    def _parse_json(content: str) -> Dict[str, Any]:
+        """解析LLM返回的JSON，兼容 ```json 代码块包裹"""
+        content = content.strip()
+        fenced = re.match(r"^```(?:json)?\s*(.*?)\s*```$", content, re.S)
+        if fenced:
+            content = fenced.group(1)
+        result = json.loads(content)
+        if not isinstance(result, dict):
+            raise ValueError("规划结果必须是JSON对象")
+        return result
+
+    @classmethod
+    def validate(cls, raw: Dict[str, Any]) -> QueryPlan:
+        """
+        按规划结构校验并规范化LLM输出
+
+        Raises:
+            ValueError: 缺少必填字段或取值不合法
+        """
+        graph = raw.get("graph_query")
+        keywords = raw.get("keywords", {})
+        if not isinstance(graph, dict):
+            raise ValueError("graph_query 必须是对象")
+        if not isinstance(keywords, dict):
+            raise ValueError("keywords 必须是对象")
+
+        try:
+            strategy = SearchStrategy(raw["strategy"])
+        except (KeyError, ValueError):
+            raise ValueError(f"strategy 不合法: {raw.get('strategy')}")
+        try:
+            query_type = QueryType(graph["query_type"])
+        except (KeyError, ValueError):
+            raise ValueError(f"graph_query.query_type 不合法: {graph.get('query_type')}")
+
+        constraints = graph.get("constraints") or {}
+        if not isinstance(constraints, dict):
+            raise ValueError("graph_query.constraints 必须是对象")
+
+        max_depth = graph.get("max_depth", 2)
+        if isinstance(max_depth, bool) or not isinstance(max_depth, (int, float)):
+            raise ValueError(f"graph_query.max_depth 不合法: {max_depth}")
+
+        return QueryPlan(
+            strategy=strategy,
+            confidence=cls._score(raw, "confidence", 0.5),
+            reasoning=str(raw.get("reasoning", "统一查询规划")),
+            query_complexity=cls._score(raw, "query_complexity", 0.5),
+            relationship_intensity=cls._score(raw, "relationship_intensity", 0.5),
+            reasoning_required=bool(raw.get("reasoning_required", False)),
+            graph_query_type=query_type,
+            source_entities=cls._strings(graph, "source_entities"),
+            target_entities=cls._strings(graph, "target_entities"),
+            relation_types=[r for r in cls._strings(graph, "relation_types") if r in RELATION_TYPES],
+            max_depth=min(3, max(1, int(max_depth))),
+            constraints=constraints,
+            entity_keywords=cls._strings(keywords, "entity_keywords"),
+            topic_keywords=cls._strings(keywords, "topic_keywords")
+        )
+
+    @staticmethod
+    def _score(raw: Dict[str, Any], key: str, default: float) -> float:
+        value = raw.get(key, default)
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"{key} 必须是数值: {value}")
+        return min(1.0, max(0.0, float(value)))
+
+    @staticmethod
+    def _strings(raw: Dict[str, Any], key: str) -> List[str]:
+        values = raw.get(key) or []
+        if not isinstance(values, list):
+            raise ValueError(f"{key} 必须是列表")
+        return list(dict.fromkeys(str(v).strip() for v in values if str(v).strip()))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取规划统计信息"""
+        return {
+            "plans": self.plans,
+            "failures": self.failures,
+            "avg_ms": self.total_ms / self.plans if self.plans else 0.0
+        }
@@ -0,0 +1,109 @@
+"""
+请求上下文模块
+用contextvars在一次问答请求的整条链路（事件循环、共享线程池、检索分支线程池）上携带请求级状态，
+目前记录该请求实际发起的LLM调用次数，便于核对路由、规划、生成等环节是否有重复调用
+"""
+
+import contextvars
+import functools
+import logging
+import threading
+from concurrent.futures import Executor, Future
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class RequestContext:
+    """单次请求的上下文，线程池中的任务通过复制的上下文共享同一个对象"""
+
+    def __init__(self):
+        self.llm_calls = 0
+        self._lock = threading.Lock()
+
+    def record_llm_call(self):
+        with self._lock:
+            self.llm_calls += 1
+
+
+_current_request: contextvars.ContextVar[Optional[RequestContext]] = contextvars.ContextVar(
+    "graph_rag_request", default=None
+)
+
+
+@contextmanager
+def request_scope(context: Optional[RequestContext] = None) -> Iterator[RequestContext]:
+    """
+    进入请求作用域
+
+    Args:
+        context: 复用已有的请求上下文（如流式响应在另一个任务中继续生成），默认新建
+    """
+    context = context or RequestContext()
+    token = _current_request.set(context)
+    try:
+        yield context
+    finally:
+        try:
+            _current_request.reset(token)
+        except ValueError:
+            # 异步生成器可能在其他任务中被关闭，此时上下文随任务一起丢弃即可
+            pass
+
+
+def current_request() -> Optional[RequestContext]:
+    """当前请求上下文，不在请求作用域内时为None"""
+    return _current_request.get()
+
+
+def record_llm_call():
+    """记录一次LLM调用（不在请求作用域内时忽略）"""
+    context = _current_request.get()
+    if context is not None:
+        context.record_llm_call()
+
+
+def bind_context(func: Callable, *args, **kwargs) -> Callable[[], Any]:
+    """把调用绑定到当前上下文的副本上，供提交到线程池执行（线程池默认不传递contextvars）"""
+    return functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+
+
+def submit_in_context(executor: Executor, func: Callable, *args, **kwargs) -> Future:
+    """在当前上下文的副本中执行线程池任务"""
+    return executor.submit(bind_context(func, *args, **kwargs))
+
+
+class _CountingCompletions:
+    def __init__(self, completions):
+        self._completions = completions
+
+    def create(self, *args, **kwargs):
+        record_llm_call()
+        return self._completions.create(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._completions, name)
+
+
+class _CountingChat:
+    def __init__(self, chat):
+        self._chat = chat
+        self.completions = _CountingCompletions(chat.completions)
+
+    def __getattr__(self, name):
+        return getattr(self._chat, name)
+
+
+class CountingLLMClient:
+    """
+    OpenAI / AsyncOpenAI 客户端包装：每次 chat.completions.create 都计入当前请求的LLM调用次数
+    其余属性原样转发给被包装的客户端
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self.chat = _CountingChat(client.chat)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
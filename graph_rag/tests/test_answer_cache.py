@@ -0,0 +1,162 @@
+"""
+语义答案缓存测试
+问题向量和关键词用固定的桩函数生成，不加载嵌入模型：
+- 查找：相似度阈值、关键词一致性校验
+- 写入：容量满时按LRU淘汰
+- 失效：按节点失效只影响引用了变更节点（或来源未知）的条目
+- 快照：生成期间发生相关失效的答案不写入
+
+用法：
+    python -m pytest tests/test_answer_cache.py -q
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag_modules.answer_cache import SemanticAnswerCache
+
+# 同一菜谱的不同问法向量相同；不同菜谱的同句式问题向量夹角很小（相似度约0.995）
+VECTORS = {
+    "红烧肉怎么做": [1.0, 0.0, 0.0],
+    "红烧肉的做法": [1.0, 0.0, 0.0],
+    "红烧鱼怎么做": [1.0, 0.1, 0.0],
+    "宫保鸡丁怎么做": [0.0, 1.0, 0.0],
+    "麻婆豆腐怎么做": [0.0, 0.0, 1.0],
+}
+KEYWORDS = {
+    "红烧肉怎么做": {"红烧肉"},
+    "红烧肉的做法": {"红烧肉"},
+    "红烧鱼怎么做": {"红烧鱼"},
+    "宫保鸡丁怎么做": {"宫保鸡丁"},
+    "麻婆豆腐怎么做": {"麻婆豆腐"},
+}
+
+
+def embed(question):
+    return VECTORS[question]
+
+
+def keywords(question):
+    return frozenset(KEYWORDS[question])
+
+
+@pytest.fixture
+def cache():
+    return SemanticAnswerCache(embed_fn=embed, keyword_fn=keywords, threshold=0.92, capacity=2)
+
+
+def test_paraphrase_hits(cache):
+    assert cache.store("红烧肉怎么做", "炖四十分钟", node_ids=["recipe_1"])
+
+    hit = cache.lookup("红烧肉的做法")
+    assert hit is not None
+    entry, similarity = hit
+    assert entry.answer == "炖四十分钟"
+    assert entry.chunks == ["炖四十分钟"]
+    assert similarity == pytest.approx(1.0)
+    assert cache.get_stats()["hits"] == 1
+
+
+def test_dissimilar_question_misses(cache):
+    cache.store("红烧肉怎么做", "炖四十分钟", node_ids=["recipe_1"])
+
+    assert cache.lookup("麻婆豆腐怎么做") is None
+    assert cache.get_stats()["misses"] == 1
+
+
+def test_same_template_different_dish_misses(cache):
+    cache.store("红烧肉怎么做", "炖四十分钟", node_ids=["recipe_1"])
+    similarity = float(np.dot(VECTORS["红烧肉怎么做"], VECTORS["红烧鱼怎么做"]) /
+                       np.linalg.norm(VECTORS["红烧鱼怎么做"]))
+    assert similarity > cache.threshold
+
+    assert cache.lookup("红烧鱼怎么做") is None
+    stats = cache.get_stats()
+    assert stats["keyword_mismatches"] == 1
+    assert stats["misses"] == 1
+
+
+def test_without_keyword_fn_only_similarity_is_checked():
+    cache = SemanticAnswerCache(embed_fn=embed, threshold=0.92)
+    cache.store("红烧肉怎么做", "炖四十分钟")
+
+    assert cache.lookup("红烧鱼怎么做") is not None
+
+
+def test_store_evicts_least_recently_used(cache):
+    cache.store("红烧肉怎么做", "炖四十分钟", node_ids=["recipe_1"])
+    cache.store("宫保鸡丁怎么做", "花生最后放", node_ids=["recipe_2"])
+    cache.lookup("红烧肉的做法")  # 红烧肉变为最近使用
+    cache.store("麻婆豆腐怎么做", "豆腐焯水", node_ids=["recipe_3"])
+
+    assert cache.lookup("宫保鸡丁怎么做") is None
+    assert cache.lookup("红烧肉怎么做") is not None
+    assert cache.lookup("麻婆豆腐怎么做") is not None
+    stats = cache.get_stats()
+    assert stats["evictions"] == 1
+    assert stats["size"] == 2
+
+
+def test_invalidate_nodes_only_drops_affected_entries():
+    cache = SemanticAnswerCache(embed_fn=embed, keyword_fn=keywords, capacity=4)
+    cache.store("红烧肉怎么做", "炖四十分钟", node_ids=["recipe_1"])
+    cache.store("宫保鸡丁怎么做", "花生最后放", node_ids=["recipe_2"])
+    cache.store("麻婆豆腐怎么做", "豆腐焯水", node_ids=None)  # 来源未知
+
+    assert cache.invalidate_nodes(["recipe_1"]) == 2
+    assert cache.lookup("红烧肉怎么做") is None
+    assert cache.lookup("麻婆豆腐怎么做") is None
+    assert cache.lookup("宫保鸡丁怎么做") is not None
+    assert cache.invalidate_nodes([]) == 0
+
+
+def test_invalidate_all_drops_everything(cache):
+    cache.store("红烧肉怎么做", "炖四十分钟", node_ids=["recipe_1"])
+    cache.invalidate_all()
+
+    assert cache.lookup("红烧肉怎么做") is None
+    assert cache.get_stats()["size"] == 0
+
+
+def test_write_after_related_node_invalidation_is_dropped(cache):
+    snapshot = cache.snapshot()
+    cache.invalidate_nodes(["recipe_1"])
+
+    assert not cache.store("红烧肉怎么做", "旧答案", node_ids=["recipe_1"], snapshot=snapshot)
+    assert cache.lookup("红烧肉怎么做") is None
+    assert cache.get_stats()["stale_writes"] == 1
+
+
+def test_write_after_unrelated_node_invalidation_is_kept(cache):
+    snapshot = cache.snapshot()
+    cache.invalidate_nodes(["recipe_2"])
+
+    assert cache.store("红烧肉怎么做", "炖四十分钟", node_ids=["recipe_1"], snapshot=snapshot)
+    assert cache.lookup("红烧肉怎么做") is not None
+
+
+def test_write_with_unknown_source_after_any_invalidation_is_dropped(cache):
+    snapshot = cache.snapshot()
+    cache.invalidate_nodes(["recipe_2"])
+
+    assert not cache.store("红烧肉怎么做", "旧答案", node_ids=None, snapshot=snapshot)
+
+
+def test_write_after_full_invalidation_is_dropped(cache):
+    snapshot = cache.snapshot()
+    cache.invalidate_all()
+
+    assert not cache.store("红烧肉怎么做", "旧答案", node_ids=["recipe_1"], snapshot=snapshot)
+
+
+def test_write_with_current_snapshot_is_kept(cache):
+    cache.invalidate_all()
+    snapshot = cache.snapshot()
+
+    assert cache.store("红烧肉怎么做", "炖四十分钟", node_ids=["recipe_1"], snapshot=snapshot)
+    assert cache.lookup("红烧肉怎么做") is not None
@@ -0,0 +1,64 @@
+"""
+嵌入向量持久化缓存测试
+用小容量的临时缓存目录，不加载嵌入模型：
+- 键摘要以 \\x00 结尾的文本也能命中缓存
+- 索引落后于向量文件、行已被其他文本复用时返回未命中
+
+用法：
+    python -m pytest tests/test_embedding_cache.py -q
+"""
+
+import hashlib
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag_modules.embedding_cache import EmbeddingCache
+
+MODEL_NAME = "test-model"
+
+
+def text_with_trailing_nul_digest() -> str:
+    """找一个键摘要最后一个字节为 \\x00 的文本"""
+    for i in range(100000):
+        text = f"菜谱{i}"
+        if hashlib.sha1(f"{MODEL_NAME}\x00{text}".encode("utf-8")).digest().endswith(b"\x00"):
+            return text
+    raise AssertionError("未找到摘要以\\x00结尾的文本")
+
+
+def test_digest_ending_in_nul_hits(tmp_path):
+    text = text_with_trailing_nul_digest()
+    cache = EmbeddingCache(str(tmp_path), MODEL_NAME, capacity=8)
+    cache.put_many([text, "hello"], [[1.0, 2.0], [3.0, 4.0]])
+
+    assert cache.get_many([text, "hello"]) == [[1.0, 2.0], [3.0, 4.0]]
+    stats = cache.get_stats()
+    assert stats["hits"] == 2
+    assert stats["stale_entries"] == 0
+
+
+def test_digest_ending_in_nul_hits_after_reload(tmp_path):
+    text = text_with_trailing_nul_digest()
+    cache = EmbeddingCache(str(tmp_path), MODEL_NAME, capacity=8)
+    cache.put_many([text], [[1.0, 2.0]])
+    cache.flush()
+
+    reloaded = EmbeddingCache(str(tmp_path), MODEL_NAME, capacity=8)
+    assert reloaded.get_many([text]) == [[1.0, 2.0]]
+    assert reloaded.get_stats()["stale_entries"] == 0
+
+
+def test_slot_reused_after_last_flush_is_stale(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), MODEL_NAME, capacity=1)
+    cache.put_many(["红烧肉"], [[1.0, 2.0]])
+    cache.flush()
+    # 淘汰后同一行写入另一文本，但索引未再持久化
+    cache.put_many(["红烧鱼"], [[3.0, 4.0]])
+    cache._vectors.flush()
+    cache._keys.flush()
+
+    reloaded = EmbeddingCache(str(tmp_path), MODEL_NAME, capacity=1)
+    assert reloaded.get_many(["红烧肉"]) == [None]
+    assert reloaded.get_stats()["stale_entries"] == 1
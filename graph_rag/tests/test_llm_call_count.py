@@ -0,0 +1,133 @@
+"""
+问答链路的LLM调用次数测试
+用桩OpenAI客户端（经 CountingLLMClient 计数）代替真实的LLM，检索模块用桩实现，不连接Neo4j和Milvus：
+- 解释路由时的查询分析直接用于路由，LLM调用次数与不解释时相同
+- 同步（CLI）与异步（API）入口执行同一个问答流程，调用次数相同
+
+用法：
+    python -m pytest tests/test_llm_call_count.py -q
+"""
+
+import asyncio
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.documents import Document
+
+from config import GraphRAGConfig
+from rag_modules.generation_integration import GenerationIntegrationModule
+from rag_modules.intelligent_query_router import IntelligentQueryRouter
+from rag_modules.main_module import AdvancedGraphRAGSystem
+from rag_modules.request_context import CountingLLMClient, request_scope
+
+QUESTION = "红烧肉怎么做"
+ANSWER = "五花肉焯水后炒糖色，加生抽老抽小火慢炖四十分钟。"
+ANALYSIS = json.dumps({
+    "query_complexity": 0.2,
+    "relationship_intensity": 0.1,
+    "reasoning_required": False,
+    "entity_count": 1,
+    "recommended_strategy": "hybrid_traditional",
+    "confidence": 0.9,
+    "reasoning": "简单的做法查询"
+}, ensure_ascii=False)
+
+
+def _reply(messages):
+    """查询分析提示词返回JSON分析结果，其余返回答案"""
+    content = ANALYSIS if "查询分析专家" in messages[0]["content"] else ANSWER
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+class StubCompletions:
+    def create(self, messages, **kwargs):
+        return _reply(messages)
+
+
+class AsyncStubCompletions:
+    async def create(self, messages, **kwargs):
+        return _reply(messages)
+
+
+class StubOpenAI:
+    def __init__(self, completions):
+        self.chat = SimpleNamespace(completions=completions)
+
+
+class StubRetrieval:
+    """桩检索模块：固定返回一个菜谱文档块"""
+
+    def _documents(self):
+        return [Document(page_content=f"红烧肉\n{ANSWER}", metadata={"node_id": "recipe_1", "recipe_name": "红烧肉"})]
+
+    def hybrid_search(self, query, top_k, keywords=None, vector_future=None):
+        return self._documents()
+
+    def graph_rag_search(self, query, top_k, graph_query=None):
+        return self._documents()
+
+
+@pytest.fixture
+def system():
+    config = GraphRAGConfig(enable_answer_cache=False, enable_speculative_retrieval=False)
+
+    generation = GenerationIntegrationModule.__new__(GenerationIntegrationModule)
+    generation.model_name = config.llm_model
+    generation.temperature = config.temperature
+    generation.max_tokens = config.max_tokens
+    generation.client = CountingLLMClient(StubOpenAI(StubCompletions()))
+    generation.async_client = CountingLLMClient(StubOpenAI(AsyncStubCompletions()))
+
+    # 跳过 __init__：不创建Neo4j驱动和构建任务线程
+    rag_system = AdvancedGraphRAGSystem.__new__(AdvancedGraphRAGSystem)
+    rag_system.config = config
+    rag_system.generation_module = generation
+    rag_system.query_router = IntelligentQueryRouter(
+        traditional_retrieval=StubRetrieval(),
+        graph_rag_retrieval=StubRetrieval(),
+        llm_client=generation.client,
+        config=config
+    )
+    rag_system.answer_cache = None
+    rag_system.executor = ThreadPoolExecutor(max_workers=2)
+    rag_system.system_ready = True
+    rag_system.knowledge_base_loaded = True
+    yield rag_system
+    rag_system.executor.shutdown(wait=True)
+
+
+def ask_sync(rag_system, explain_routing):
+    with request_scope() as ctx:
+        answer, _ = rag_system.ask_question_with_routing(QUESTION, explain_routing=explain_routing)
+    return answer, ctx.llm_calls
+
+
+def ask_async(rag_system, explain_routing):
+    async def run():
+        with request_scope() as ctx:
+            answer, _ = await rag_system.aask_question(QUESTION, explain_routing=explain_routing)
+        return answer, ctx.llm_calls
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("ask", [ask_sync, ask_async], ids=["sync", "async"])
+def test_explain_routing_does_not_add_llm_calls(system, ask):
+    plain_answer, plain_calls = ask(system, explain_routing=False)
+    explained_answer, explained_calls = ask(system, explain_routing=True)
+
+    assert plain_answer == explained_answer == ANSWER
+    # 一次查询分析 + 一次答案生成
+    assert plain_calls == explained_calls == 2
+
+
+@pytest.mark.parametrize("explain_routing", [False, True])
+def test_sync_and_async_paths_make_same_llm_calls(system, explain_routing):
+    assert ask_sync(system, explain_routing)[1] == ask_async(system, explain_routing)[1]
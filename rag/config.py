@@ -3,7 +3,7 @@ RAG系统配置文件
 """
 
 from dataclasses import dataclass
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 @dataclass
 class RAGConfig:
@@ -16,6 +16,15 @@ class RAGConfig:
     # 模型配置
     embedding_model: str = "BAAI/bge-small-zh-v1.5"
     llm_model: str = "intern-s1"
+    embedding_cache_dir: Optional[str] = "./embedding_cache"  # 嵌入向量持久化缓存目录，None表示不启用
+    embedding_cache_capacity: int = 100000  # 嵌入缓存最多保存的向量条数
+    embedding_cache_flush_every: int = 4096  # 嵌入缓存每写入多少条持久化一次索引
+    embedding_workers: int = 0  # 构建索引时文档向量化的CPU工作进程数，0或1表示使用主进程的模型
+    embedding_threads_per_worker: Optional[int] = None  # 每个向量化进程的torch线程数，None表示CPU核数平分
+    embedding_backend: str = "torch"  # 嵌入推理后端：torch / onnx-int8（CPU上的ONNX Runtime动态int8量化模型）
+    onnx_model_dir: str = "./onnx_models"  # onnx-int8后端的模型导出目录，首次使用时自动导出
+    embedding_token_budget: int = 8192  # 文档向量化按长度分桶时每批的token上限（条数×批内最大长度），0表示按语料顺序固定条数分批
+    embedding_max_batch_size: int = 256  # 按长度分桶时每批最多文本数
 
     # 检索配置
     top_k: int = 3
@@ -40,6 +49,15 @@ class RAGConfig:
             'index_save_path': self.index_save_path,
             'embedding_model': self.embedding_model,
             'llm_model': self.llm_model,
+            'embedding_cache_dir': self.embedding_cache_dir,
+            'embedding_cache_capacity': self.embedding_cache_capacity,
+            'embedding_cache_flush_every': self.embedding_cache_flush_every,
+            'embedding_workers': self.embedding_workers,
+            'embedding_threads_per_worker': self.embedding_threads_per_worker,
+            'embedding_backend': self.embedding_backend,
+            'onnx_model_dir': self.onnx_model_dir,
+            'embedding_token_budget': self.embedding_token_budget,
+            'embedding_max_batch_size': self.embedding_max_batch_size,
             'top_k': self.top_k,
             'temperature': self.temperature,
             'max_tokens': self.max_tokens
@@ -66,7 +66,16 @@ class RecipeRAGSystem:
         print("初始化索引构建模块...")
         self.index_module = IndexConstructionModule(
             model_name=self.config.embedding_model,
-            index_save_path=self.config.index_save_path
+            index_save_path=self.config.index_save_path,
+            embedding_cache_dir=self.config.embedding_cache_dir,
+            embedding_cache_capacity=self.config.embedding_cache_capacity,
+            embedding_cache_flush_every=self.config.embedding_cache_flush_every,
+            embedding_workers=self.config.embedding_workers,
+            embedding_threads_per_worker=self.config.embedding_threads_per_worker,
+            embedding_backend=self.config.embedding_backend,
+            onnx_model_dir=self.config.onnx_model_dir,
+            embedding_token_budget=self.config.embedding_token_budget,
+            embedding_max_batch_size=self.config.embedding_max_batch_size
         )
 
         # 3. 初始化生成集成模块
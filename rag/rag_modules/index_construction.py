@@ -3,42 +3,108 @@
 """
 
 import logging
-from typing import List
+from typing import List, Optional, Dict, Any
 from pathlib import Path
 
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_community.vectorstores import FAISS
 from langchain_core.documents import Document
 
+from .embedding_backends import create_embeddings, embedding_model_id
+from .embedding_cache import EmbeddingCache, CachedEmbeddings
+from .embedding_pool import ProcessPoolEmbeddings
+from .length_bucketing import LengthBucketedEmbeddings, token_length_fn
+
 logger = logging.getLogger(__name__)
 
 class IndexConstructionModule:
     """索引构建模块 - 负责向量化和索引构建"""
 
-    def __init__(self, model_name: str = "BAAI/bge-small-zh-v1.5", index_save_path: str = "./vector_index"):
+    def __init__(self, model_name: str = "BAAI/bge-small-zh-v1.5", index_save_path: str = "./vector_index",
+                 embedding_cache_dir: Optional[str] = None, embedding_cache_capacity: int = 100000,
+                 embedding_cache_flush_every: int = 4096,
+                 embedding_workers: int = 0, embedding_threads_per_worker: Optional[int] = None,
+                 embedding_backend: str = "torch", onnx_model_dir: str = "./onnx_models",
+                 embedding_token_budget: int = 8192, embedding_max_batch_size: int = 256):
         """
         初始化索引构建模块
 
         Args:
             model_name: 嵌入模型名称
             index_save_path: 索引保存路径
+            embedding_cache_dir: 嵌入向量持久化缓存目录，None表示不启用
+            embedding_cache_capacity: 嵌入缓存最多保存的向量条数
+            embedding_cache_flush_every: 嵌入缓存每写入多少条持久化一次索引
+            embedding_workers: 文档向量化的CPU工作进程数，0或1表示使用主进程的模型
+            embedding_threads_per_worker: 每个工作进程的torch线程数，None表示CPU核数平分
+            embedding_backend: 嵌入推理后端（torch使用GPU，onnx-int8在CPU上推理）
+            onnx_model_dir: onnx-int8后端的模型导出目录
+            embedding_token_budget: 文档向量化按长度分桶时每批的token上限，0表示不分桶
+            embedding_max_batch_size: 按长度分桶时每批最多文本数
         """
         self.model_name = model_name
         self.index_save_path = index_save_path
+        self.embedding_cache_dir = embedding_cache_dir
+        self.embedding_cache_capacity = embedding_cache_capacity
+        self.embedding_cache_flush_every = embedding_cache_flush_every
+        self.embedding_workers = embedding_workers
+        self.embedding_threads_per_worker = embedding_threads_per_worker
+        self.embedding_backend = embedding_backend
+        self.onnx_model_dir = onnx_model_dir
+        self.embedding_token_budget = embedding_token_budget
+        self.embedding_max_batch_size = embedding_max_batch_size
         self.embeddings = None
+        self.embedding_cache = None
+        self.embedding_pool = None
+        self.length_bucketing = None
         self.vectorstore = None
         self.setup_embeddings()
     
     def setup_embeddings(self):
         """初始化嵌入模型"""
-        logger.info(f"正在初始化嵌入模型: {self.model_name}")
+        logger.info(f"正在初始化嵌入模型: {self.model_name}（后端: {self.embedding_backend}）")
         
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=self.model_name,
-            model_kwargs={'device': 'cuda'},
-            encode_kwargs={'normalize_embeddings': True}
+        self.embeddings = create_embeddings(
+            self.embedding_backend,
+            self.model_name,
+            device='cuda',
+            onnx_model_dir=self.onnx_model_dir,
+            batch_size=self.embedding_max_batch_size if self.embedding_token_budget > 0 else 32
         )
         
+        # 按长度分桶：长度相近的文本同批计算，减少填充token
+        if self.embedding_token_budget > 0:
+            self.length_bucketing = LengthBucketedEmbeddings(
+                self.embeddings,
+                token_length_fn(self.model_name),
+                token_budget=self.embedding_token_budget,
+                max_batch_size=self.embedding_max_batch_size
+            )
+            self.embeddings = self.length_bucketing
+        
+        # 多进程CPU向量化：构建时文档分片到进程池（适合无GPU的多核机器），查询仍由主进程的模型计算
+        if self.embedding_workers > 1:
+            self.embedding_pool = ProcessPoolEmbeddings(
+                model_name=self.model_name,
+                workers=self.embedding_workers,
+                local_embeddings=self.embeddings,
+                threads_per_worker=self.embedding_threads_per_worker,
+                backend=self.embedding_backend,
+                onnx_model_dir=self.onnx_model_dir,
+                token_budget=self.embedding_token_budget,
+                max_batch_size=self.embedding_max_batch_size
+            )
+            self.embeddings = self.embedding_pool
+        
+        # 包装持久化嵌入缓存：未变化的文本在重建时无需再次前向计算
+        if self.embedding_cache_dir:
+            self.embedding_cache = EmbeddingCache(
+                cache_dir=self.embedding_cache_dir,
+                model_name=embedding_model_id(self.model_name, self.embedding_backend),
+                capacity=self.embedding_cache_capacity,
+                flush_every=self.embedding_cache_flush_every
+            )
+            self.embeddings = CachedEmbeddings(self.embeddings, self.embedding_cache)
+        
         logger.info("嵌入模型初始化完成")
     
     def build_vector_index(self, chunks: List[Document]) -> FAISS:
@@ -57,14 +123,37 @@ class IndexConstructionModule:
             raise ValueError("文档块列表不能为空")
         
         # 构建FAISS向量存储
-        self.vectorstore = FAISS.from_documents(
-            documents=chunks,
-            embedding=self.embeddings
-        )
+        try:
+            self.vectorstore = FAISS.from_documents(
+                documents=chunks,
+                embedding=self.embeddings
+            )
+        finally:
+            self.flush_embedding_cache()
         
         logger.info(f"向量索引构建完成，包含 {len(chunks)} 个向量")
         return self.vectorstore
     
+    def get_embedding_cache_stats(self) -> Dict[str, Any]:
+        """
+        获取嵌入缓存统计信息
+        
+        Returns:
+            统计信息字典，未启用缓存时返回 {"enabled": False}
+        """
+        if not self.embedding_cache:
+            return {"enabled": False}
+        return {"enabled": True, **self.embedding_cache.get_stats()}
+    
+    def flush_embedding_cache(self):
+        """持久化嵌入缓存（构建结束时调用，构建过程中只按间隔持久化）"""
+        if not self.embedding_cache:
+            return
+        try:
+            self.embedding_cache.flush()
+        except Exception as e:
+            logger.warning(f"持久化嵌入缓存失败: {e}")
+
     def add_documents(self, new_chunks: List[Document]):
         """
         向现有索引添加新文档
@@ -76,7 +165,10 @@ class IndexConstructionModule:
             raise ValueError("请先构建向量索引")
         
         logger.info(f"正在添加 {len(new_chunks)} 个新文档到索引...")
-        self.vectorstore.add_documents(new_chunks)
+        try:
+            self.vectorstore.add_documents(new_chunks)
+        finally:
+            self.flush_embedding_cache()
         logger.info("新文档添加完成")
 
     def save_index(self):
@@ -0,0 +1,143 @@
+"""
+按长度分桶的嵌入批处理模块
+文档块长度从几十个字符到 chunk_size 不等，按语料顺序固定条数分批时，每批都要填充到批内最长文本的长度。
+这里先按token长度排序，再按token预算（批内条数 × 批内最大长度）切分批次，
+长度相近的文本进入同一批，向量化后按原始顺序还原
+"""
+
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+
+def token_length_fn(model_name: str, max_length: int = 512) -> Callable[[str], int]:
+    """
+    基于模型分词器的token长度函数（含特殊token，按模型最大长度截断）
+
+    Args:
+        model_name: 嵌入模型名称
+        max_length: 模型最大token数
+    """
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+    def length(text: str) -> int:
+        return len(tokenizer(text, truncation=True, max_length=max_length)["input_ids"])
+
+    return length
+
+
+def plan_batches(lengths: List[int], token_budget: int, max_batch_size: int) -> List[List[int]]:
+    """
+    按长度排序后切分批次
+
+    Args:
+        lengths: 每条文本的token长度
+        token_budget: 每批填充后的token上限（批内条数 × 批内最大长度）
+        max_batch_size: 每批最多文本数
+
+    Returns:
+        批次列表，每个批次为原始下标列表
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batches: List[List[int]] = []
+    current: List[int] = []
+    for i in order:
+        # 升序遍历，当前文本即加入后的批内最大长度；单条超出预算时独占一批
+        if current and ((len(current) + 1) * lengths[i] > token_budget or len(current) >= max_batch_size):
+            batches.append(current)
+            current = []
+        current.append(i)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def padding_stats(lengths: List[int], batches: List[List[int]]) -> Tuple[int, int]:
+    """
+    计算实际token数与填充后的token数
+
+    Returns:
+        (实际token数, 填充后token数)
+    """
+    tokens = sum(lengths)
+    padded = sum(len(batch) * max(lengths[i] for i in batch) for batch in batches)
+    return tokens, padded
+
+
+class LengthBucketedEmbeddings(Embeddings):
+    """
+    按长度分桶的嵌入包装
+    embed_documents 按token预算分批调用底层模型，embed_query 直接透传
+    """
+
+    def __init__(self,
+                 embeddings: Embeddings,
+                 length_fn: Callable[[str], int],
+                 token_budget: int = 8192,
+                 max_batch_size: int = 256):
+        """
+        初始化分桶嵌入
+
+        Args:
+            embeddings: 底层嵌入模型（其内部批大小应不小于 max_batch_size，否则批次会被再次切分）
+            length_fn: 文本token长度函数
+            token_budget: 每批填充后的token上限
+            max_batch_size: 每批最多文本数
+        """
+        if token_budget < 1 or max_batch_size < 1:
+            raise ValueError("token预算和批大小必须大于0")
+
+        self.embeddings = embeddings
+        self.length_fn = length_fn
+        self.token_budget = token_budget
+        self.max_batch_size = max_batch_size
+
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.documents = 0
+        self.batches = 0
+        self.tokens = 0
+        self.padded_tokens = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+
+        lengths = [self.length_fn(text) for text in texts]
+        batches = plan_batches(lengths, self.token_budget, self.max_batch_size)
+
+        vectors: List[List[float]] = [None] * len(texts)
+        for batch in batches:
+            for i, vector in zip(batch, self.embeddings.embed_documents([texts[i] for i in batch])):
+                vectors[i] = vector
+
+        tokens, padded = padding_stats(lengths, batches)
+        with self._lock:
+            self.documents += len(texts)
+            self.batches += len(batches)
+            self.tokens += tokens
+            self.padded_tokens += padded
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取分桶统计信息"""
+        with self._lock:
+            return {
+                "token_budget": self.token_budget,
+                "max_batch_size": self.max_batch_size,
+                "documents": self.documents,
+                "batches": self.batches,
+                "tokens": self.tokens,
+                "padding_tokens": self.padded_tokens - self.tokens,
+                "padding_ratio": (self.padded_tokens - self.tokens) / self.padded_tokens if self.padded_tokens else 0.0
+            }